@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from pydantic import BaseModel, Field
 import json
 
@@ -34,10 +34,11 @@ class ReportsAgent:
         self.llm_provider = os.getenv("LLM_PROVIDER", "none")
         self.use_langsmith = os.getenv("LANGCHAIN_TRACING_V2", "false") == "true"
 
-    async def generate_summary(self, shop_id: str = "demo_shop") -> Dict[str, Any]:
-        """Generate summary report - currently uses heuristics fallback"""
+    async def generate_summary(self, shop_id: str = "demo_shop", metrics: Optional[Dict[str, Any]] = None,
+                               listings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate summary report from shop metrics - currently uses heuristics fallback"""
         # For MVP, always use heuristics
         from app.agent.heuristics import generate_heuristic_summary
-        return generate_heuristic_summary()
+        return generate_heuristic_summary(metrics, listings)
 
 # Additional methods removed for MVP - will be restored when LangGraph is integrated
\ No newline at end of file
@@ -1,62 +1,222 @@
-from typing import Dict, List, Any
-import random
-
-def generate_heuristic_summary() -> Dict[str, Any]:
-    """Generate deterministic business insights when LLM is not available"""
-
-    # Sample heuristic insights based on common Etsy patterns
-    insights = [
-        "Your conversion rate is performing well compared to industry average (2.5-3%)",
-        "Revenue growth suggests your product-market fit is improving",
-        "Consider expanding your top-performing product categories",
-        "Seasonal trends indicate potential for holiday-themed listings",
-        "Your pricing strategy appears competitive within your niche"
-    ]
-
-    recommendations = [
-        {
-            "title": "Optimize High-Traffic Listings",
-            "description": "Focus on improving conversion for listings with high views but low sales",
-            "priority": "high",
-            "effort": "medium"
-        },
-        {
-            "title": "Expand Successful Product Lines",
-            "description": "Create variations of your best-selling items in different colors/sizes",
-            "priority": "high",
-            "effort": "low"
-        },
-        {
-            "title": "Improve SEO with Long-tail Keywords",
-            "description": "Add specific, descriptive keywords to increase discoverability",
-            "priority": "medium",
-            "effort": "low"
-        },
-        {
-            "title": "Bundle Products for Higher AOV",
-            "description": "Create product bundles to increase average order value",
-            "priority": "medium",
-            "effort": "medium"
-        },
-        {
-            "title": "Enhance Listing Photography",
-            "description": "Add lifestyle shots showing products in use to boost conversions",
-            "priority": "medium",
-            "effort": "high"
+from itertools import chain, zip_longest
+from typing import Dict, List, Any, Optional
+import numpy as np
+from app.services.columnar import ListingColumns
+
+# Conversion (orders per 100 views) below which a listing converts poorly, and the shop baseline
+LOW_CONVERSION = 1.0
+AVERAGE_CONVERSION = 2.0
+
+# Views below which a listing is hard to find
+LOW_VIEWS = 50
+
+# Industry conversion range for Etsy shops, in percent
+INDUSTRY_CONVERSION = (2.5, 3.0)
+
+# Listing rule -> issue and the suggestions that address it
+LISTING_RULES = {
+    "low_conversion": ("Low conversion rate", ["Improve listing photos and description"]),
+    "below_average_conversion": ("Below average conversion", ["Consider price optimization or better keywords"]),
+    "low_visibility": ("Low visibility", ["Improve SEO with better tags", "Use trending keywords in your title"])
+}
+
+# Listing rule -> shop-level recommendation, with {listings} and {orders} filled from the analysis
+RULE_RECOMMENDATIONS = {
+    "low_conversion": {
+        "title": "Enhance Listing Photography",
+        "description": "{listings} listings convert under 1%; lifestyle shots and clearer descriptions "
+                       "could recover about {orders} orders",
+        "effort": "high"
+    },
+    "below_average_conversion": {
+        "title": "Optimize High-Traffic Listings",
+        "description": "{listings} listings convert between 1% and 2%; reviewing price and keywords "
+                       "could add about {orders} orders",
+        "effort": "medium"
+    },
+    "low_visibility": {
+        "title": "Improve SEO with Long-tail Keywords",
+        "description": "{listings} listings have under 50 views; specific, descriptive tags could "
+                       "bring about {orders} more orders",
+        "effort": "low"
+    }
+}
+
+DEFAULT_RECOMMENDATIONS = [
+    {
+        "title": "Optimize High-Traffic Listings",
+        "description": "Focus on improving conversion for listings with high views but low sales",
+        "priority": "high",
+        "effort": "medium"
+    },
+    {
+        "title": "Expand Successful Product Lines",
+        "description": "Create variations of your best-selling items in different colors/sizes",
+        "priority": "high",
+        "effort": "low"
+    },
+    {
+        "title": "Improve SEO with Long-tail Keywords",
+        "description": "Add specific, descriptive keywords to increase discoverability",
+        "priority": "medium",
+        "effort": "low"
+    },
+    {
+        "title": "Bundle Products for Higher AOV",
+        "description": "Create product bundles to increase average order value",
+        "priority": "medium",
+        "effort": "medium"
+    }
+]
+
+PRIORITIES = ("high", "high", "medium", "medium")
+
+def analyze_listings(columns: ListingColumns, examples: int = 3) -> Dict[str, Any]:
+    """Evaluate the listing rules across a whole catalog in one vectorized pass
+
+    Each rule's impact is the orders its listings are missing: conversion rules
+    against AVERAGE_CONVERSION on their current views, low visibility against
+    LOW_VIEWS views at the shop's conversion rate. Issues are ranked by that
+    impact, with the listings missing the most orders as examples. Top
+    performers are the listings with the most revenue.
+    """
+    conversion = columns.conversion_rates()
+    total_views = float(columns.views.sum())
+    shop_conversion = float(columns.orders.sum()) / total_views * 100 if total_views else 0.0
+
+    conversion_gap = columns.views * np.maximum(AVERAGE_CONVERSION - conversion, 0) / 100
+    visibility_gap = np.maximum(LOW_VIEWS - columns.views, 0) * max(shop_conversion, LOW_CONVERSION) / 100
+    rules = {
+        "low_conversion": (conversion < LOW_CONVERSION, conversion_gap),
+        "below_average_conversion": ((conversion >= LOW_CONVERSION) & (conversion < AVERAGE_CONVERSION), conversion_gap),
+        "low_visibility": (columns.views < LOW_VIEWS, visibility_gap)
+    }
+
+    issues = []
+    for rule, (mask, gap) in rules.items():
+        count = int(mask.sum())
+        if not count:
+            continue
+        impact = np.where(mask, gap, 0.0)
+        # Unflagged listings rank below flagged ones with no impact
+        ranked = np.where(mask, gap, -np.inf)
+        issue, suggestions = LISTING_RULES[rule]
+        issues.append({
+            "rule": rule,
+            "issue": issue,
+            "suggestions": suggestions,
+            "listings": count,
+            "share": round(count / len(columns) * 100, 1),
+            "estimated_orders": round(float(impact.sum()), 1),
+            "examples": columns.rows(columns.top_k(ranked, min(examples, count)))
+        })
+    issues.sort(key=lambda item: (-item["estimated_orders"], -item["listings"], item["rule"]))
+
+    return {
+        "listings": len(columns),
+        "conversion_rate": round(shop_conversion, 2),
+        "healthy": int(((conversion >= AVERAGE_CONVERSION) & (columns.views >= LOW_VIEWS)).sum()),
+        "issues": issues,
+        "top_performers": columns.rows(columns.top_k(columns.revenue, examples))
+    }
+
+def generate_heuristic_summary(metrics: Optional[Dict[str, Any]] = None,
+                               listings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Generate deterministic business insights when LLM is not available
+
+    metrics are shop KPIs with deltas and listings an analyze_listings result;
+    without them the summary falls back to general Etsy guidance.
+    """
+    if not metrics and not listings:
+        return {
+            "summary": "Connect and sync your shop to get insights based on its own numbers.",
+            "key_insights": [
+                f"Etsy shops typically convert {INDUSTRY_CONVERSION[0]}-{INDUSTRY_CONVERSION[1]}% of visits into orders",
+                "Consider expanding your top-performing product categories",
+                "Your pricing strategy should stay competitive within your niche"
+            ],
+            "recommendations": DEFAULT_RECOMMENDATIONS,
+            "generated_with": "heuristics",
+            "confidence": "low"
         }
-    ]
 
-    # Randomly select 3-4 recommendations to keep it fresh
-    selected_recommendations = random.sample(recommendations, k=min(4, len(recommendations)))
+    recommendations = []
+    if listings:
+        for issue in listings["issues"]:
+            template = RULE_RECOMMENDATIONS[issue["rule"]]
+            recommendations.append({
+                "title": template["title"],
+                "description": template["description"].format(
+                    listings=f"{issue['listings']:,}", orders=f"{issue['estimated_orders']:,.0f}"
+                ),
+                "priority": PRIORITIES[min(len(recommendations), len(PRIORITIES) - 1)],
+                "effort": template["effort"]
+            })
+    if len(recommendations) < 3:
+        taken = {item["title"] for item in recommendations}
+        for default in DEFAULT_RECOMMENDATIONS:
+            if default["title"] not in taken and len(recommendations) < 4:
+                recommendations.append({**default, "priority": "medium" if recommendations else default["priority"]})
 
+    # Alternate shop-level and catalog insights so both make the top three
+    insights = chain.from_iterable(zip_longest(
+        _metric_insights(metrics) if metrics else [], _listing_insights(listings) if listings else []
+    ))
     return {
-        "summary": "Your shop is showing positive momentum with steady growth in key metrics.",
-        "key_insights": insights[:3],  # Top 3 insights
-        "recommendations": selected_recommendations,
+        "summary": _summary_sentence(metrics, listings),
+        "key_insights": [insight for insight in insights if insight][:3],
+        "recommendations": recommendations,
         "generated_with": "heuristics",
-        "confidence": "medium"
+        "confidence": "high" if metrics and listings else "medium"
     }
 
+def _summary_sentence(metrics: Optional[Dict[str, Any]], listings: Optional[Dict[str, Any]]) -> str:
+    """One-line summary of the headline numbers"""
+    if not metrics:
+        return (f"Your {listings['listings']} listings convert at {listings['conversion_rate']:.2f}% "
+                f"with {len(listings['issues'])} issues to address.")
+    deltas = metrics.get("deltas") or {}
+    growth = deltas.get("gmv")
+    trend = "" if growth is None else f", {'up' if growth >= 0 else 'down'} {abs(growth):.1f}% on the previous period"
+    return (f"Your shop made ${metrics.get('gmv', 0.0):,.2f} from {metrics.get('orders', 0):,} orders{trend}, "
+            f"converting {metrics.get('conversion_rate', 0.0):.2f}% of {metrics.get('visits', 0):,} visits.")
+
+def _metric_insights(metrics: Dict[str, Any]) -> List[str]:
+    """Insights from shop KPIs and their deltas"""
+    insights = []
+    conversion = metrics.get("conversion_rate", 0.0)
+    low, high = INDUSTRY_CONVERSION
+    if conversion < low:
+        insights.append(f"Your conversion rate of {conversion:.2f}% is below the Etsy average of {low}-{high}%")
+    elif conversion > high:
+        insights.append(f"Your conversion rate of {conversion:.2f}% beats the Etsy average of {low}-{high}%")
+    else:
+        insights.append(f"Your conversion rate of {conversion:.2f}% is in line with the Etsy average of {low}-{high}%")
+
+    deltas = metrics.get("deltas") or {}
+    changes = [(key, deltas[key]) for key in ("gmv", "orders", "visits") if deltas.get(key) is not None]
+    if changes:
+        key, delta = max(changes, key=lambda item: abs(item[1]))
+        label = {"gmv": "Revenue", "orders": "Orders", "visits": "Visits"}[key]
+        insights.append(f"{label} {'grew' if delta >= 0 else 'fell'} {abs(delta):.1f}% on the previous period")
+
+    cart_adds, orders = metrics.get("cart_adds", 0), metrics.get("orders", 0)
+    if cart_adds > orders > 0:
+        insights.append(f"{cart_adds - orders:,} cart adds did not turn into orders; check shipping costs and checkout")
+    return insights
+
+def _listing_insights(listings: Dict[str, Any]) -> List[str]:
+    """Insights from a catalog analysis"""
+    insights = []
+    if listings["top_performers"]:
+        best = listings["top_performers"][0]
+        insights.append(f"\"{best['title']}\" is your top earner with ${best['revenue']:,.2f} "
+                        f"from {best['orders']:,} orders")
+    if listings["issues"]:
+        top = listings["issues"][0]
+        insights.append(f"{top['issue']} affects {top['listings']} listings ({top['share']}% of your catalog)")
+    return insights
+
 def analyze_listing_performance(listing_data: Dict[str, Any]) -> Dict[str, Any]:
     """Heuristic analysis for individual listing performance"""
     views = listing_data.get("views", 0)
@@ -67,20 +227,20 @@ def analyze_listing_performance(listing_data: Dict[str, Any]) -> Dict[str, Any]:
     suggestions = []
 
     # Analyze conversion rate
-    if conversion < 1.0:
-        issues.append("Low conversion rate")
-        suggestions.append("Improve listing photos and description")
-    elif conversion < 2.0:
-        issues.append("Below average conversion")
-        suggestions.append("Consider price optimization or better keywords")
+    if conversion < LOW_CONVERSION:
+        rule = "low_conversion"
+    elif conversion < AVERAGE_CONVERSION:
+        rule = "below_average_conversion"
+    else:
+        rule = None
+    if rule:
+        issues.append(LISTING_RULES[rule][0])
+        suggestions.extend(LISTING_RULES[rule][1])
 
     # Analyze traffic
-    if views < 50:
-        issues.append("Low visibility")
-        suggestions.extend([
-            "Improve SEO with better tags",
-            "Use trending keywords in your title"
-        ])
+    if views < LOW_VIEWS:
+        issues.append(LISTING_RULES["low_visibility"][0])
+        suggestions.extend(LISTING_RULES["low_visibility"][1])
 
     # Default positive feedback if no issues
     if not issues:
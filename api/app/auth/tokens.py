@@ -0,0 +1,173 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from app.models.auth import TokenRecord
+from app.services.http_pool import get_http_pool
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    shop_id TEXT PRIMARY KEY,
+    access_token TEXT NOT NULL,
+    refresh_token TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+class TokenUnavailable(Exception):
+    """No usable OAuth token for a shop"""
+
+class TokenStore:
+    """Per-shop OAuth tokens in SQLite behind an in-memory cache
+
+    Tokens are refreshed proactively when they come within refresh_margin
+    seconds of expiry. Refreshes for a shop are serialized by a per-shop lock,
+    and a caller whose token was already replaced while it waited reuses the new
+    token, so a burst of 401s costs a single refresh.
+    """
+
+    def __init__(self, path: Optional[str] = None, token_url: Optional[str] = None,
+                 client_id: Optional[str] = None, refresh_margin: Optional[float] = None,
+                 http_client: Optional[Any] = None):
+        self.path = path or os.getenv("TOKEN_DB_PATH", ":memory:")
+        self.token_url = token_url or os.getenv("ETSY_TOKEN_URL", "https://api.etsy.com/v3/public/oauth/token")
+        self.client_id = client_id or os.getenv("ETSY_CLIENT_ID")
+        self.refresh_margin = refresh_margin if refresh_margin is not None else float(
+            os.getenv("ETSY_TOKEN_REFRESH_MARGIN", "300")
+        )
+        self._http_client = http_client
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self._conn:
+            self._conn.execute(SCHEMA)
+
+        self._cache: Dict[str, TokenRecord] = {}
+        self._locks: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = {}
+        self._refreshes = 0
+        self._proactive = 0
+        self._skipped = 0
+        self._failures = 0
+
+    def save(self, shop_id: str, payload: Dict[str, Any]) -> TokenRecord:
+        """Store a token endpoint response for a shop"""
+        record = TokenRecord(
+            shop_id=shop_id,
+            access_token=payload["access_token"],
+            refresh_token=payload["refresh_token"],
+            expires_at=time.time() + float(payload.get("expires_in", 3600))
+        )
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)",
+                (record.shop_id, record.access_token, record.refresh_token, record.expires_at)
+            )
+        self._cache[shop_id] = record
+        return record
+
+    def get(self, shop_id: str) -> Optional[TokenRecord]:
+        """Get a shop's stored token"""
+        record = self._cache.get(shop_id)
+        if record is None:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT access_token, refresh_token, expires_at FROM tokens WHERE shop_id = ?", (shop_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            record = TokenRecord(shop_id=shop_id, access_token=row[0], refresh_token=row[1], expires_at=row[2])
+            self._cache[shop_id] = record
+        return record
+
+    def shops(self) -> List[str]:
+        """Shops with a stored token"""
+        with self._db_lock:
+            return [row[0] for row in self._conn.execute("SELECT shop_id FROM tokens ORDER BY shop_id")]
+
+    def delete(self, shop_id: str):
+        """Forget a shop's token, e.g. on disconnect"""
+        self._cache.pop(shop_id, None)
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM tokens WHERE shop_id = ?", (shop_id,))
+
+    async def access_token(self, shop_id: str) -> str:
+        """Get a usable access token, refreshing it first if it is about to expire"""
+        record = self.get(shop_id)
+        if record is None:
+            raise TokenUnavailable(f"No token stored for shop {shop_id}")
+        if record.expires_at - time.time() <= self.refresh_margin:
+            self._proactive += 1
+            record = await self.refresh(shop_id, record.access_token)
+        return record.access_token
+
+    async def refresh(self, shop_id: str, stale_token: Optional[str] = None) -> TokenRecord:
+        """Refresh a shop's token once, unless another caller already replaced stale_token"""
+        async with self._lock(shop_id):
+            record = self.get(shop_id)
+            if record is None:
+                raise TokenUnavailable(f"No token stored for shop {shop_id}")
+            if stale_token is not None and record.access_token != stale_token:
+                self._skipped += 1
+                return record
+
+            client = self._http_client or get_http_pool()
+            try:
+                response = await client.request("POST", self.token_url, data={
+                    "grant_type": "refresh_token",
+                    "client_id": self.client_id or "",
+                    "refresh_token": record.refresh_token
+                })
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                self._failures += 1
+                raise TokenUnavailable(f"Token refresh failed for shop {shop_id}: {e!r}") from e
+
+            self._refreshes += 1
+            return self.save(shop_id, response.json())
+
+    def stats(self) -> Dict[str, Any]:
+        """Get refresh statistics"""
+        return {
+            "cached": len(self._cache),
+            "refreshes": self._refreshes,
+            "proactive_refreshes": self._proactive,
+            "coalesced_refreshes": self._skipped,
+            "refresh_failures": self._failures
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self._db_lock:
+            self._conn.close()
+
+    def _lock(self, shop_id: str) -> asyncio.Lock:
+        """Per-shop refresh lock bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        entry = self._locks.get(shop_id)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, asyncio.Lock())
+            self._locks[shop_id] = entry
+        return entry[1]
+
+_token_store: Optional[TokenStore] = None
+
+def get_token_store() -> TokenStore:
+    """Get the process-wide token store"""
+    global _token_store
+    if _token_store is None:
+        _token_store = TokenStore()
+    return _token_store
+
+def close_token_store():
+    """Close the process-wide token store"""
+    global _token_store
+    if _token_store is not None:
+        _token_store.close()
+        _token_store = None
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 import time
@@ -11,17 +12,40 @@ load_dotenv()
 
 # Import routers
 from app.routers import auth, metrics, reports, health
+from app.services.cache import get_cache_service
+from app.services.http_pool import get_http_pool, close_http_pool
+from app.services.timeseries import close_timeseries_store
+from app.services.shop_state import close_shop_state_store
+from app.auth.tokens import TokenUnavailable, close_token_store
+from app.services.sync import get_sync_scheduler
+from app.services.reports import get_report_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage process-wide resources for the app lifetime"""
+    get_http_pool()
+    await get_cache_service().start()
+    await get_sync_scheduler().start()
+    yield
+    await get_sync_scheduler().stop()
+    await get_report_service().stop()
+    await get_cache_service().stop()
+    await close_http_pool()
+    close_timeseries_store()
+    close_shop_state_store()
+    close_token_store()
+
 app = FastAPI(
     title="EtsyNova API",
     description="Etsy Store Analytics Dashboard API with AI-powered insights",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware with environment configuration
@@ -52,6 +76,12 @@ async def log_requests(request: Request, call_next):
     )
     return response
 
+@app.exception_handler(TokenUnavailable)
+async def token_unavailable_handler(request: Request, exc: TokenUnavailable):
+    """A shop's Etsy token was revoked or could not be refreshed"""
+    logger.warning(f"Etsy token unavailable: {exc}")
+    return JSONResponse(status_code=401, content={"detail": "Etsy authorization expired; reconnect the shop"})
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(metrics.router)
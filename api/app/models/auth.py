@@ -14,4 +14,10 @@ class AuthCallback(BaseModel):
     shop_id: str
 
 class AuthDisconnect(BaseModel):
-    disconnected: bool
\ No newline at end of file
+    disconnected: bool
+
+class TokenRecord(BaseModel):
+    shop_id: str
+    access_token: str
+    refresh_token: str
+    expires_at: float
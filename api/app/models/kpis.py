@@ -47,10 +47,34 @@ class TopListingItem(BaseModel):
     etsy_url: str
 
 class TopListings(BaseModel):
-    by_views: list[TopListingItem]
-    by_orders: list[TopListingItem]
-    by_revenue: list[TopListingItem]
+    by_views: list[TopListingItem] = []
+    by_orders: list[TopListingItem] = []
+    by_revenue: list[TopListingItem] = []
+    by_conversion: list[TopListingItem] = []
+    by_revenue_per_view: list[TopListingItem] = []
 
 class ListingsResponse(BaseModel):
     items: list[TopListingItem]
-    top: TopListings
\ No newline at end of file
+    top: TopListings
+
+class DashboardResponse(BaseModel):
+    shop: Optional[ShopMetrics] = None
+    listings: Optional[ListingsResponse] = None
+    trends: Optional[TrendsResponse] = None
+    funnel: Optional[FunnelMetrics] = None
+
+class PortfolioTotals(BaseModel):
+    shops: int
+    orders: int
+    gmv: float
+    visits: int
+    views: int
+    conversion_rate: float
+    favorites: int
+    cart_adds: int
+    refunds: int
+
+class PortfolioSummary(BaseModel):
+    totals: PortfolioTotals
+    rankings: Dict[str, list[str]]
+    failed: list[str] = []
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import RedirectResponse
+from typing import Optional
 from app.models.auth import AuthStatus, AuthConnect, AuthCallback, AuthDisconnect
+from app.auth.tokens import get_token_store
+from app.services.cache import get_cache_service
 from app.services.etsy_client import EtsyClient
+from app.services.shop_state import get_shop_state_store
+from app.services.sync import get_sync_scheduler
 import os
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -18,6 +23,13 @@ async def etsy_callback(code: str, state: str):
     """Handle Etsy OAuth callback"""
     etsy_client = EtsyClient()
     shop_data = await etsy_client.handle_callback(code, state)
+    if shop_data.get("refresh_token"):
+        get_token_store().save(shop_data["shop_id"], shop_data)
+
+    # Drop anything cached or synced for the shop under its previous connection
+    get_shop_state_store().purge(shop_data["shop_id"])
+    await get_cache_service().invalidate_tags([EtsyClient.shop_tag(shop_data["shop_id"])])
+    get_sync_scheduler().register(shop_data["shop_id"])
     return AuthCallback(connected=True, shop_id=shop_data["shop_id"])
 
 @router.get("/status", response_model=AuthStatus)
@@ -32,7 +44,12 @@ async def auth_status():
     return AuthStatus(connected=False, pending=False, shop_id=None)
 
 @router.post("/etsy/disconnect", response_model=AuthDisconnect)
-async def disconnect_etsy():
+async def disconnect_etsy(shop_id: Optional[str] = Query(None, description="Shop ID to disconnect")):
     """Disconnect from Etsy"""
-    # TODO: Clear session/tokens
+    # TODO: Clear session
+    if shop_id:
+        get_token_store().delete(shop_id)
+        get_sync_scheduler().unregister(shop_id)
+        get_shop_state_store().purge(shop_id)
+        await get_cache_service().invalidate_tags([EtsyClient.shop_tag(shop_id)])
     return AuthDisconnect(disconnected=True)
\ No newline at end of file
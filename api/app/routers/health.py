@@ -1,9 +1,33 @@
 from fastapi import APIRouter
 from typing import Dict, Any
+from app.auth.tokens import get_token_store
+from app.services.cache import get_cache_service
+from app.services.http_pool import get_http_pool
+from app.services.live import get_live_updates
+from app.services.rate_limiter import get_request_scheduler
+from app.services.reports import get_report_service
+from app.services.singleflight import get_singleflight
+from app.services.sync import get_sync_scheduler
+from app.utils.http_cache import get_body_cache
 
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("/")
 async def health_check() -> Dict[str, Any]:
     """Health check endpoint"""
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True}
+
+@router.get("/stats")
+async def service_stats() -> Dict[str, Any]:
+    """Runtime statistics for upstream connection pooling, rate limiting, coalescing, caching, sync, tokens, live push, encoded responses and reports"""
+    return {
+        "http_pool": get_http_pool().stats(),
+        "rate_limiter": get_request_scheduler().stats(),
+        "singleflight": get_singleflight().stats(),
+        "cache": get_cache_service().stats(),
+        "sync": get_sync_scheduler().stats(),
+        "tokens": get_token_store().stats(),
+        "live": get_live_updates().stats(),
+        "responses": get_body_cache().stats(),
+        "reports": get_report_service().stats()
+    }
\ No newline at end of file
@@ -1,71 +1,383 @@
-from fastapi import APIRouter, Query
-from typing import Optional
-from app.models.kpis import ShopMetrics, ListingsResponse, TrendsResponse, FunnelMetrics
-from app.services.etsy_client import EtsyClient
-from app.services.aggregator import MetricsAggregator
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.models.kpis import ShopMetrics, ListingsResponse, TrendsResponse, FunnelMetrics, DashboardResponse
+from app.services.etsy_client import get_etsy_client
+from app.services.aggregator import MetricsAggregator, DEFAULT_RANKINGS, RANKING_KEYS
+from app.services.live import get_live_updates
+from app.services.rollups import get_rollup_store
+from app.services.timeseries import GRANULARITIES, SERIES, get_timeseries_store
+from app.utils.export import EXPORT_FORMATS, stream_rows
+from app.utils.http_cache import encode_json, etag_matches, get_body_cache, json_response, make_etag, not_modified
+from contextlib import aclosing
+from datetime import date
+import asyncio
+import json
 import os
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
+DASHBOARD_FIELDS = ("shop", "listings", "trends", "funnel")
+
+PORTFOLIO_MAX_SHOPS = 100
+
+LISTING_EXPORT_COLUMNS = ("listing_id", "title", "views", "orders", "revenue", "conversion_rate", "etsy_url")
+
 @router.get("/shop", response_model=ShopMetrics)
 async def get_shop_metrics(
+    request: Request,
     shop_id: str = Query(..., description="Shop ID"),
     from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
 ):
     """Get shop-level metrics and KPIs"""
-    etsy_client = EtsyClient()
-    aggregator = MetricsAggregator()
+    etsy_client = get_etsy_client()
 
-    raw_data = await etsy_client.get_shop_stats(shop_id, from_date, to_date)
-    metrics = aggregator.aggregate_shop_metrics(raw_data)
+    async def versions():
+        stored_at = await etsy_client.version("shop_stats", shop_id, from_date, to_date)
+        return None if stored_at is None else (stored_at, get_rollup_store().version(shop_id))
 
-    return metrics
+    return await _conditional(
+        request, versions, lambda: _shop_metrics(etsy_client, MetricsAggregator(), shop_id, from_date, to_date)
+    )
+
+async def _shop_metrics(etsy_client, aggregator: MetricsAggregator, shop_id: str,
+                        from_date: Optional[str], to_date: Optional[str]) -> ShopMetrics:
+    """Fetch one shop's stats and aggregate them with deltas from the rollup store"""
+    raw_data = await etsy_client.get_shop_stats(shop_id, from_date, to_date)
+    periods = get_rollup_store().compare_windows(shop_id, from_date, to_date)
+    return aggregator.aggregate_shop_metrics(raw_data, periods)
 
 @router.get("/listings", response_model=ListingsResponse)
 async def get_listings_metrics(
+    request: Request,
     shop_id: str = Query(..., description="Shop ID"),
     from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    limit: int = Query(50, description="Number of listings to return")
+    limit: int = Query(50, description="Number of listings to return"),
+    top_n: int = Query(5, ge=0, le=100, description="Number of top listings per ranking"),
+    rankings: str = Query(",".join(DEFAULT_RANKINGS), description=f"Comma-separated rankings: {', '.join(RANKING_KEYS)}")
 ):
     """Get listings metrics and top performers"""
-    etsy_client = EtsyClient()
+    etsy_client = get_etsy_client()
     aggregator = MetricsAggregator()
 
-    raw_data = await etsy_client.get_listings_stats(shop_id, from_date, to_date, limit)
-    listings = aggregator.aggregate_listings_metrics(raw_data)
+    ranking_list = [r.strip() for r in rankings.split(",") if r.strip()]
+    unknown = set(ranking_list) - set(RANKING_KEYS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown rankings: {', '.join(sorted(unknown))}")
+
+    async def versions():
+        return await etsy_client.listings_version(shop_id, from_date, to_date)
+
+    async def render():
+        pages = etsy_client.iter_listing_pages(shop_id, from_date, to_date)
+        return await aggregator.listings_payload_stream(pages, limit, top_n, ranking_list)
 
-    return listings
+    return await _conditional(request, versions, render)
 
 @router.get("/trends", response_model=TrendsResponse)
 async def get_trends(
+    request: Request,
     shop_id: str = Query(..., description="Shop ID"),
     from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    series: str = Query("revenue,orders,visits,views", description="Comma-separated series names")
+    series: str = Query("revenue,orders,visits,views", description="Comma-separated series names"),
+    granularity: str = Query("day", description=f"Bucket size: {', '.join(GRANULARITIES)}")
 ):
-    """Get time series trends data"""
-    etsy_client = EtsyClient()
-    aggregator = MetricsAggregator()
+    """Get time series trends data
+
+    Ranges already synced into the time-series store are answered from it
+    without an upstream fetch; week and month buckets are pre-aggregated.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity: {granularity}")
+    _validate_dates(from_date, to_date)
 
+    aggregator = MetricsAggregator()
+    store = get_timeseries_store()
     series_list = [s.strip() for s in series.split(",")]
-    raw_data = await etsy_client.get_trends_data(shop_id, from_date, to_date, series_list)
-    trends = aggregator.aggregate_trends(raw_data, series_list)
 
-    return trends
+    async def versions():
+        store_version = store.version(shop_id)
+        if store.covers(shop_id, [s for s in series_list if s in SERIES], from_date, to_date):
+            return None if store_version is None else (store_version,)
+        stored_at = await get_etsy_client().version("trends_data", shop_id, from_date, to_date,
+                                                    tuple(sorted(series_list)))
+        return None if stored_at is None else (stored_at, store_version if granularity != "day" else None)
+
+    async def render():
+        raw_data = await _trend_points(shop_id, from_date, to_date, series_list, granularity)
+        return aggregator.trends_payload(raw_data, series_list)
+
+    return await _conditional(request, versions, render)
+
+def _validate_dates(*values: Optional[str]):
+    """Reject dates that are not YYYY-MM-DD before they reach the time-series store"""
+    for value in values:
+        if value is None:
+            continue
+        try:
+            date.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid date, expected YYYY-MM-DD: {value}")
+
+async def _trend_points(shop_id: str, from_date: Optional[str], to_date: Optional[str],
+                        series_list: List[str], granularity: str) -> Dict[str, Any]:
+    """Raw trend points, from the time-series store when it covers the range"""
+    store = get_timeseries_store()
+    known = [s for s in series_list if s in SERIES]
+    if store.covers(shop_id, known, from_date, to_date):
+        return store.query(shop_id, known, granularity, from_date, to_date)
+
+    raw_data = await get_etsy_client().get_trends_data(shop_id, from_date, to_date, series_list)
+    if granularity != "day":
+        raw_data = store.query(shop_id, known, granularity, from_date, to_date)
+    return raw_data
 
 @router.get("/funnel", response_model=FunnelMetrics)
 async def get_funnel_metrics(
+    request: Request,
     shop_id: str = Query(..., description="Shop ID"),
     from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
 ):
     """Get conversion funnel metrics"""
-    etsy_client = EtsyClient()
+    etsy_client = get_etsy_client()
+    aggregator = MetricsAggregator()
+
+    async def versions():
+        stored_at = await etsy_client.version("funnel_stats", shop_id, from_date, to_date)
+        return None if stored_at is None else (stored_at,)
+
+    async def render():
+        raw_data = await etsy_client.get_funnel_stats(shop_id, from_date, to_date)
+        return aggregator.aggregate_funnel_metrics(raw_data)
+
+    return await _conditional(request, versions, render)
+
+@router.get("/live")
+async def live_updates(
+    request: Request,
+    shop_id: str = Query(..., description="Shop ID")
+):
+    """Server-sent events with changed KPI fields, deltas and new trend points for a shop"""
+    hub = get_live_updates()
+    keepalive = float(os.getenv("LIVE_KEEPALIVE", "15"))
+
+    async def stream():
+        subscription = hub.subscribe(shop_id)
+        try:
+            while not await request.is_disconnected():
+                event = await subscription.next(timeout=keepalive)
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _conditional(request: Request, versions: Callable[[], Awaitable[Optional[tuple]]],
+                       render: Callable[[], Awaitable[Any]]) -> Response:
+    """Render a metrics response with an ETag, answering 304 when the client's copy is current
+
+    When every underlying cache entry and store is fresh, the ETag is built from
+    their versions and a matching If-None-Match returns 304 without fetching or
+    rendering; other clients get the body encoded for that ETag earlier, if any.
+    Otherwise the ETag is a hash of the rendered body.
+
+    render returns a response model or a plain dict shaped like the route's
+    response_model, which is encoded without re-validation.
+    """
+    request_key = (request.url.path, sorted(request.query_params.multi_items()))
+    bodies = get_body_cache()
+    before = await versions()
+    if before is not None:
+        etag = make_etag(*request_key, *before)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        body = bodies.get(etag)
+        if body is not None:
+            return json_response(request, body, etag)
+
+    body = encode_json(await render())
+    # A refresh landing mid-render would make the versions describe newer data than the body
+    after = await versions()
+    if after is not None and after == before:
+        etag = make_etag(*request_key, *after)
+        bodies.put(etag, body)
+    else:
+        etag = make_etag(body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_response(request, body, etag)
+
+@router.get("/dashboard", response_model=DashboardResponse)
+async def get_dashboard(
+    shop_id: str = Query(..., description="Shop ID"),
+    from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    fields: str = Query(",".join(DASHBOARD_FIELDS), description="Comma-separated metric families to include"),
+    limit: int = Query(50, description="Number of listings to return"),
+    series: str = Query("revenue,orders,visits,views", description="Comma-separated series names")
+):
+    """Get every dashboard metric family in one response, fetched concurrently"""
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(selected) - set(DASHBOARD_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    etsy_client = get_etsy_client()
+    aggregator = MetricsAggregator()
+    series_list = [s.strip() for s in series.split(",")]
+
+    async def shop():
+        return await etsy_client.get_shop_stats(shop_id, from_date, to_date)
+
+    async def listings():
+        pages = etsy_client.iter_listing_pages(shop_id, from_date, to_date)
+        return await aggregator.aggregate_listings_stream(pages, limit)
+
+    async def trends():
+        raw_data = await etsy_client.get_trends_data(shop_id, from_date, to_date, series_list)
+        return aggregator.aggregate_trends(raw_data, series_list)
+
+    async def funnel():
+        return aggregator.aggregate_funnel_metrics(await etsy_client.get_funnel_stats(shop_id, from_date, to_date))
+
+    families = {"shop": shop, "listings": listings, "trends": trends, "funnel": funnel}
+    results = dict(zip(selected, await asyncio.gather(*(families[field]() for field in selected))))
+    if "shop" in results:
+        # Aggregate after the trends family has fed the rollups so deltas see this fetch
+        periods = get_rollup_store().compare_windows(shop_id, from_date, to_date)
+        results["shop"] = aggregator.aggregate_shop_metrics(results["shop"], periods)
+    return DashboardResponse(**results)
+
+@router.get("/portfolio", response_class=StreamingResponse)
+async def get_portfolio_metrics(
+    shop_ids: str = Query(..., description="Comma-separated shop IDs"),
+    from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
+):
+    """Stream KPIs for many shops as NDJSON, one line per shop as it finishes
+
+    Shops are fetched with bounded concurrency and a per-shop timeout. The last
+    line is a summary with portfolio totals and per-metric shop rankings.
+    """
+    shops = list(dict.fromkeys(s.strip() for s in shop_ids.split(",") if s.strip()))
+    if not shops:
+        raise HTTPException(status_code=400, detail="No shop IDs given")
+    if len(shops) > PORTFOLIO_MAX_SHOPS:
+        raise HTTPException(status_code=400, detail=f"At most {PORTFOLIO_MAX_SHOPS} shops per request")
+
+    etsy_client = get_etsy_client()
     aggregator = MetricsAggregator()
+    semaphore = asyncio.Semaphore(int(os.getenv("PORTFOLIO_CONCURRENCY", "8")))
+    timeout = float(os.getenv("PORTFOLIO_SHOP_TIMEOUT", "10"))
+
+    async def fetch(shop_id: str):
+        async with semaphore:
+            try:
+                metrics = await asyncio.wait_for(
+                    _shop_metrics(etsy_client, aggregator, shop_id, from_date, to_date), timeout
+                )
+                return shop_id, metrics, None
+            except asyncio.TimeoutError:
+                return shop_id, None, "timeout"
+            except Exception as e:
+                return shop_id, None, str(e) or type(e).__name__
+
+    async def stream():
+        tasks = [asyncio.ensure_future(fetch(shop_id)) for shop_id in shops]
+        completed, failed = {}, []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                shop_id, metrics, error = await next_done
+                if error is None:
+                    completed[shop_id] = metrics
+                    line = {"type": "shop", "shop_id": shop_id, "metrics": metrics.model_dump()}
+                else:
+                    failed.append(shop_id)
+                    line = {"type": "error", "shop_id": shop_id, "detail": error}
+                yield json.dumps(line) + "\n"
+
+            summary = aggregator.aggregate_portfolio(completed, failed)
+            yield json.dumps({"type": "summary", **summary.model_dump()}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/listings/export", response_class=StreamingResponse)
+async def export_listings(
+    shop_id: str = Query(..., description="Shop ID"),
+    from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    format: str = Query("ndjson", description=f"Export format: {', '.join(EXPORT_FORMATS)}")
+):
+    """Stream every listing's metrics as NDJSON or CSV, page by page"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
+    etsy_client = get_etsy_client()
+    pages = etsy_client.iter_listing_pages(shop_id, from_date, to_date)
+    try:
+        # Fetch the first page before the response starts so upstream and auth errors get a status code
+        first = await anext(pages, [])
+    except BaseException:
+        await pages.aclose()
+        raise
+
+    async def rows():
+        async with aclosing(pages):
+            page = first
+            while True:
+                for listing in page:
+                    yield {**listing, "conversion_rate": round(RANKING_KEYS["conversion"](listing), 2)}
+                page = await anext(pages, None)
+                if page is None:
+                    return
+
+    return _export_response(stream_rows(rows(), format, LISTING_EXPORT_COLUMNS), format, f"listings-{shop_id}")
+
+@router.get("/trends/export", response_class=StreamingResponse)
+async def export_trends(
+    shop_id: str = Query(..., description="Shop ID"),
+    from_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    series: str = Query("revenue,orders,visits,views", description="Comma-separated series names"),
+    granularity: str = Query("day", description=f"Bucket size: {', '.join(GRANULARITIES)}"),
+    format: str = Query("ndjson", description=f"Export format: {', '.join(EXPORT_FORMATS)}")
+):
+    """Stream trends as NDJSON or CSV with one row per date and a column per series"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity: {granularity}")
+    _validate_dates(from_date, to_date)
+
+    series_list = [s.strip() for s in series.split(",") if s.strip() in SERIES]
+    raw_data = await _trend_points(shop_id, from_date, to_date, series_list, granularity)
+
+    async def rows():
+        by_date: Dict[str, Dict[str, Any]] = {}
+        for name in series_list:
+            for point in raw_data.get(name, []):
+                by_date.setdefault(point["date"], {"date": point["date"]})[name] = point["value"]
+        for day in sorted(by_date):
+            yield by_date[day]
 
-    raw_data = await etsy_client.get_funnel_stats(shop_id, from_date, to_date)
-    funnel = aggregator.aggregate_funnel_metrics(raw_data)
+    return _export_response(stream_rows(rows(), format, ["date", *series_list]), format, f"trends-{shop_id}")
 
-    return funnel
\ No newline at end of file
+def _export_response(lines, format: str, name: str) -> StreamingResponse:
+    """Wrap encoded export lines in a downloadable streaming response"""
+    return StreamingResponse(
+        lines,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'}
+    )
@@ -1,26 +1,25 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from typing import Dict, Any
-from app.agent.graph import ReportsAgent
-import os
+from app.agent.heuristics import analyze_listings
+from app.services.reports import get_report_service, shop_listing_columns
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 @router.get("/summary")
-async def get_summary_report() -> Dict[str, Any]:
-    """Generate AI-powered summary report or heuristic fallback"""
-    llm_provider = os.getenv("LLM_PROVIDER", "none")
+async def get_summary_report(
+    shop_id: str = Query("demo_shop", description="Shop ID")
+) -> Dict[str, Any]:
+    """Get the shop's AI-powered summary report or heuristic fallback
 
-    if llm_provider != "none":
-        # Use LangGraph agent
-        agent = ReportsAgent()
-        summary = await agent.generate_summary()
-    else:
-        # Use heuristic fallback
-        from app.agent.heuristics import generate_heuristic_summary
-        summary = generate_heuristic_summary()
+    Reports are precomputed after sync and only regenerated when the shop's
+    KPIs change meaningfully, so this is normally served straight from cache.
+    """
+    return await get_report_service().get(shop_id)
 
-    return {
-        "summary": summary,
-        "generated_with": "ai" if llm_provider != "none" else "heuristics",
-        "provider": llm_provider
-    }
\ No newline at end of file
+@router.get("/listings")
+async def get_listing_issues(
+    shop_id: str = Query("demo_shop", description="Shop ID"),
+    examples: int = Query(3, ge=0, le=20, description="Example listings per issue")
+) -> Dict[str, Any]:
+    """Catalog-wide listing issues ranked by estimated missed orders, with suggestions"""
+    return analyze_listings(await shop_listing_columns(shop_id), examples)
@@ -1,12 +1,131 @@
-from typing import Dict, Any, List
-from app.models.kpis import ShopMetrics, KPIDeltas, ListingsResponse, TrendsResponse, FunnelMetrics, TopListingItem, TopListings, TrendPoint
+import heapq
+from typing import Dict, Any, AsyncIterable, Callable, Iterable, List, Optional, Tuple
+from app.models.kpis import ShopMetrics, KPIDeltas, ListingsResponse, TrendsResponse, FunnelMetrics, TopListings, PortfolioSummary, PortfolioTotals
+
+def _conversion(listing: Dict[str, Any]) -> float:
+    views = listing.get("views", 0)
+    return listing.get("orders", 0) / views * 100 if views > 0 else 0.0
+
+def _revenue_per_view(listing: Dict[str, Any]) -> float:
+    views = listing.get("views", 0)
+    return listing.get("revenue", 0.0) / views if views > 0 else 0.0
+
+# Ranking name -> score function over a raw listing dict
+RANKING_KEYS: Dict[str, Callable[[Dict[str, Any]], float]] = {
+    "views": lambda listing: listing.get("views", 0),
+    "orders": lambda listing: listing.get("orders", 0),
+    "revenue": lambda listing: listing.get("revenue", 0.0),
+    "conversion": _conversion,
+    "revenue_per_view": _revenue_per_view
+}
+
+DEFAULT_RANKINGS = ("views", "orders", "revenue")
+
+# Shop metrics that portfolio rankings can order shops by
+PORTFOLIO_RANKINGS = ("gmv", "orders", "visits", "conversion_rate")
+
+# Additive shop metrics summed into portfolio totals
+PORTFOLIO_SUMS = ("orders", "gmv", "visits", "views", "favorites", "cart_adds", "refunds")
+
+class TopKTracker:
+    """One-pass top-K over raw listings for several rankings using bounded min-heaps
+
+    Each push costs O(r log k) for r rankings. Ties keep the earlier listing, matching
+    a stable descending sort of the whole catalog.
+    """
+
+    def __init__(self, k: int = 5, rankings: Iterable[str] = DEFAULT_RANKINGS):
+        unknown = set(rankings) - set(RANKING_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown rankings: {', '.join(sorted(unknown))}")
+        self.k = k
+        self.rankings = tuple(rankings)
+        self._heaps: Dict[str, List[Tuple[float, int, Dict[str, Any]]]] = {name: [] for name in self.rankings}
+        self._count = 0
+
+    def push(self, listing: Dict[str, Any]) -> int:
+        """Offer a listing to every ranking, returning its position in the stream"""
+        index = self._count
+        self._count += 1
+        if self.k <= 0:
+            return index
+
+        for name in self.rankings:
+            heap = self._heaps[name]
+            entry = (RANKING_KEYS[name](listing), -index, listing)
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+        return index
+
+    def push_many(self, listings: Iterable[Dict[str, Any]]):
+        """Offer every listing from an iterable or generator"""
+        for listing in listings:
+            self.push(listing)
+
+    def top(self, name: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """Get (stream position, listing) pairs for a ranking, best first"""
+        ranked = sorted(self._heaps[name], key=lambda entry: entry[:2], reverse=True)
+        return [(-neg_index, listing) for _, neg_index, listing in ranked]
+
+def _to_row(listing: Dict[str, Any]) -> Dict[str, Any]:
+    """Raw listing as a plain dict shaped like TopListingItem"""
+    return {
+        "listing_id": int(listing.get("listing_id", 0)),
+        "title": str(listing.get("title", "")),
+        "views": int(listing.get("views", 0)),
+        "orders": int(listing.get("orders", 0)),
+        "revenue": float(listing.get("revenue", 0.0)),
+        "etsy_url": str(listing.get("etsy_url", ""))
+    }
+
+class ListingsAccumulator:
+    """Fold pages of raw listings into a ListingsResponse without keeping whole pages around
+
+    Only listings that end up in the response are converted, into plain dicts
+    that can be encoded directly or validated into the response model.
+    """
+
+    def __init__(self, limit: Optional[int] = None, top_n: int = 5,
+                 rankings: Iterable[str] = DEFAULT_RANKINGS):
+        self.limit = limit
+        self.items: List[Dict[str, Any]] = []
+        self._tracker = TopKTracker(top_n, rankings)
+
+    def add_page(self, listings: Iterable[Dict[str, Any]]):
+        """Add one page of raw listings"""
+        for listing in listings:
+            self._tracker.push(listing)
+            if self.limit is None or len(self.items) < self.limit:
+                self.items.append(_to_row(listing))
+
+    def payload(self) -> Dict[str, Any]:
+        """Response body as plain dicts, skipping model construction"""
+        top: Dict[str, List[Dict[str, Any]]] = {field: [] for field in TopListings.model_fields}
+        for name in self._tracker.rankings:
+            # Reuse rows already built for items instead of constructing duplicates
+            top[f"by_{name}"] = [
+                self.items[index] if index < len(self.items) else _to_row(listing)
+                for index, listing in self._tracker.top(name)
+            ]
+        return {"items": self.items, "top": top}
+
+    def result(self) -> ListingsResponse:
+        """Build the response from everything added so far"""
+        return ListingsResponse.model_validate(self.payload())
 
 class MetricsAggregator:
     """Service for aggregating and transforming raw Etsy data into structured metrics"""
 
-    def aggregate_shop_metrics(self, raw_data: Dict[str, Any]) -> ShopMetrics:
-        """Aggregate raw shop data into structured metrics"""
-        deltas = KPIDeltas()  # TODO: Calculate actual deltas
+    def aggregate_shop_metrics(self, raw_data: Dict[str, Any],
+                               periods: Optional[Tuple[Dict[str, float], Dict[str, float]]] = None) -> ShopMetrics:
+        """Aggregate raw shop data into structured metrics
+
+        periods holds (current, previous) window totals from the rollup store;
+        without them deltas are left empty.
+        """
+        deltas = self.calculate_deltas(*periods) if periods else KPIDeltas()
 
         return ShopMetrics(
             orders=raw_data.get("orders", 0),
@@ -20,54 +139,46 @@ class MetricsAggregator:
             deltas=deltas
         )
 
-    def aggregate_listings_metrics(self, raw_data: Dict[str, Any]) -> ListingsResponse:
+    def aggregate_listings_metrics(self, raw_data: Dict[str, Any], top_n: int = 5,
+                                   rankings: Iterable[str] = DEFAULT_RANKINGS) -> ListingsResponse:
         """Aggregate raw listings data into structured metrics"""
-        listings = raw_data.get("listings", [])
-        items = []
-
-        for listing in listings:
-            item = TopListingItem(
-                listing_id=listing.get("listing_id", 0),
-                title=listing.get("title", ""),
-                views=listing.get("views", 0),
-                orders=listing.get("orders", 0),
-                revenue=listing.get("revenue", 0.0),
-                etsy_url=listing.get("etsy_url", "")
-            )
-            items.append(item)
-
-        # Create top listings by different metrics
-        top_by_views = sorted(items, key=lambda x: x.views, reverse=True)[:5]
-        top_by_orders = sorted(items, key=lambda x: x.orders, reverse=True)[:5]
-        top_by_revenue = sorted(items, key=lambda x: x.revenue, reverse=True)[:5]
-
-        top = TopListings(
-            by_views=top_by_views,
-            by_orders=top_by_orders,
-            by_revenue=top_by_revenue
-        )
-
-        return ListingsResponse(items=items, top=top)
+        accumulator = ListingsAccumulator(top_n=top_n, rankings=rankings)
+        accumulator.add_page(raw_data.get("listings", []))
+        return accumulator.result()
+
+    async def aggregate_listings_stream(self, pages: AsyncIterable[List[Dict[str, Any]]],
+                                        limit: Optional[int] = None, top_n: int = 5,
+                                        rankings: Iterable[str] = DEFAULT_RANKINGS) -> ListingsResponse:
+        """Aggregate listings page by page, keeping at most limit items plus the top performers"""
+        return (await self._accumulate_listings(pages, limit, top_n, rankings)).result()
+
+    async def listings_payload_stream(self, pages: AsyncIterable[List[Dict[str, Any]]],
+                                      limit: Optional[int] = None, top_n: int = 5,
+                                      rankings: Iterable[str] = DEFAULT_RANKINGS) -> Dict[str, Any]:
+        """Like aggregate_listings_stream, but returns the body as plain dicts ready to encode"""
+        return (await self._accumulate_listings(pages, limit, top_n, rankings)).payload()
+
+    async def _accumulate_listings(self, pages: AsyncIterable[List[Dict[str, Any]]], limit: Optional[int],
+                                   top_n: int, rankings: Iterable[str]) -> ListingsAccumulator:
+        accumulator = ListingsAccumulator(limit=limit, top_n=top_n, rankings=rankings)
+        async for page in pages:
+            accumulator.add_page(page)
+        return accumulator
 
     def aggregate_trends(self, raw_data: Dict[str, Any], series_list: List[str]) -> TrendsResponse:
         """Aggregate raw trends data into time series"""
-        trends = TrendsResponse(
-            revenue=[],
-            orders=[],
-            visits=[],
-            views=[]
-        )
+        return TrendsResponse.model_validate(self.trends_payload(raw_data, series_list))
 
+    def trends_payload(self, raw_data: Dict[str, Any], series_list: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Trends response body as plain dicts, skipping a TrendPoint per point"""
+        payload: Dict[str, List[Dict[str, Any]]] = {name: [] for name in TrendsResponse.model_fields}
         for series_name in series_list:
-            if series_name in raw_data and hasattr(trends, series_name):
-                series_data = raw_data[series_name]
-                trend_points = [
-                    TrendPoint(date=point["date"], value=point["value"])
-                    for point in series_data
+            if series_name in raw_data and series_name in payload:
+                payload[series_name] = [
+                    {"date": str(point["date"]), "value": float(point["value"])}
+                    for point in raw_data[series_name]
                 ]
-                setattr(trends, series_name, trend_points)
-
-        return trends
+        return payload
 
     def aggregate_funnel_metrics(self, raw_data: Dict[str, Any]) -> FunnelMetrics:
         """Aggregate raw funnel data into structured metrics"""
@@ -77,6 +188,21 @@ class MetricsAggregator:
             conversion_rate=raw_data.get("conversion_rate", 0.0)
         )
 
+    def aggregate_portfolio(self, shops: Dict[str, ShopMetrics], failed: Iterable[str] = (),
+                            rankings: Iterable[str] = PORTFOLIO_RANKINGS) -> PortfolioSummary:
+        """Sum shop metrics into portfolio totals and rank shops by each metric, best first"""
+        totals = {key: sum(getattr(metrics, key) for metrics in shops.values()) for key in PORTFOLIO_SUMS}
+        totals["conversion_rate"] = round(totals["orders"] / totals["visits"] * 100, 2) if totals["visits"] else 0.0
+
+        return PortfolioSummary(
+            totals=PortfolioTotals(shops=len(shops), **totals),
+            rankings={
+                key: sorted(shops, key=lambda shop_id: getattr(shops[shop_id], key), reverse=True)
+                for key in rankings
+            },
+            failed=sorted(failed)
+        )
+
     def calculate_deltas(self, current: Dict[str, Any], previous: Dict[str, Any]) -> KPIDeltas:
         """Calculate percentage deltas between current and previous periods"""
         deltas = KPIDeltas()
@@ -1,82 +1,352 @@
 import os
 import json
-from typing import Any, Optional
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import uuid
 import asyncio
-from datetime import datetime, timedelta
+from app.services.memory_cache import MemoryLRUCache
+from app.services.redis_backend import RedisBackend, RedisUnavailable
+from app.services.serialization import Serializer
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "etsynova:cache:invalidate"
+
+# Keys are auto-tagged with their leading colon-delimited segments, from two up to this many;
+# a single-segment tag such as prefix:etsy would link nearly every key
+PREFIX_TAG_DEPTH = 3
 
 class CacheService:
-    """Simple cache service with in-memory fallback and Redis support"""
+    """Two-tier cache: a bounded per-process memory L1 in front of a shared Redis L2
+
+    Writes and deletes are broadcast over Redis pub/sub so other workers drop
+    their L1 copies. Without Redis the memory tier is the only tier.
+    """
 
     def __init__(self):
         self.use_redis = os.getenv("USE_REDIS_CACHE", "false") == "true"
-        self._memory_cache = {}
-        self._redis_client = None
+        self.l1_ttl = int(os.getenv("CACHE_L1_TTL", "30"))
+        self.instance_id = uuid.uuid4().hex
+        self._memory_cache = MemoryLRUCache()
+        self._serializer = Serializer()
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
 
         if self.use_redis:
             try:
-                import redis
-                redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-                self._redis_client = redis.from_url(redis_url)
+                self._redis = RedisBackend()
             except ImportError:
                 print("Redis not available, falling back to memory cache")
                 self.use_redis = False
 
+        # Tier counters
+        self._l1_hits = 0
+        self._l2_hits = 0
+        self._tier_misses = 0
+        self._invalidations_sent = 0
+        self._invalidations_received = 0
+
+        # Read-through counters
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._forced = 0
+        self._refresh_errors = 0
+        self._fallbacks = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
-        if self.use_redis and self._redis_client:
-            try:
-                value = self._redis_client.get(key)
-                if value:
-                    return json.loads(value)
-            except Exception:
-                pass
+        """Get value from L1, then L2"""
+        value = self._memory_cache.get(key)
+        if value is not None:
+            self._l1_hits += 1
+            return value
 
-        # Fallback to memory cache
-        entry = self._memory_cache.get(key)
-        if entry and self._is_valid(entry):
-            return entry["value"]
+        if self._redis:
+            try:
+                raw = await self._redis.get(key)
+                if raw is not None:
+                    value = self._serializer.loads(raw)
+                    self._l2_hits += 1
+                    self._memory_cache.set(key, value, self.l1_ttl, self._prefix_tags(key))
+                    return value
+            except RedisUnavailable:
+                self._fallbacks += 1
 
+        self._tier_misses += 1
         return None
 
-    async def set(self, key: str, value: Any, ttl: int = 60) -> bool:
-        """Set value in cache with TTL in seconds"""
-        if self.use_redis and self._redis_client:
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several values, fetching L1 misses from L2 in one round trip"""
+        found = {}
+        for key in keys:
+            value = self._memory_cache.get(key)
+            if value is not None:
+                found[key] = value
+        self._l1_hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if self._redis and missing:
             try:
-                self._redis_client.setex(key, ttl, json.dumps(value))
-                return True
-            except Exception:
-                pass
+                values = await self._redis.mget(missing)
+                for key, raw in zip(missing, values):
+                    if raw is not None:
+                        found[key] = self._serializer.loads(raw)
+                        self._l2_hits += 1
+                        self._memory_cache.set(key, found[key], self.l1_ttl, self._prefix_tags(key))
+            except RedisUnavailable:
+                self._fallbacks += 1
 
-        # Fallback to memory cache
-        self._memory_cache[key] = {
-            "value": value,
-            "expires_at": datetime.now() + timedelta(seconds=ttl)
-        }
+        self._tier_misses += len(keys) - len(found)
+        return found
+
+    async def set(self, key: str, value: Any, ttl: int = 60, tags: Iterable[str] = ()) -> bool:
+        """Set value in both tiers with TTL in seconds and optional invalidation tags"""
+        return await self.set_many({key: value}, ttl, tags)
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = 60, tags: Iterable[str] = ()) -> bool:
+        """Set several values with a shared TTL and tags in one round trip"""
+        tags = tuple(tags)
+        l1_ttl = ttl
+        if self._redis:
+            try:
+                await self._redis.mset(
+                    {key: self._serializer.dumps(value) for key, value in items.items()},
+                    ttl,
+                    {key: tags + self._prefix_tags(key) for key in items}
+                )
+                l1_ttl = min(ttl, self.l1_ttl)
+                await self._broadcast_invalidation(list(items))
+            except RedisUnavailable:
+                self._fallbacks += 1
+
+        for key, value in items.items():
+            self._memory_cache.set(key, value, l1_ttl, tags + self._prefix_tags(key))
         return True
 
     async def delete(self, key: str) -> bool:
-        """Delete value from cache"""
-        if self.use_redis and self._redis_client:
+        """Delete value from both tiers and from other workers' L1"""
+        self._memory_cache.delete(key)
+        if self._redis:
             try:
-                self._redis_client.delete(key)
-            except Exception:
-                pass
+                await self._redis.delete(key, tags=self._prefix_tags(key))
+                await self._broadcast_invalidation([key])
+            except RedisUnavailable:
+                self._fallbacks += 1
+        return True
 
-        if key in self._memory_cache:
-            del self._memory_cache[key]
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying any of the tags, in both tiers and on every worker
 
-        return True
+        Cost is proportional to the number of tagged entries; the keyspace is never scanned.
+        """
+        tags = list(tags)
+        keys = set()
+        for tag in tags:
+            keys.update(self._memory_cache.invalidate_tag(tag))
+
+        if self._redis:
+            try:
+                redis_keys = await self._redis.invalidate_tags(tags)
+                for key in redis_keys:
+                    self._memory_cache.delete(key)
+                keys.update(redis_keys)
+                await self._broadcast_invalidation(sorted(keys), tags)
+            except RedisUnavailable:
+                self._fallbacks += 1
+                logger.warning(f"Redis unavailable, tags {tags} only invalidated locally")
+
+        return len(keys)
+
+    async def invalidate_prefix(self, prefix: str) -> int:
+        """Delete every entry whose key starts with a segment prefix such as etsy:shop_stats"""
+        depth = len(prefix.split(":"))
+        if not 2 <= depth <= PREFIX_TAG_DEPTH:
+            raise ValueError(f"Prefix invalidation supports 2 to {PREFIX_TAG_DEPTH} key segments")
+        return await self.invalidate_tags([f"prefix:{prefix}"])
+
+    async def acquire_lease(self, name: str, ttl: int) -> bool:
+        """Take or renew a lease shared by every worker on this Redis
 
-    def _is_valid(self, entry: dict) -> bool:
-        """Check if cache entry is still valid"""
-        return datetime.now() < entry["expires_at"]
+        Without Redis each process holds its own lease. While Redis is
+        unreachable nobody does, so work is skipped rather than duplicated.
+        """
+        if not self._redis:
+            return True
+        try:
+            return await self._redis.acquire_lease(name, self.instance_id, ttl)
+        except RedisUnavailable:
+            logger.warning(f"Redis unavailable, lease {name} not held")
+            return False
+
+    async def release_lease(self, name: str):
+        """Give up a lease so another worker can take it over without waiting for expiry"""
+        if not self._redis:
+            return
+        try:
+            await self._redis.release_lease(name, self.instance_id)
+        except RedisUnavailable:
+            pass
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int = 60,
+                         stale_ttl: Optional[int] = None, tags: Iterable[str] = (), refresh: bool = False) -> Any:
+        """Read through the cache, serving stale entries while refreshing in the background
+
+        Entries younger than ttl are fresh. Entries between ttl and stale_ttl are
+        returned immediately and reloaded in the background. Anything older is a miss.
+        With refresh the loader always runs and its result replaces the entry.
+        """
+        stale_ttl = max(stale_ttl or ttl, ttl)
+        if refresh:
+            self._forced += 1
+            return await self._load_and_store(key, loader, stale_ttl, tags)
+
+        entry = await self.get(key)
+
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age < ttl:
+                self._hits += 1
+                return entry["value"]
+            if age < stale_ttl:
+                self._stale += 1
+                self._refresh_in_background(key, loader, stale_ttl, tags)
+                return entry["value"]
+
+        self._misses += 1
+        return await self._load_and_store(key, loader, stale_ttl, tags)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-tier and read-through cache statistics"""
+        lookups = self._hits + self._stale + self._misses
+        tier_lookups = self._l1_hits + self._l2_hits + self._tier_misses
+        l2_lookups = tier_lookups - self._l1_hits
+        return {
+            "backend": "redis" if self._redis else "memory",
+            "hits": self._hits,
+            "stale_hits": self._stale,
+            "misses": self._misses,
+            "forced_refreshes": self._forced,
+            "refreshing": len(self._refreshing),
+            "refresh_errors": self._refresh_errors,
+            "hit_ratio": round((self._hits + self._stale) / lookups, 4) if lookups else 0.0,
+            "redis_fallbacks": self._fallbacks,
+            "tiers": {
+                "l1": {
+                    "hits": self._l1_hits,
+                    "hit_ratio": round(self._l1_hits / tier_lookups, 4) if tier_lookups else 0.0
+                },
+                "l2": {
+                    "hits": self._l2_hits,
+                    "hit_ratio": round(self._l2_hits / l2_lookups, 4) if l2_lookups else 0.0
+                },
+                "misses": self._tier_misses
+            },
+            "invalidations": {
+                "sent": self._invalidations_sent,
+                "received": self._invalidations_received
+            },
+            "memory": self._memory_cache.stats(),
+            "redis": self._redis.stats() if self._redis else None
+        }
+
+    async def _load_and_store(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int,
+                              tags: Iterable[str] = ()) -> Any:
+        """Call the loader and store its result in an envelope stamped with the load time"""
+        value = await loader()
+        await self.set(key, {"value": value, "stored_at": time.time()}, ttl, tags)
+        return value
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int,
+                               tags: Iterable[str] = ()):
+        """Reload a stale entry without blocking the caller, at most once per key"""
+        loop = asyncio.get_running_loop()
+        task = self._refreshing.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+
+        task = loop.create_task(self._load_and_store(key, loader, ttl, tags))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda done: self._refresh_done(key, done))
+
+    def _refresh_done(self, key: str, task: asyncio.Task):
+        """Clean up after a background refresh"""
+        if self._refreshing.get(key) is task:
+            del self._refreshing[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._refresh_errors += 1
+            logger.warning(f"Background refresh failed for {key}: {task.exception()!r}")
+
+    async def start(self):
+        """Start memory tier maintenance and the cross-worker invalidation listener"""
+        await self._memory_cache.start_sweeper()
+        if self._redis and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen_for_invalidations())
+
+    async def stop(self):
+        """Stop background tasks and close the Redis pool"""
+        await self._memory_cache.stop_sweeper()
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis:
+            await self._redis.close()
 
     async def clear_expired(self):
         """Clear expired entries from memory cache"""
-        current_time = datetime.now()
-        expired_keys = [
-            key for key, entry in self._memory_cache.items()
-            if current_time >= entry["expires_at"]
-        ]
-        for key in expired_keys:
-            del self._memory_cache[key]
\ No newline at end of file
+        self._memory_cache.purge_expired()
+
+    @staticmethod
+    def _prefix_tags(key: str) -> Tuple[str, ...]:
+        """Tags for the leading segments of a colon-delimited key, used for prefix invalidation"""
+        segments = key.split(":")
+        return tuple(
+            f"prefix:{':'.join(segments[:depth])}"
+            for depth in range(2, min(len(segments), PREFIX_TAG_DEPTH + 1))
+        )
+
+    async def _broadcast_invalidation(self, keys: List[str], tags: List[str] = ()):
+        """Tell other workers to drop their L1 copies of these keys and tags"""
+        message = json.dumps({"origin": self.instance_id, "keys": keys, "tags": list(tags)})
+        await self._redis.publish(INVALIDATION_CHANNEL, message)
+        self._invalidations_sent += 1
+
+    def _apply_invalidation(self, raw: bytes):
+        """Drop L1 entries named in an invalidation message from another worker"""
+        message = json.loads(raw)
+        if message.get("origin") == self.instance_id:
+            return
+        for key in message.get("keys", []):
+            self._memory_cache.delete(key)
+        for tag in message.get("tags", []):
+            self._memory_cache.invalidate_tag(tag)
+        self._invalidations_received += 1
+
+    async def _listen_for_invalidations(self):
+        """Consume invalidation messages, resubscribing after connection loss"""
+        while True:
+            try:
+                async for raw in self._redis.listen(INVALIDATION_CHANNEL):
+                    self._apply_invalidation(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener dropped: {e!r}")
+
+            # Messages may have been missed while disconnected
+            self._memory_cache.clear()
+            await asyncio.sleep(1.0)
+
+_cache_service: Optional[CacheService] = None
+
+def get_cache_service() -> CacheService:
+    """Get the process-wide cache service"""
+    global _cache_service
+    if _cache_service is None:
+        _cache_service = CacheService()
+    return _cache_service
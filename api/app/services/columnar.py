@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Column name -> default for listings missing the field
+LISTING_COLUMNS = {"views": 0, "orders": 0, "revenue": 0.0, "favorites": 0}
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise division that yields 0 where the denominator is 0"""
+    out = np.zeros(len(numerator), dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+class ListingColumns:
+    """Columnar view of a shop's listings for vectorized analytics
+
+    Numeric fields live in NumPy arrays indexed by catalog position; titles and
+    URLs stay as Python lists and are only touched for the rows a caller asks for.
+    """
+
+    def __init__(self, listing_ids: np.ndarray, views: np.ndarray, orders: np.ndarray,
+                 revenue: np.ndarray, favorites: Optional[np.ndarray] = None,
+                 titles: Optional[List[str]] = None, urls: Optional[List[str]] = None):
+        self.listing_ids = np.asarray(listing_ids, dtype=np.int64)
+        self.views = np.asarray(views, dtype=np.float64)
+        self.orders = np.asarray(orders, dtype=np.float64)
+        self.revenue = np.asarray(revenue, dtype=np.float64)
+        self.favorites = np.zeros(len(self.listing_ids)) if favorites is None else np.asarray(favorites, dtype=np.float64)
+        self.titles = titles if titles is not None else [""] * len(self.listing_ids)
+        self.urls = urls if urls is not None else [""] * len(self.listing_ids)
+
+    @classmethod
+    def from_listings(cls, listings: Iterable[Dict[str, Any]]) -> "ListingColumns":
+        """Build columns from raw listing dicts in a single pass"""
+        ids, titles, urls = [], [], []
+        numeric = {name: [] for name in LISTING_COLUMNS}
+        for listing in listings:
+            ids.append(listing.get("listing_id", 0))
+            titles.append(listing.get("title", ""))
+            urls.append(listing.get("etsy_url", ""))
+            for name, default in LISTING_COLUMNS.items():
+                numeric[name].append(listing.get(name, default) or default)
+
+        return cls(ids, titles=titles, urls=urls, **{name: np.array(values, dtype=np.float64)
+                                                    for name, values in numeric.items()})
+
+    def __len__(self) -> int:
+        return len(self.listing_ids)
+
+    def conversion_rates(self) -> np.ndarray:
+        """Orders per 100 views for every listing"""
+        return _safe_divide(self.orders, self.views) * 100
+
+    def revenue_per_view(self) -> np.ndarray:
+        """Revenue per view for every listing"""
+        return _safe_divide(self.revenue, self.views)
+
+    def performance_scores(self) -> np.ndarray:
+        """Heuristic 0-100 performance score, matching analyze_listing_performance"""
+        return np.minimum(100.0, self.conversion_rates() * 30 + self.views / 10)
+
+    def top_k(self, values: np.ndarray, k: int) -> np.ndarray:
+        """Row indices of the k largest values, best first, ties in catalog order
+
+        Uses argpartition so the cost is O(n + k log k) rather than a full sort.
+        """
+        n = len(values)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        threshold = values[np.argpartition(values, n - k)[n - k]]
+        above = np.flatnonzero(values > threshold)
+        ties = np.flatnonzero(values == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+        order = np.lexsort((candidates, -values[candidates]))
+        return candidates[order]
+
+    def percentiles(self, values: np.ndarray, q: Sequence[float] = (25, 50, 75, 90)) -> Dict[str, float]:
+        """Percentiles of a column"""
+        if len(values) == 0:
+            return {f"p{int(p)}": 0.0 for p in q}
+        return {f"p{int(p)}": float(v) for p, v in zip(q, np.percentile(values, q))}
+
+    def rows(self, indices: Iterable[int]) -> List[Dict[str, Any]]:
+        """Materialize selected rows back into listing dicts"""
+        return [
+            {
+                "listing_id": int(self.listing_ids[i]),
+                "title": self.titles[i],
+                "views": int(self.views[i]),
+                "orders": int(self.orders[i]),
+                "revenue": float(self.revenue[i]),
+                "etsy_url": self.urls[i]
+            }
+            for i in indices
+        ]
+
+    def summary(self, k: int = 5) -> Dict[str, Any]:
+        """Shop-wide totals, conversion distribution and top listings by performance score"""
+        conversion = self.conversion_rates()
+        total_views = float(self.views.sum())
+        return {
+            "listings": len(self),
+            "views": total_views,
+            "orders": float(self.orders.sum()),
+            "revenue": float(self.revenue.sum()),
+            "conversion_rate": float(self.orders.sum() / total_views * 100) if total_views else 0.0,
+            "conversion_percentiles": self.percentiles(conversion),
+            "top_by_performance": self.rows(self.top_k(self.performance_scores(), k))
+        }
@@ -1,21 +1,47 @@
 import os
 import json
+import time
 import httpx
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 from urllib.parse import urlencode
+from collections import deque
+from contextlib import aclosing
 import asyncio
-from app.services.cache import CacheService
+from app.auth.tokens import TokenUnavailable, get_token_store
+from app.services.cache import CacheService, get_cache_service
+from app.services.http_pool import get_http_pool
+from app.services.live import get_live_updates
+from app.services.rate_limiter import Priority, get_request_scheduler
+from app.services.rollups import get_rollup_store
+from app.services.shop_state import get_shop_state_store
+from app.services.singleflight import get_singleflight
+from app.services.timeseries import get_timeseries_store
 
 class EtsyClient:
     """Etsy API client with OAuth2 PKCE, retry logic, and mock mode support"""
 
-    def __init__(self):
+    # (fresh, stale) TTLs in seconds per data type
+    CACHE_TTLS = {
+        "shop_stats": (300, 3600),
+        "listings_stats": (600, 3600),
+        "listings_page": (600, 3600),
+        "trends_data": (900, 6 * 3600),
+        "funnel_stats": (600, 3600)
+    }
+
+    def __init__(self, priority: Priority = Priority.INTERACTIVE, cache: Optional[CacheService] = None,
+                 refresh: bool = False):
         self.client_id = os.getenv("ETSY_CLIENT_ID")
         self.client_secret = os.getenv("ETSY_CLIENT_SECRET")
         self.redirect_uri = os.getenv("ETSY_REDIRECT_URI")
         self.mock_mode = os.getenv("MOCK_MODE", "false") == "true"
         self.base_url = "https://openapi.etsy.com/v3/application"
-        self.cache = CacheService()
+        self.cache = cache or get_cache_service()
+        self.priority = priority
+        # Bypass fresh cache entries and always refetch, for background sync
+        self.refresh = refresh
+        self.page_size = int(os.getenv("ETSY_LISTINGS_PAGE_SIZE", "100"))
+        self.page_concurrency = int(os.getenv("ETSY_PAGE_CONCURRENCY", "4"))
 
     async def get_auth_url(self) -> str:
         """Generate Etsy OAuth authorization URL"""
@@ -42,33 +68,299 @@ class EtsyClient:
     async def get_shop_stats(self, shop_id: str, from_date: Optional[str] = None,
                            to_date: Optional[str] = None) -> Dict[str, Any]:
         """Get shop statistics"""
-        if self.mock_mode:
-            return await self._load_fixture("shop_stats")
-
-        # TODO: Implement actual Etsy API calls with retry logic
-        return {}
+        return await self._load(
+            ("shop_stats", shop_id, from_date, to_date),
+            lambda: self._fetch_shop_stats(shop_id, from_date, to_date)
+        )
 
     async def get_listings_stats(self, shop_id: str, from_date: Optional[str] = None,
                                to_date: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
         """Get listings statistics"""
-        if self.mock_mode:
-            return await self._load_fixture("listings_stats")
+        return await self._load(
+            ("listings_stats", shop_id, from_date, to_date, limit),
+            lambda: self._fetch_listings_stats(shop_id, from_date, to_date, limit)
+        )
 
-        # TODO: Implement actual Etsy API calls
-        return {}
+    async def get_listings_page(self, shop_id: str, from_date: Optional[str] = None,
+                                to_date: Optional[str] = None, offset: int = 0,
+                                page_size: Optional[int] = None) -> Dict[str, Any]:
+        """Get one page of listings with the shop's total listing count"""
+        page_size = page_size or self.page_size
+        return await self._load(
+            ("listings_page", shop_id, from_date, to_date, offset, page_size),
+            lambda: self._fetch_listings_page(shop_id, from_date, to_date, offset, page_size)
+        )
+
+    async def iter_listing_pages(self, shop_id: str, from_date: Optional[str] = None,
+                                 to_date: Optional[str] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield every page of a shop's listings in order
+
+        Pages after the first are fetched with bounded concurrency, and at most
+        page_concurrency pages are held in memory at once. Per-listing stats
+        come from the page cache, since views and favorites change without a
+        listing being modified; orders and revenue come from receipts synced
+        into the shop state store when there are any.
+        """
+        state = get_shop_state_store()
+
+        def listings(page: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return page["listings"] if self.refresh else state.with_sales(shop_id, page["listings"])
+
+        first = await self.get_listings_page(shop_id, from_date, to_date, 0)
+        yield listings(first)
+
+        pending = deque()
+        try:
+            for offset in range(self.page_size, first["count"], self.page_size):
+                pending.append(asyncio.ensure_future(
+                    self.get_listings_page(shop_id, from_date, to_date, offset)
+                ))
+                if len(pending) >= self.page_concurrency:
+                    page = await pending.popleft()
+                    yield listings(page)
+
+            while pending:
+                page = await pending.popleft()
+                yield listings(page)
+        finally:
+            # Consumer stopped early or a page failed
+            for task in pending:
+                task.cancel()
 
     async def get_trends_data(self, shop_id: str, from_date: Optional[str] = None,
                             to_date: Optional[str] = None, series: List[str] = None) -> Dict[str, Any]:
         """Get trends data"""
-        if self.mock_mode:
-            return await self._load_fixture("trends_data")
+        series_key = tuple(sorted(series)) if series else None
+        data = await self._load(
+            ("trends_data", shop_id, from_date, to_date, series_key),
+            lambda: self._fetch_trends_data(shop_id, from_date, to_date, series)
+        )
+        # Cached payloads are ingested too, so every worker builds rollups from shared L2 hits
+        get_rollup_store().ingest_trends(shop_id, data)
+        return data
 
-        # TODO: Implement actual Etsy API calls
-        return {}
+    async def iter_changed_listings(self, shop_id: str, since: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield pages of listings modified at or after a timestamp, newest first
+
+        Listings are requested sorted by update time, so paging stops at the
+        first listing older than the high-water mark.
+        """
+        offset = 0
+        while True:
+            page = await self._fetch_changed_listings_page(shop_id, offset, self.page_size)
+            changed = [listing for listing in page if (listing.get("last_modified_timestamp") or 0) >= since]
+            if changed:
+                yield changed
+            if len(changed) < len(page) or len(page) < self.page_size:
+                return
+            offset += self.page_size
+
+    async def iter_receipts(self, shop_id: str, since: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield pages of receipts modified at or after a timestamp"""
+        offset = 0
+        while True:
+            page = await self._fetch_receipts_page(shop_id, since, offset, self.page_size)
+            if page:
+                yield page
+            if len(page) < self.page_size:
+                return
+            offset += self.page_size
 
     async def get_funnel_stats(self, shop_id: str, from_date: Optional[str] = None,
                              to_date: Optional[str] = None) -> Dict[str, Any]:
         """Get funnel statistics"""
+        return await self._load(
+            ("funnel_stats", shop_id, from_date, to_date),
+            lambda: self._fetch_funnel_stats(shop_id, from_date, to_date)
+        )
+
+    async def version(self, *key) -> Optional[float]:
+        """Load time of a fresh cached entry, or None if it is missing or due for refresh"""
+        fresh_ttl, _ = self.CACHE_TTLS[key[0]]
+        entry = await self.cache.get(self._cache_key(key))
+        if entry is None or time.time() - entry["stored_at"] >= fresh_ttl:
+            return None
+        return entry["stored_at"]
+
+    async def listings_version(self, shop_id: str, from_date: Optional[str] = None,
+                               to_date: Optional[str] = None) -> Optional[tuple]:
+        """Version of the listings iter_listing_pages serves, or None if a page is missing or due for refresh
+
+        Built from the catalog size, the newest page load time, which any page
+        refresh advances, and the receipts sync mark behind the sales overlay.
+        """
+        fresh_ttl, _ = self.CACHE_TTLS["listings_page"]
+        def page_key(offset: int) -> str:
+            return self._cache_key(("listings_page", shop_id, from_date, to_date, offset, self.page_size))
+
+        first = await self.cache.get(page_key(0))
+        now = time.time()
+        if first is None or now - first["stored_at"] >= fresh_ttl:
+            return None
+
+        count = first["value"]["count"]
+        keys = [page_key(offset) for offset in range(self.page_size, count, self.page_size)]
+        entries = await self.cache.get_many(keys)
+        stored_at = [first["stored_at"]]
+        for key in keys:
+            entry = entries.get(key)
+            if entry is None or now - entry["stored_at"] >= fresh_ttl:
+                return None
+            stored_at.append(entry["stored_at"])
+        return count, max(stored_at), get_shop_state_store().high_water(shop_id, "receipts")
+
+    async def _load(self, key: tuple, fetch) -> Dict[str, Any]:
+        """Share one in-flight lookup between identical requests and read through the cache"""
+        fresh_ttl, stale_ttl = self.CACHE_TTLS[key[0]]
+        cache_key = self._cache_key(key)
+        # A forced refresh must not join a cached read, nor an interactive request a background-priority fetch
+        return await get_singleflight().do(
+            (*key, self.refresh, self.priority), lambda: self.cache.get_or_set(cache_key, fetch, fresh_ttl, stale_ttl, self._cache_tags(key),
+                                               refresh=self.refresh)
+        )
+
+    @staticmethod
+    def shop_tag(shop_id: str) -> str:
+        """Cache tag shared by every entry for a shop"""
+        return f"shop:{shop_id}"
+
+    def _cache_tags(self, key: tuple) -> List[str]:
+        """Tag an entry by shop, data type and date range for bulk invalidation"""
+        data_type, shop_id, from_date, to_date = key[:4]
+        return [self.shop_tag(shop_id), f"type:{data_type}", f"range:{from_date or ''}:{to_date or ''}"]
+
+    def _cache_key(self, key: tuple) -> str:
+        """Build a cache key like etsy:shop_stats:<shop_id>:<from>:<to>"""
+        parts = []
+        for part in key:
+            if part is None:
+                parts.append("")
+            elif isinstance(part, tuple):
+                parts.append(",".join(part))
+            else:
+                parts.append(str(part))
+        return "etsy:" + ":".join(parts)
+
+    async def _fetch_shop_stats(self, shop_id: str, from_date: Optional[str] = None,
+                              to_date: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch shop statistics upstream and push changes to live subscribers"""
+        if self.mock_mode:
+            data = await self._load_fixture("shop_stats")
+        else:
+            # TODO: Implement actual Etsy API calls with retry logic
+            data = {}
+
+        if from_date is None and to_date is None:
+            get_live_updates().shop_stats_fetched(shop_id, data)
+        return data
+
+    async def _fetch_listings_stats(self, shop_id: str, from_date: Optional[str] = None,
+                                  to_date: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """Fetch up to limit listings by walking the listing pages"""
+        listings = []
+        async with aclosing(self.iter_listing_pages(shop_id, from_date, to_date)) as pages:
+            async for page in pages:
+                listings.extend(page[:limit - len(listings)])
+                if len(listings) >= limit:
+                    break
+        return {"listings": listings}
+
+    async def _fetch_listings_page(self, shop_id: str, from_date: Optional[str], to_date: Optional[str],
+                                 offset: int, page_size: int) -> Dict[str, Any]:
+        """Fetch one page of active listings upstream"""
+        if self.mock_mode:
+            listings = (await self._load_fixture("listings_stats")).get("listings", [])
+            return {"count": len(listings), "listings": listings[offset:offset + page_size]}
+        if not self._connected(shop_id):
+            return {"count": 0, "listings": []}
+
+        data = await self._make_request(
+            "GET", f"/shops/{shop_id}/listings/active",
+            params={"limit": page_size, "offset": offset}, shop_id=shop_id
+        )
+        return {
+            "count": data.get("count", 0),
+            "listings": [self._normalize_listing(listing) for listing in data.get("results", [])]
+        }
+
+    async def _fetch_changed_listings_page(self, shop_id: str, offset: int, page_size: int) -> List[Dict[str, Any]]:
+        """Fetch one page of active listings sorted by most recently updated"""
+        if self.mock_mode:
+            # Fixture listings carry no modification time, so they only appear on a full sync
+            return []
+        if not self._connected(shop_id):
+            return []
+
+        data = await self._make_request(
+            "GET", f"/shops/{shop_id}/listings",
+            params={"state": "active", "sort_on": "updated", "sort_order": "desc",
+                    "limit": page_size, "offset": offset},
+            shop_id=shop_id
+        )
+        return [self._normalize_listing(listing) for listing in data.get("results", [])]
+
+    async def _fetch_receipts_page(self, shop_id: str, since: int, offset: int,
+                                   page_size: int) -> List[Dict[str, Any]]:
+        """Fetch one page of receipts modified at or after a timestamp"""
+        if self.mock_mode or not self._connected(shop_id):
+            return []
+
+        data = await self._make_request(
+            "GET", f"/shops/{shop_id}/receipts",
+            params={"min_last_modified": since, "limit": page_size, "offset": offset},
+            shop_id=shop_id
+        )
+        return [self._normalize_receipt(receipt) for receipt in data.get("results", [])]
+
+    def _normalize_receipt(self, receipt: Dict[str, Any]) -> Dict[str, Any]:
+        """Map an Etsy receipt resource onto per-listing transaction revenue"""
+        transactions = []
+        for transaction in receipt.get("transactions", []):
+            price = transaction.get("price") or {}
+            divisor = price.get("divisor") or 1
+            transactions.append({
+                "listing_id": transaction.get("listing_id", 0),
+                "revenue": price.get("amount", 0) / divisor * transaction.get("quantity", 1)
+            })
+        return {
+            "receipt_id": receipt.get("receipt_id", 0),
+            "status": receipt.get("status", ""),
+            "last_modified": receipt.get("updated_timestamp"),
+            "transactions": transactions
+        }
+
+    def _normalize_listing(self, listing: Dict[str, Any]) -> Dict[str, Any]:
+        """Map an Etsy listing resource onto the fields the aggregator uses"""
+        price = listing.get("price") or {}
+        divisor = price.get("divisor") or 1
+        return {
+            "listing_id": listing.get("listing_id", 0),
+            "title": listing.get("title", ""),
+            "views": listing.get("views", 0),
+            "favorites": listing.get("num_favorers", 0),
+            "orders": listing.get("orders", 0),
+            "revenue": listing.get("revenue", 0.0),
+            "price": price.get("amount", 0) / divisor,
+            "etsy_url": listing.get("url", ""),
+            "last_modified_timestamp": listing.get("last_modified_timestamp")
+        }
+
+    async def _fetch_trends_data(self, shop_id: str, from_date: Optional[str] = None,
+                               to_date: Optional[str] = None, series: List[str] = None) -> Dict[str, Any]:
+        """Fetch trends data upstream, persist it and push new points to live subscribers"""
+        if self.mock_mode:
+            data = await self._load_fixture("trends_data")
+        else:
+            # TODO: Implement actual Etsy API calls
+            data = {}
+
+        get_timeseries_store().ingest(shop_id, data)
+        get_live_updates().trends_fetched(shop_id, data)
+        return data
+
+    async def _fetch_funnel_stats(self, shop_id: str, from_date: Optional[str] = None,
+                                to_date: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch funnel statistics upstream"""
         if self.mock_mode:
             return await self._load_fixture("funnel_stats")
 
@@ -76,54 +368,60 @@ class EtsyClient:
         return {}
 
     async def _make_request(self, method: str, endpoint: str, params: Dict = None,
-                          data: Dict = None, retries: int = 3) -> Dict[str, Any]:
-        """Make HTTP request with retry logic and error handling"""
-        async with httpx.AsyncClient() as client:
-            for attempt in range(retries):
-                try:
-                    response = await client.request(
-                        method=method,
-                        url=f"{self.base_url}{endpoint}",
-                        params=params,
-                        json=data,
-                        headers={"Authorization": f"Bearer {self._get_access_token()}"},
-                        timeout=30
-                    )
-
-                    if response.status_code == 429:
-                        # Rate limited, exponential backoff
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    elif response.status_code >= 500:
-                        # Server error, retry
-                        if attempt < retries - 1:
-                            await asyncio.sleep(1)
-                            continue
-                    elif response.status_code == 401:
-                        # Unauthorized, refresh token
-                        await self._refresh_token()
-                        continue
+                          data: Dict = None, retries: int = 3, shop_id: Optional[str] = None) -> Dict[str, Any]:
+        """Make HTTP request with rate limiting, retry logic and error handling"""
+        http_pool = get_http_pool()
+        scheduler = get_request_scheduler()
+        token = await self._access_token(shop_id)
+        refreshed = False
+        for attempt in range(retries):
+            try:
+                await scheduler.acquire(shop_id, self.priority)
+                response = await http_pool.request(
+                    method=method,
+                    url=f"{self.base_url}{endpoint}",
+                    params=params,
+                    json=data,
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+                scheduler.update_from_headers(response.headers)
 
-                    response.raise_for_status()
-                    return response.json()
-
-                except httpx.RequestError:
+                if response.status_code == 429:
+                    # Rate limited, back off for Retry-After or a jittered exponential delay
+                    retry_after = scheduler.parse_retry_after(response.headers.get("retry-after"))
+                    await asyncio.sleep(scheduler.backoff(attempt, retry_after))
+                    continue
+                elif response.status_code >= 500:
+                    # Server error, retry
                     if attempt < retries - 1:
-                        await asyncio.sleep(1)
+                        await asyncio.sleep(scheduler.backoff(attempt))
                         continue
-                    raise
+                elif response.status_code == 401 and not refreshed:
+                    # Unauthorized, refresh once; concurrent 401s share the same refresh
+                    token = (await get_token_store().refresh(shop_id, token)).access_token
+                    refreshed = True
+                    continue
+
+                response.raise_for_status()
+                return response.json()
+
+            except httpx.RequestError:
+                if attempt < retries - 1:
+                    await asyncio.sleep(scheduler.backoff(attempt))
+                    continue
+                raise
 
         raise Exception(f"Failed to make request after {retries} attempts")
 
-    def _get_access_token(self) -> str:
-        """Get current access token"""
-        # TODO: Implement token storage/retrieval
-        return "mock_token"
+    def _connected(self, shop_id: str) -> bool:
+        """Whether upstream calls can authenticate as the shop; unconnected shops get empty data"""
+        return bool(self.client_id) and get_token_store().get(shop_id) is not None
 
-    async def _refresh_token(self):
-        """Refresh OAuth token"""
-        # TODO: Implement token refresh
-        pass
+    async def _access_token(self, shop_id: Optional[str]) -> str:
+        """Get the shop's access token, refreshed ahead of expiry"""
+        if shop_id is None:
+            raise TokenUnavailable("Etsy requests need a shop to authenticate as")
+        return await get_token_store().access_token(shop_id)
 
     async def _load_fixture(self, fixture_name: str) -> Dict[str, Any]:
         """Load mock data fixture"""
@@ -182,4 +480,13 @@ class EtsyClient:
                 "conversion_rate": 4.2
             }
         }
-        return fixtures.get(fixture_name, {})
\ No newline at end of file
+        return fixtures.get(fixture_name, {})
+
+_etsy_client: Optional[EtsyClient] = None
+
+def get_etsy_client() -> EtsyClient:
+    """Get the process-wide interactive Etsy client"""
+    global _etsy_client
+    if _etsy_client is None:
+        _etsy_client = EtsyClient()
+    return _etsy_client
@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+from typing import Dict, Any, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds from sending a request to reaching a connection beyond which it counts as
+# having waited for one; anything shorter is request setup
+CONNECTION_WAIT_THRESHOLD = 0.01
+
+class HTTPClientPool:
+    """Process-wide pooled HTTP client for upstream Etsy calls with keep-alive and HTTP/2"""
+
+    def __init__(self, max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None, timeout: Optional[float] = None,
+                 http2: Optional[bool] = None):
+        self.max_connections = max_connections or int(os.getenv("ETSY_HTTP_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = max_keepalive_connections or int(os.getenv("ETSY_HTTP_MAX_KEEPALIVE", "10"))
+        self.keepalive_expiry = keepalive_expiry or float(os.getenv("ETSY_HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.timeout = timeout or float(os.getenv("ETSY_HTTP_TIMEOUT", "30"))
+        self.http2 = http2 if http2 is not None else os.getenv("ETSY_HTTP2", "true") == "true"
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+
+        # Counters
+        self._requests_total = 0
+        self._in_flight = 0
+        self._acquiring = 0
+        self._connection_waits = 0
+        self._connection_wait_time = 0.0
+
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("h2 not available, falling back to HTTP/1.1 for Etsy client")
+                self.http2 = False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the shared client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._transport = httpx.AsyncHTTPTransport(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._client = httpx.AsyncClient(transport=self._transport, timeout=self.timeout)
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the shared connection pool
+
+        The first connection-level trace event, opening a new connection or
+        writing to a pooled one, marks when the request got a connection; the
+        time until then is how long it waited for one.
+        """
+        client = self.client
+        started = time.monotonic()
+        acquired = False
+
+        async def trace(event: str, info: Dict[str, Any]):
+            nonlocal acquired
+            if not acquired:
+                acquired = True
+                self._connection_acquired(time.monotonic() - started)
+
+        self._requests_total += 1
+        self._in_flight += 1
+        self._acquiring += 1
+        try:
+            return await client.request(method, url, extensions={**kwargs.pop("extensions", {}), "trace": trace},
+                                        **kwargs)
+        finally:
+            self._in_flight -= 1
+            if not acquired:
+                self._acquiring -= 1
+
+    async def aclose(self):
+        """Close the shared client and all pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._transport = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics"""
+        connections = self._connections()
+        idle = sum(1 for conn in connections if conn.is_idle())
+
+        return {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "connections_open": len(connections),
+            "connections_idle": idle,
+            "requests_waiting": self._acquiring,
+            "requests_in_flight": self._in_flight,
+            "requests_total": self._requests_total,
+            "connection_waits": self._connection_waits,
+            "connection_wait_seconds": round(self._connection_wait_time, 3)
+        }
+
+    def _connection_acquired(self, waited: float):
+        """Record how long a request took to get a connection"""
+        self._acquiring -= 1
+        self._connection_wait_time += waited
+        if waited > CONNECTION_WAIT_THRESHOLD:
+            self._connection_waits += 1
+
+    def _connections(self) -> list:
+        """Get the httpcore connections of the pool behind the shared transport"""
+        if self._transport is None or self._client is None or self._client.is_closed:
+            return []
+        pool = getattr(self._transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+_http_pool: Optional[HTTPClientPool] = None
+
+def get_http_pool() -> HTTPClientPool:
+    """Get the process-wide HTTP client pool"""
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = HTTPClientPool()
+    return _http_pool
+
+async def close_http_pool():
+    """Close the process-wide HTTP client pool"""
+    global _http_pool
+    if _http_pool is not None:
+        await _http_pool.aclose()
+        _http_pool = None
@@ -0,0 +1,134 @@
+import os
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+from app.services.aggregator import MetricsAggregator
+from app.services.rollups import get_rollup_store
+
+class Subscription:
+    """One client's bounded event buffer; the oldest events are dropped when it is full"""
+
+    def __init__(self, shop_id: str, buffer_size: int):
+        self.shop_id = shop_id
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self._unreported_drops = 0
+
+    def push(self, event: Dict[str, Any]):
+        """Buffer an event, evicting the oldest one if the client is behind"""
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+            self._unreported_drops += 1
+        self._events.append(event)
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next event, or None after timeout"""
+        if not self._events:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        event = self._events.popleft()
+        if self._unreported_drops:
+            # Tell the client it missed updates and should refetch
+            event = {**event, "dropped": self._unreported_drops}
+            self._unreported_drops = 0
+        return event
+
+class LiveUpdates:
+    """Per-shop fan-out of KPI changes to live dashboard subscribers
+
+    Upstream fetches report new shop stats and trend points here. Work is only
+    done for shops with subscribers, and each subscriber receives just the
+    fields and points that changed since the previous publish.
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None):
+        self.buffer_size = buffer_size or int(os.getenv("LIVE_BUFFER_SIZE", "32"))
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._shop_snapshots: Dict[str, Dict[str, Any]] = {}
+        self._trend_snapshots: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._published = 0
+
+    def subscribe(self, shop_id: str) -> Subscription:
+        """Open a subscription, primed with the latest known metrics"""
+        subscription = Subscription(shop_id, self.buffer_size)
+        self._subscribers.setdefault(shop_id, set()).add(subscription)
+        if shop_id in self._shop_snapshots:
+            subscription.push({"type": "snapshot", "metrics": self._shop_snapshots[shop_id]})
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Close a subscription"""
+        subscribers = self._subscribers.get(subscription.shop_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.shop_id]
+                self._trend_snapshots.pop(subscription.shop_id, None)
+
+    def has_subscribers(self, shop_id: str) -> bool:
+        """Whether any client is listening for a shop"""
+        return shop_id in self._subscribers
+
+    def publish(self, shop_id: str, event: Dict[str, Any]):
+        """Push an event to every subscriber of a shop"""
+        for subscription in self._subscribers.get(shop_id, ()):
+            subscription.push(event)
+        self._published += 1
+
+    def shop_stats_fetched(self, shop_id: str, raw_data: Dict[str, Any]):
+        """Publish shop KPI fields and deltas that changed with a new fetch"""
+        if not self.has_subscribers(shop_id):
+            return
+        periods = get_rollup_store().compare_windows(shop_id)
+        metrics = MetricsAggregator().aggregate_shop_metrics(raw_data, periods).model_dump()
+        previous = self._shop_snapshots.get(shop_id, {})
+        self._shop_snapshots[shop_id] = metrics
+
+        changed = {key: value for key, value in metrics.items()
+                   if key != "deltas" and previous.get(key) != value}
+        previous_deltas = previous.get("deltas", {})
+        deltas = {key: value for key, value in metrics["deltas"].items() if previous_deltas.get(key) != value}
+        if changed or deltas:
+            self.publish(shop_id, {"type": "shop", "changed": changed, "deltas": deltas})
+
+    def trends_fetched(self, shop_id: str, raw_trends: Dict[str, Any]):
+        """Publish trend points that are new or changed since the last fetch"""
+        if not self.has_subscribers(shop_id):
+            return
+        snapshot = self._trend_snapshots.setdefault(shop_id, {})
+        points: Dict[str, List[Dict[str, Any]]] = {}
+        for series, series_points in raw_trends.items():
+            if not isinstance(series_points, list):
+                continue
+            seen = snapshot.setdefault(series, {})
+            for point in series_points:
+                if seen.get(point["date"]) != point["value"]:
+                    seen[point["date"]] = point["value"]
+                    points.setdefault(series, []).append(point)
+        if points:
+            self.publish(shop_id, {"type": "trends", "points": points})
+
+    def stats(self) -> Dict[str, Any]:
+        """Get subscriber and delivery statistics"""
+        subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "shops": len(self._subscribers),
+            "subscribers": len(subscriptions),
+            "published": self._published,
+            "dropped": sum(s.dropped for s in subscriptions)
+        }
+
+_live_updates: Optional[LiveUpdates] = None
+
+def get_live_updates() -> LiveUpdates:
+    """Get the process-wide live update hub"""
+    global _live_updates
+    if _live_updates is None:
+        _live_updates = LiveUpdates()
+    return _live_updates
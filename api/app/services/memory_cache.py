@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    """Cached value with its monotonic expiry time, approximate size and tags"""
+    __slots__ = ("value", "expires_at", "size", "seq", "tags")
+
+    def __init__(self, value: Any, expires_at: float, size: int, seq: int, tags: Tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.seq = seq
+        self.tags = tags
+
+def approx_size(value: Any, _depth: int = 0) -> int:
+    """Estimate the memory footprint of a JSON-like value in bytes"""
+    size = sys.getsizeof(value)
+    if _depth > 8:
+        return size
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += approx_size(key, _depth + 1) + approx_size(item, _depth + 1)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += approx_size(item, _depth + 1)
+    return size
+
+class MemoryLRUCache:
+    """Size- and byte-bounded LRU cache with heap-ordered TTL expiry
+
+    get/set/delete are O(1) on the LRU order plus O(log n) for the expiry heap push.
+    Expired entries are removed lazily on lookup and proactively by purge_expired,
+    which only pops heap entries that are actually due.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 sweep_interval: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "10000"))
+        self.max_bytes = max_bytes or int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.sweep_interval = sweep_interval or float(os.getenv("CACHE_SWEEP_INTERVAL", "30"))
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._seq = itertools.count()
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+        # Counters
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a live value and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()):
+        """Store a value, evicting least recently used entries past the size limits"""
+        if key in self._entries:
+            self._remove(key)
+
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return
+
+        seq = next(self._seq)
+        expires_at = time.monotonic() + ttl
+        tags = tuple(tags)
+        self._entries[key] = _Entry(value, expires_at, size, seq, tags)
+        self._bytes += size
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        heapq.heappush(self._expiry_heap, (expires_at, seq, key))
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._evictions += 1
+
+        self._compact_heap()
+
+    def delete(self, key: str) -> bool:
+        """Delete a value, returning whether it was present"""
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def invalidate_tag(self, tag: str) -> List[str]:
+        """Delete every entry carrying a tag, returning the removed keys"""
+        keys = list(self._tag_index.get(tag, ()))
+        for key in keys:
+            self._remove(key)
+        return keys
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._tag_index.clear()
+        self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Remove every entry whose TTL has passed, returning how many were removed"""
+        now = time.monotonic()
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key)
+                removed += 1
+        self._expirations += removed
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def start_sweeper(self):
+        """Start the background task that purges expired entries"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop_sweeper(self):
+        """Stop the background sweeper task"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get memory tier statistics"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": self._bytes,
+            "tags": len(self._tag_index),
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+            "expirations": self._expirations
+        }
+
+    async def _sweep(self):
+        """Periodically purge expired entries"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.purge_expired()
+            except Exception as e:
+                logger.warning(f"Memory cache sweep failed: {e!r}")
+
+    def _remove(self, key: str):
+        """Remove an entry and its tag links; its heap item is skipped when it surfaces"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def _compact_heap(self):
+        """Rebuild the expiry heap once superseded items dominate it"""
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [
+                (entry.expires_at, entry.seq, key) for key, entry in self._entries.items()
+            ]
+            heapq.heapify(self._expiry_heap)
@@ -0,0 +1,212 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Dict, Any, Optional, Mapping
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Scheduling lanes, lower values are served first"""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def try_take(self) -> float:
+        """Take one token, returning 0 on success or the seconds to wait otherwise"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Return an unused token"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+class RequestScheduler:
+    """Async token-bucket scheduler with priority lanes and per-shop fair queuing"""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 max_backoff: float = 30.0):
+        rate = rate or float(os.getenv("ETSY_RATE_LIMIT_QPS", "10"))
+        burst = burst or float(os.getenv("ETSY_RATE_LIMIT_BURST", str(rate)))
+        self.max_backoff = max_backoff
+        self._bucket = TokenBucket(rate, burst)
+        self._lanes = {priority: OrderedDict() for priority in Priority}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Counters
+        self._granted = {priority: 0 for priority in Priority}
+        self._wait_total = {priority: 0.0 for priority in Priority}
+        self._wait_max = {priority: 0.0 for priority in Priority}
+        self._throttled = 0
+        self._remaining_today: Optional[int] = None
+
+    async def acquire(self, shop_id: Optional[str] = None,
+                      priority: Priority = Priority.INTERACTIVE) -> float:
+        """Wait for a request slot, returning the seconds spent waiting"""
+        start = time.monotonic()
+
+        # Fast path when nobody is queued ahead of us
+        if not self._has_waiters() and self._bucket.try_take() == 0:
+            self._record(priority, 0.0)
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._lanes[priority].setdefault(shop_id or "", deque()).append(future)
+        self._ensure_dispatcher(loop)
+
+        await future
+        waited = time.monotonic() - start
+        self._record(priority, waited)
+        return waited
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Apply Etsy rate-limit headers to the bucket"""
+        retry_after = self.parse_retry_after(headers.get("retry-after"))
+        if retry_after:
+            self._pause(retry_after)
+
+        remaining_second = headers.get("x-remaining-this-second")
+        if remaining_second is not None and remaining_second.isdigit() and int(remaining_second) == 0:
+            self._pause(1.0)
+
+        limit_second = headers.get("x-limit-per-second")
+        if limit_second and limit_second.isdigit() and 0 < int(limit_second) < self._bucket.rate:
+            self._bucket.rate = float(limit_second)
+            self._bucket.capacity = min(self._bucket.capacity, float(limit_second))
+
+        remaining_today = headers.get("x-remaining-today")
+        if remaining_today is not None and remaining_today.lstrip("-").isdigit():
+            self._remaining_today = int(remaining_today)
+            if self._remaining_today <= 0 and not retry_after:
+                logger.warning("Etsy daily quota exhausted, pausing upstream requests")
+                self._pause(60.0)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Get a jittered backoff delay, honouring Retry-After when present"""
+        if retry_after:
+            self._pause(retry_after)
+            return retry_after + random.uniform(0, 1.0)
+        return random.uniform(0, min(self.max_backoff, 2 ** attempt))
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and wait time statistics"""
+        lanes = {}
+        for priority in Priority:
+            granted = self._granted[priority]
+            lanes[priority.name.lower()] = {
+                "queue_depth": sum(len(queue) for queue in self._lanes[priority].values()),
+                "queued_shops": len(self._lanes[priority]),
+                "granted": granted,
+                "avg_wait_ms": round(self._wait_total[priority] / granted * 1000, 3) if granted else 0.0,
+                "max_wait_ms": round(self._wait_max[priority] * 1000, 3)
+            }
+
+        return {
+            "rate_per_second": self._bucket.rate,
+            "burst": self._bucket.capacity,
+            "throttled": self._throttled,
+            "remaining_today": self._remaining_today,
+            "lanes": lanes
+        }
+
+    def _pause(self, seconds: float):
+        """Pause the bucket after an upstream rate-limit signal"""
+        self._throttled += 1
+        self._bucket.pause(seconds)
+
+    def _record(self, priority: Priority, waited: float):
+        """Record a granted slot"""
+        self._granted[priority] += 1
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+    def _has_waiters(self) -> bool:
+        """Check if any lane has queued requests"""
+        return any(self._lanes[priority] for priority in Priority)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the next live waiter, highest priority lane first, round-robin across shops"""
+        for priority in Priority:
+            lane = self._lanes[priority]
+            while lane:
+                shop_id, queue = next(iter(lane.items()))
+                future = queue.popleft()
+                if queue:
+                    lane.move_to_end(shop_id)
+                else:
+                    del lane[shop_id]
+                if not future.done():
+                    return future
+        return None
+
+    def _ensure_dispatcher(self, loop: asyncio.AbstractEventLoop):
+        """Start the dispatcher task if it is not already running on this loop"""
+        if self._dispatcher is not None and not self._dispatcher.done():
+            if self._dispatcher.get_loop() is loop:
+                return
+            self._dispatcher.cancel()
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        """Hand out tokens to queued requests as the bucket refills"""
+        while self._has_waiters():
+            delay = self._bucket.try_take()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            future = self._next_waiter()
+            if future is None:
+                self._bucket.refund()
+                break
+            future.set_result(None)
+
+_scheduler: Optional[RequestScheduler] = None
+
+def get_request_scheduler() -> RequestScheduler:
+    """Get the process-wide Etsy request scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler()
+    return _scheduler
@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sorted-set tags; renamed from the plain sets under etsynova:tag:, which expire on their own
+TAG_KEY_PREFIX = "etsynova:tags:"
+LEASE_KEY_PREFIX = "etsynova:lease:"
+
+# Renew the lease if the caller holds it, otherwise take it if it is free
+ACQUIRE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class RedisUnavailable(Exception):
+    """Raised when Redis is down, slow, or the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Trip after consecutive failures and retry with a single probe after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("REDIS_BREAKER_THRESHOLD", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("REDIS_BREAKER_RESET", "10"))
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trips = 0
+
+    def allow(self) -> bool:
+        """Check if a call may go through"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            # Let exactly one probe through
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        if self.state != self.CLOSED:
+            logger.info("Redis circuit breaker closed")
+        self.state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        """Count a failure, opening the breaker past the threshold"""
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self._trips += 1
+                logger.warning(f"Redis circuit breaker opened after {self._failures} failures")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """Reopen the breaker when a probe ends without an outcome, e.g. on cancellation"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get breaker state"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "trips": self._trips
+        }
+
+class RedisBackend:
+    """Non-blocking Redis backend with a connection pool, per-call timeout and circuit breaker"""
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None, breaker: Optional[CircuitBreaker] = None):
+        self.url = url or os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.timeout = timeout or float(os.getenv("REDIS_TIMEOUT", "0.25"))
+        self.max_connections = max_connections or int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.breaker = breaker or CircuitBreaker()
+        self.tag_ttl = int(os.getenv("CACHE_TAG_TTL", "86400"))
+
+        # Imported here so the module loads without the redis package installed
+        from redis import asyncio as aioredis
+        from redis.exceptions import RedisError
+        self._failure_types = (RedisError, OSError, asyncio.TimeoutError)
+        self._aioredis = aioredis
+        self._client = aioredis.from_url(
+            self.url,
+            max_connections=self.max_connections,
+            socket_timeout=self.timeout,
+            socket_connect_timeout=self.timeout
+        )
+
+        # Counters
+        self._errors = 0
+        self._rejected = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get raw bytes for a key"""
+        return await self._call(lambda: self._client.get(key))
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        """Set raw bytes with a TTL in seconds"""
+        await self._call(lambda: self._client.setex(key, ttl, value))
+
+    async def delete(self, *keys: str, tags: Iterable[str] = ()) -> int:
+        """Delete keys, returning how many existed, and unlink them from the given tags"""
+        if not keys:
+            return 0
+
+        async def run():
+            pipe = self._client.pipeline(transaction=False)
+            pipe.delete(*keys)
+            for tag in tags:
+                pipe.zrem(TAG_KEY_PREFIX + tag, *keys)
+            return (await pipe.execute())[0]
+
+        return await self._call(run)
+
+    async def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Get many keys in one round trip"""
+        if not keys:
+            return []
+        return await self._call(lambda: self._client.mget(keys))
+
+    async def mset(self, items: Dict[str, bytes], ttl: int, tags: Optional[Dict[str, Iterable[str]]] = None):
+        """Set many keys with a shared TTL in one pipelined round trip, linking each to its own tags
+
+        tags maps a key to the tags it is linked to. Tags are sorted sets scored
+        by each member's expiry time. Members that have expired are pruned on
+        every write, so a tag only ever holds keys that may still exist.
+        """
+        if not items:
+            return
+        members: Dict[str, List[str]] = {}
+        for key, key_tags in (tags or {}).items():
+            for tag in key_tags:
+                members.setdefault(tag, []).append(key)
+
+        async def run():
+            now = time.time()
+            pipe = self._client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl, value)
+            for tag, keys in members.items():
+                tag_key = TAG_KEY_PREFIX + tag
+                pipe.zremrangebyscore(tag_key, "-inf", now)
+                pipe.zadd(tag_key, {key: now + ttl for key in keys})
+                pipe.expire(tag_key, max(ttl, self.tag_ttl))
+            return await pipe.execute()
+
+        await self._call(run)
+
+    async def invalidate_tags(self, tags: List[str]) -> List[str]:
+        """Delete every key linked to the given tags, plus the tag sets themselves"""
+        if not tags:
+            return []
+        tag_keys = [TAG_KEY_PREFIX + tag for tag in tags]
+
+        async def run():
+            pipe = self._client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipe.zrange(tag_key, 0, -1)
+            members = await pipe.execute()
+
+            keys = sorted({key.decode() if isinstance(key, bytes) else key
+                           for tag_members in members for key in tag_members})
+            await self._client.delete(*keys, *tag_keys)
+            return keys
+
+        return await self._call(run)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        """Take or renew a named lease for ttl seconds, returning whether owner holds it"""
+        result = await self._call(
+            lambda: self._client.eval(ACQUIRE_LEASE_SCRIPT, 1, LEASE_KEY_PREFIX + name, owner, ttl)
+        )
+        return bool(result)
+
+    async def release_lease(self, name: str, owner: str):
+        """Give up a lease early if owner still holds it"""
+        await self._call(lambda: self._client.eval(RELEASE_LEASE_SCRIPT, 1, LEASE_KEY_PREFIX + name, owner))
+
+    async def publish(self, channel: str, message: str):
+        """Publish a message on a pub/sub channel"""
+        await self._call(lambda: self._client.publish(channel, message))
+
+    async def listen(self, channel: str) -> AsyncIterator[bytes]:
+        """Yield messages from a pub/sub channel until the connection drops"""
+        # Subscriptions idle for long stretches, so they get their own client without a read timeout
+        client = self._aioredis.from_url(self.url, socket_connect_timeout=self.timeout)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+    async def close(self):
+        """Close the connection pool"""
+        await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get backend statistics"""
+        return {
+            "timeout_s": self.timeout,
+            "max_connections": self.max_connections,
+            "errors": self._errors,
+            "rejected": self._rejected,
+            "breaker": self.breaker.stats()
+        }
+
+    async def _call(self, operation: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a Redis operation under the timeout and circuit breaker"""
+        if not self.breaker.allow():
+            self._rejected += 1
+            raise RedisUnavailable("circuit open")
+
+        try:
+            result = await asyncio.wait_for(operation(), timeout=self.timeout)
+        except self._failure_types as e:
+            self._errors += 1
+            self.breaker.record_failure()
+            raise RedisUnavailable(repr(e)) from e
+        except BaseException:
+            # Otherwise a cancelled probe would leave the breaker half-open for good
+            self.breaker.record_abandoned()
+            raise
+
+        self.breaker.record_success()
+        return result
@@ -0,0 +1,235 @@
+import os
+import math
+import time
+import asyncio
+import hashlib
+import logging
+from contextlib import aclosing
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.agent.heuristics import analyze_listings, generate_heuristic_summary
+from app.services.aggregator import MetricsAggregator
+from app.services.cache import CacheService, get_cache_service
+from app.services.columnar import ListingColumns
+from app.services.etsy_client import EtsyClient, get_etsy_client
+from app.services.rollups import get_rollup_store
+from app.services.shop_state import ShopStateStore, get_shop_state_store
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Shop metrics a report is written from, alongside the catalog analysis
+REPORT_INPUTS = ("orders", "gmv", "visits", "views", "conversion_rate", "favorites", "cart_adds", "refunds")
+
+ReportGenerator = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+ListingAnalyzer = Callable[[str, Optional[EtsyClient]], Awaitable[Optional[Dict[str, Any]]]]
+
+async def shop_listing_columns(shop_id: str, client: Optional[EtsyClient] = None) -> ListingColumns:
+    """A shop's whole catalog as columns, from synced state when available
+
+    Shops without a completed listings sync are read through client, so sync
+    can keep the walk on its own lane and share it with its listings job.
+    """
+    state = get_shop_state_store()
+    if state.has_listings(shop_id):
+        return ListingColumns.from_listings(state.listings(shop_id, 0, state.count_listings(shop_id)))
+
+    listings = []
+    async with aclosing((client or get_etsy_client()).iter_listing_pages(shop_id)) as pages:
+        async for page in pages:
+            listings.extend(page)
+    return ListingColumns.from_listings(listings)
+
+async def analyze_shop_listings(shop_id: str, client: Optional[EtsyClient] = None) -> Optional[Dict[str, Any]]:
+    """Catalog analysis for a shop, or None when its listings cannot be fetched"""
+    try:
+        return analyze_listings(await shop_listing_columns(shop_id, client))
+    except Exception as e:
+        logger.warning(f"Listings unavailable for shop {shop_id} report: {e!r}")
+        return None
+
+async def generate_report(shop_id: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Write a report with the configured LLM provider, or heuristics when there is none
+
+    inputs holds the shop KPIs, their deltas and the catalog analysis under
+    "listings", which is None when listings were unavailable.
+    """
+    metrics = {key: value for key, value in inputs.items() if key != "listings"}
+    listings = inputs.get("listings")
+    llm_provider = os.getenv("LLM_PROVIDER", "none")
+    if llm_provider != "none":
+        from app.agent.graph import ReportsAgent
+        summary = await ReportsAgent().generate_summary(shop_id, metrics, listings)
+    else:
+        summary = generate_heuristic_summary(metrics, listings)
+
+    return {
+        "summary": summary,
+        "generated_with": "ai" if llm_provider != "none" else "heuristics",
+        "provider": llm_provider
+    }
+
+class ReportService:
+    """Per-shop reports generated once per meaningful change in the shop's KPIs or catalog
+
+    Reports are cached with their input fingerprint: metric values, listing
+    issue counts and estimated missed orders quantized to change_threshold
+    relative steps, and deltas to delta_step points, so noise below those
+    steps maps to the same fingerprint and reuses the report.
+    Requests are answered from the cache; a report older than ttl is served
+    while it is refreshed in the background, and concurrent generations for a
+    shop are coalesced. The catalog analysis is reused until the shop's synced
+    listings or receipts move, and concurrent analyses are coalesced too.
+    """
+
+    def __init__(self, cache: Optional[CacheService] = None, generator: Optional[ReportGenerator] = None,
+                 ttl: Optional[float] = None, change_threshold: Optional[float] = None,
+                 delta_step: Optional[float] = None, analyzer: Optional[ListingAnalyzer] = None,
+                 state: Optional[ShopStateStore] = None):
+        self.cache = cache or get_cache_service()
+        self.generator = generator or generate_report
+        self.analyzer = analyzer or analyze_shop_listings
+        self.state = state or get_shop_state_store()
+        self.ttl = ttl if ttl is not None else float(os.getenv("REPORT_TTL", "21600"))
+        self.change_threshold = change_threshold if change_threshold is not None else float(
+            os.getenv("REPORT_CHANGE_THRESHOLD", "0.05")
+        )
+        self.delta_step = delta_step if delta_step is not None else float(os.getenv("REPORT_DELTA_STEP", "5"))
+        self._flights = SingleFlight()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # shop_id -> (sync version, analysis)
+        self._analyses: Dict[str, Tuple[Tuple, Optional[Dict[str, Any]]]] = {}
+
+        self._served = 0
+        self._generated = 0
+        self._unchanged = 0
+        self._background = 0
+        self._errors = 0
+        self._analyses_reused = 0
+
+    def fingerprint(self, metrics: Dict[str, Any], listings: Optional[Dict[str, Any]] = None) -> str:
+        """Hash of quantized report inputs"""
+        parts = []
+        for key in REPORT_INPUTS:
+            parts.append(self._quantize(metrics.get(key)))
+            delta = (metrics.get("deltas") or {}).get(key)
+            parts.append(None if delta is None else round(delta / self.delta_step))
+        if listings is not None:
+            parts.append(self._quantize(listings["listings"]))
+            parts.extend(
+                (issue["rule"], self._quantize(issue["listings"]), self._quantize(issue["estimated_orders"]))
+                for issue in listings["issues"]
+            )
+        return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+    async def get(self, shop_id: str) -> Dict[str, Any]:
+        """Cached report for a shop, generating one first only if none is stored"""
+        entry = await self.cache.get(self._key(shop_id))
+        if entry is None:
+            entry = await self.refresh(shop_id)
+        elif time.time() - entry["generated_at"] > self.ttl:
+            self.refresh_in_background(shop_id)
+        self._served += 1
+        return entry
+
+    async def refresh(self, shop_id: str, raw_stats: Optional[Dict[str, Any]] = None,
+                      client: Optional[EtsyClient] = None) -> Dict[str, Any]:
+        """Regenerate a shop's report if its inputs changed meaningfully or it expired
+
+        raw_stats lets sync pass shop stats it just fetched instead of reading
+        them back through the client, and client lets it read listings not yet
+        synced on its own priority lane.
+        """
+        if raw_stats is None:
+            raw_stats = await get_etsy_client().get_shop_stats(shop_id)
+        periods = get_rollup_store().compare_windows(shop_id)
+        metrics = MetricsAggregator().aggregate_shop_metrics(raw_stats, periods).model_dump()
+        listings = await self._analyze(shop_id, client)
+        fingerprint = self.fingerprint(metrics, listings)
+
+        entry = await self.cache.get(self._key(shop_id))
+        if entry is not None and entry["fingerprint"] == fingerprint and time.time() - entry["generated_at"] <= self.ttl:
+            self._unchanged += 1
+            return entry
+        inputs = {**{key: metrics[key] for key in REPORT_INPUTS + ("deltas",)}, "listings": listings}
+        return await self._flights.do(shop_id, lambda: self._generate(shop_id, inputs, fingerprint))
+
+    def refresh_in_background(self, shop_id: str, raw_stats: Optional[Dict[str, Any]] = None):
+        """Start a refresh unless one is already running for the shop"""
+        loop = asyncio.get_running_loop()
+        task = self._refreshing.get(shop_id)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._background += 1
+        task = loop.create_task(self.refresh(shop_id, raw_stats))
+        self._refreshing[shop_id] = task
+        task.add_done_callback(lambda done: self._refresh_done(shop_id, done))
+
+    async def stop(self):
+        """Cancel background refreshes"""
+        tasks = [task for task in self._refreshing.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refreshing.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get generation statistics"""
+        return {
+            "served": self._served,
+            "generated": self._generated,
+            "unchanged": self._unchanged,
+            "background_refreshes": self._background,
+            "errors": self._errors,
+            "analyses_reused": self._analyses_reused,
+            "in_flight": self._flights.in_flight()
+        }
+
+    async def _analyze(self, shop_id: str, client: Optional[EtsyClient]) -> Optional[Dict[str, Any]]:
+        """Catalog analysis for a shop, reusing the last one while its synced state has not moved"""
+        version = self.state.sync_version(shop_id)
+        cached = self._analyses.get(shop_id)
+        if version is not None and cached is not None and cached[0] == version:
+            self._analyses_reused += 1
+            return cached[1]
+
+        analysis = await self._flights.do(("analysis", shop_id), lambda: self.analyzer(shop_id, client))
+        if version is not None and analysis is not None:
+            self._analyses[shop_id] = (version, analysis)
+        else:
+            self._analyses.pop(shop_id, None)
+        return analysis
+
+    async def _generate(self, shop_id: str, inputs: Dict[str, Any], fingerprint: str) -> Dict[str, Any]:
+        """Generate and store a report, keeping it past ttl so it can be served while refreshing"""
+        report = await self.generator(shop_id, inputs)
+        entry = {**report, "shop_id": shop_id, "fingerprint": fingerprint, "generated_at": time.time()}
+        # Tagged with the shop so connect and disconnect drop it along with the shop's metrics
+        await self.cache.set(self._key(shop_id), entry, ttl=int(self.ttl * 2), tags=[EtsyClient.shop_tag(shop_id)])
+        self._generated += 1
+        return entry
+
+    def _refresh_done(self, shop_id: str, task: asyncio.Task):
+        """Forget a finished background refresh and log its failure"""
+        if self._refreshing.get(shop_id) is task:
+            del self._refreshing[shop_id]
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+            logger.warning(f"Report refresh failed for shop {shop_id}: {task.exception()!r}")
+
+    def _quantize(self, value: Any) -> float:
+        """Bucket a value in change_threshold relative steps"""
+        value = float(value or 0)
+        return math.copysign(round(math.log1p(abs(value)) / math.log1p(self.change_threshold)), value)
+
+    @staticmethod
+    def _key(shop_id: str) -> str:
+        return f"report:{shop_id}"
+
+_report_service: Optional[ReportService] = None
+
+def get_report_service() -> ReportService:
+    """Get the process-wide report service"""
+    global _report_service
+    if _report_service is None:
+        _report_service = ReportService()
+    return _report_service
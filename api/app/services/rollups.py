@@ -0,0 +1,182 @@
+import time
+import bisect
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.timeseries import get_timeseries_store
+
+# Trend series name -> shop KPI it rolls up into
+TREND_SERIES_TO_METRIC = {"revenue": "gmv", "orders": "orders", "visits": "visits", "views": "views"}
+
+DEFAULT_WINDOW_DAYS = 30
+
+def _add_day(intervals: List[Tuple[int, int]], day: int) -> bool:
+    """Add a day to sorted, merged day intervals, returning whether it was new"""
+    index = bisect.bisect_right(intervals, (day, float("inf")))
+    if index and intervals[index - 1][1] >= day:
+        return False
+
+    first, last = day, day
+    if index and intervals[index - 1][1] == day - 1:
+        index -= 1
+        first = intervals.pop(index)[0]
+    if index < len(intervals) and intervals[index][0] == day + 1:
+        last = intervals.pop(index)[1]
+    intervals.insert(index, (first, last))
+    return True
+
+class ShopRollup:
+    """Dense daily values per metric for one shop, with lazily rebuilt prefix sums
+
+    Day d of a metric lives at index d - base_day. After a write the prefix sums are
+    rebuilt once on the next query; every window sum after that is O(1). Days
+    between synced ranges are zero-filled, so coverage is kept as merged
+    intervals and a window must fall inside one of them.
+    """
+
+    def __init__(self):
+        self.base_day: Optional[int] = None
+        self._values: Dict[str, List[float]] = {}
+        self._prefix: Dict[str, List[float]] = {}
+        self._coverage: Dict[str, List[Tuple[int, int]]] = {}
+
+    def upsert(self, metric: str, day: int, value: float) -> bool:
+        """Set a metric's value for a day, returning whether anything changed"""
+        if self.base_day is None:
+            self.base_day = day
+        if day < self.base_day:
+            # Grow every metric to the left
+            pad = self.base_day - day
+            for name in self._values:
+                self._values[name] = [0.0] * pad + self._values[name]
+                self._prefix.pop(name, None)
+            self.base_day = day
+
+        values = self._values.setdefault(metric, [])
+        index = day - self.base_day
+        if index >= len(values):
+            values.extend([0.0] * (index + 1 - len(values)))
+        changed = _add_day(self._coverage.setdefault(metric, []), day) or values[index] != value
+        if values[index] != value:
+            values[index] = value
+            self._prefix.pop(metric, None)
+        return changed
+
+    def coverage(self, metric: str) -> Optional[Tuple[int, int]]:
+        """First and last day with data for a metric, ignoring gaps"""
+        intervals = self._coverage.get(metric)
+        return (intervals[0][0], intervals[-1][1]) if intervals else None
+
+    def intervals(self, metric: str) -> List[Tuple[int, int]]:
+        """Merged day intervals with data for a metric, in order"""
+        return list(self._coverage.get(metric, ()))
+
+    def covers(self, metric: str, from_day: int, to_day: int) -> bool:
+        """Whether one synced interval contains every day of [from_day, to_day]"""
+        intervals = self._coverage.get(metric, [])
+        index = bisect.bisect_right(intervals, (from_day, float("inf")))
+        return bool(index) and intervals[index - 1][1] >= to_day
+
+    def window_sum(self, metric: str, from_day: int, to_day: int) -> Optional[float]:
+        """Sum of a metric over [from_day, to_day], or None if the window is not fully covered"""
+        if not self.covers(metric, from_day, to_day):
+            return None
+
+        prefix = self._prefix.get(metric)
+        if prefix is None:
+            prefix = [0.0]
+            for value in self._values[metric]:
+                prefix.append(prefix[-1] + value)
+            self._prefix[metric] = prefix
+
+        return prefix[to_day - self.base_day + 1] - prefix[from_day - self.base_day]
+
+class DailyRollupStore:
+    """Per-shop daily KPI rollups used to compare a period with the one before it"""
+
+    def __init__(self):
+        self._shops: Dict[str, ShopRollup] = {}
+        self._versions: Dict[str, int] = {}
+
+    def ingest_trends(self, shop_id: str, raw_trends: Dict[str, Any]):
+        """Store daily points from a trends payload"""
+        rollup = self._shops.setdefault(shop_id, ShopRollup())
+        changed = False
+        for series, metric in TREND_SERIES_TO_METRIC.items():
+            for point in raw_trends.get(series) or []:
+                changed |= rollup.upsert(metric, date.fromisoformat(point["date"]).toordinal(), float(point["value"]))
+        if changed:
+            self._versions[shop_id] = time.time_ns()
+
+    def version(self, shop_id: str) -> int:
+        """Changes whenever a shop's rollups change, for HTTP validators"""
+        return self._versions.get(shop_id, 0)
+
+    def compare_windows(self, shop_id: str, from_date: Optional[str] = None,
+                        to_date: Optional[str] = None) -> Optional[Tuple[Dict[str, float], Dict[str, float]]]:
+        """Totals for the requested window and the equally long window before it
+
+        Without dates the window ends on the latest stored day and spans
+        DEFAULT_WINDOW_DAYS, or the latest half of the latest unbroken run of
+        history if less is stored.
+        Metrics whose windows are not fully covered are left out.
+        """
+        if shop_id not in self._shops:
+            # Rebuild from persisted history, e.g. after a restart
+            self.ingest_trends(shop_id, get_timeseries_store().query(shop_id, TREND_SERIES_TO_METRIC))
+        rollup = self._shops[shop_id]
+
+        from_day, to_day = self._resolve_window(rollup, from_date, to_date)
+        if from_day is None:
+            return None
+
+        length = to_day - from_day + 1
+        current, previous = {}, {}
+        for metric in TREND_SERIES_TO_METRIC.values():
+            now = rollup.window_sum(metric, from_day, to_day)
+            before = rollup.window_sum(metric, from_day - length, from_day - 1)
+            if now is not None and before is not None:
+                current[metric] = now
+                previous[metric] = before
+
+        for totals in (current, previous):
+            if totals.get("visits"):
+                totals["conversion_rate"] = totals.get("orders", 0) / totals["visits"] * 100
+
+        return (current, previous) if current else None
+
+    def _resolve_window(self, rollup: ShopRollup, from_date: Optional[str],
+                        to_date: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+        """Turn optional ISO dates into an inclusive day-ordinal window
+
+        The default window is drawn from the latest synced interval.
+        """
+        intervals = rollup.intervals("orders") or next(
+            (rollup.intervals(metric) for metric in TREND_SERIES_TO_METRIC.values() if rollup.intervals(metric)),
+            None
+        )
+        if not intervals:
+            return None, None
+        coverage = intervals[-1]
+
+        try:
+            to_day = date.fromisoformat(to_date).toordinal() if to_date else coverage[1]
+            from_day = date.fromisoformat(from_date).toordinal() if from_date else None
+        except ValueError:
+            return None, None
+
+        if from_day is None:
+            history = to_day - coverage[0] + 1
+            from_day = to_day - min(DEFAULT_WINDOW_DAYS, history // 2) + 1
+
+        if from_day > to_day:
+            return None, None
+        return from_day, to_day
+
+_rollup_store: Optional[DailyRollupStore] = None
+
+def get_rollup_store() -> DailyRollupStore:
+    """Get the process-wide rollup store"""
+    global _rollup_store
+    if _rollup_store is None:
+        _rollup_store = DailyRollupStore()
+    return _rollup_store
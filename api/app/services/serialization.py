@@ -0,0 +1,138 @@
+import os
+import json
+import zlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Header: magic, format version, codec id, compression id
+MAGIC = b"EN"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+CODEC_IDS = {"json": 0, "orjson": 1, "msgpack": 2}
+COMPRESSION_IDS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+def _json_codec() -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    return (
+        lambda value: json.dumps(value, separators=(",", ":")).encode(),
+        json.loads
+    )
+
+def _orjson_codec() -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    import orjson
+    return orjson.dumps, orjson.loads
+
+def _msgpack_codec() -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    import msgpack
+    return (
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False)
+    )
+
+def _zlib_compression() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    return (lambda data: zlib.compress(data, 6)), zlib.decompress
+
+def _zstd_compression() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=3)
+    decompressor = zstandard.ZstdDecompressor()
+    return compressor.compress, decompressor.decompress
+
+def _lz4_compression() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    import lz4.frame
+    return lz4.frame.compress, lz4.frame.decompress
+
+CODEC_LOADERS = {"json": _json_codec, "orjson": _orjson_codec, "msgpack": _msgpack_codec}
+COMPRESSION_LOADERS = {"zlib": _zlib_compression, "zstd": _zstd_compression, "lz4": _lz4_compression}
+
+def _first_available(loaders: Dict[str, Callable], preferred: Tuple[str, ...]) -> str:
+    """Pick the first option whose library imports"""
+    for name in preferred:
+        try:
+            loaders[name]()
+            return name
+        except ImportError:
+            continue
+    return preferred[-1]
+
+class Serializer:
+    """Encode cache payloads with a pluggable codec and optional compression
+
+    Every payload starts with a small versioned header naming the codec and
+    compression used, so any worker can decode entries written with a different
+    configuration. Payloads without the header are read as legacy plain JSON.
+    """
+
+    def __init__(self, codec: Optional[str] = None, compression: Optional[str] = None,
+                 compress_threshold: Optional[int] = None):
+        codec = codec or os.getenv("CACHE_CODEC") or _first_available(CODEC_LOADERS, ("orjson", "json"))
+        compression = compression or os.getenv("CACHE_COMPRESSION") or _first_available(
+            COMPRESSION_LOADERS, ("zstd", "zlib")
+        )
+        self.compress_threshold = compress_threshold if compress_threshold is not None else int(
+            os.getenv("CACHE_COMPRESS_THRESHOLD", "1024")
+        )
+
+        try:
+            self._encode, _ = CODEC_LOADERS[codec]()
+        except ImportError:
+            logger.warning(f"Cache codec {codec} not available, falling back to json")
+            codec = "json"
+            self._encode, _ = _json_codec()
+
+        self._compress = None
+        if compression != "none":
+            try:
+                self._compress, _ = COMPRESSION_LOADERS[compression]()
+            except ImportError:
+                logger.warning(f"Cache compression {compression} not available, falling back to zlib")
+                compression = "zlib"
+                self._compress, _ = _zlib_compression()
+
+        self.codec = codec
+        self.compression = compression
+        self._decoders: Dict[int, Callable[[bytes], Any]] = {}
+        self._decompressors: Dict[int, Callable[[bytes], bytes]] = {}
+
+    def dumps(self, value: Any) -> bytes:
+        """Encode a value with a header, compressing it above the size threshold"""
+        body = self._encode(value)
+        compression = "none"
+        if self._compress is not None and len(body) >= self.compress_threshold:
+            body = self._compress(body)
+            compression = self.compression
+
+        header = MAGIC + bytes((FORMAT_VERSION, CODEC_IDS[self.codec], COMPRESSION_IDS[compression]))
+        return header + body
+
+    def loads(self, data: bytes) -> Any:
+        """Decode a payload written by any supported codec, or legacy plain JSON"""
+        if isinstance(data, str):
+            data = data.encode()
+        if not data.startswith(MAGIC):
+            return json.loads(data)
+
+        version, codec_id, compression_id = data[len(MAGIC):HEADER_SIZE]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache payload version {version}")
+
+        body = data[HEADER_SIZE:]
+        if compression_id:
+            body = self._decompressor(compression_id)(body)
+        return self._decoder(codec_id)(body)
+
+    def _decoder(self, codec_id: int) -> Callable[[bytes], Any]:
+        """Get the decoder for a codec id, importing it on first use"""
+        if codec_id not in self._decoders:
+            name = next(name for name, value in CODEC_IDS.items() if value == codec_id)
+            _, self._decoders[codec_id] = CODEC_LOADERS[name]()
+        return self._decoders[codec_id]
+
+    def _decompressor(self, compression_id: int) -> Callable[[bytes], bytes]:
+        """Get the decompressor for a compression id, importing it on first use"""
+        if compression_id not in self._decompressors:
+            name = next(name for name, value in COMPRESSION_IDS.items() if value == compression_id)
+            _, self._decompressors[compression_id] = COMPRESSION_LOADERS[name]()
+        return self._decompressors[compression_id]
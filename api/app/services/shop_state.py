@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    shop_id TEXT NOT NULL,
+    listing_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    last_modified INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (shop_id, listing_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS receipts (
+    shop_id TEXT NOT NULL,
+    receipt_id INTEGER NOT NULL,
+    last_modified INTEGER,
+    lines TEXT NOT NULL,
+    PRIMARY KEY (shop_id, receipt_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sales (
+    shop_id TEXT NOT NULL,
+    listing_id INTEGER NOT NULL,
+    orders INTEGER NOT NULL,
+    revenue REAL NOT NULL,
+    PRIMARY KEY (shop_id, listing_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    shop_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    high_water INTEGER NOT NULL,
+    full_synced_at REAL NOT NULL,
+    PRIMARY KEY (shop_id, kind)
+) WITHOUT ROWID;
+"""
+
+# Receipt statuses that no longer count towards listing sales
+VOID_RECEIPT_STATUSES = {"canceled", "fully refunded"}
+
+def receipt_lines(receipt: Dict[str, Any]) -> Dict[int, Tuple[int, float]]:
+    """Per-listing (orders, revenue) a receipt contributes"""
+    if (receipt.get("status") or "").lower() in VOID_RECEIPT_STATUSES:
+        return {}
+    lines: Dict[int, Tuple[int, float]] = {}
+    for transaction in receipt.get("transactions", []):
+        listing_id = transaction["listing_id"]
+        _, revenue = lines.get(listing_id, (1, 0.0))
+        lines[listing_id] = (1, revenue + transaction.get("revenue", 0.0))
+    return lines
+
+class ShopStateStore:
+    """Locally synced listings and receipts per shop, merged incrementally
+
+    Listings are upserted by listing_id and receipts by receipt_id. Each receipt
+    keeps the per-listing sales it contributed, so a receipt seen again after an
+    update or refund adjusts the listing totals by the difference instead of
+    counting twice. High-water marks record the newest modification time synced.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SHOP_STATE_DB_PATH", ":memory:")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def high_water(self, shop_id: str, kind: str) -> Optional[int]:
+        """Newest modification timestamp synced for a shop's listings or receipts"""
+        row = self._sync_row(shop_id, kind)
+        return row[0] if row else None
+
+    def full_synced_at(self, shop_id: str, kind: str) -> Optional[float]:
+        """Wall-clock time of the last full sync"""
+        row = self._sync_row(shop_id, kind)
+        return row[1] if row else None
+
+    def sync_version(self, shop_id: str) -> Optional[Tuple]:
+        """Listings and receipts sync marks, which move whenever synced data may have changed
+
+        None until the shop's first full listings sync.
+        """
+        with self._lock:
+            rows = {kind: (high_water, synced_at) for kind, high_water, synced_at in self._conn.execute(
+                "SELECT kind, high_water, full_synced_at FROM sync_state WHERE shop_id = ?", (shop_id,)
+            )}
+        if "listings" not in rows:
+            return None
+        return rows["listings"], rows.get("receipts")
+
+    def has_listings(self, shop_id: str) -> bool:
+        """Whether a full listings sync has completed for the shop"""
+        return self._sync_row(shop_id, "listings") is not None
+
+    def merge_listings(self, shop_id: str, listings: Iterable[Dict[str, Any]]) -> int:
+        """Upsert changed listings, keeping existing catalog positions"""
+        count = 0
+        with self._lock, self._conn:
+            next_position = self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM listings WHERE shop_id = ?", (shop_id,)
+            ).fetchone()[0]
+            for listing in listings:
+                existing = self._conn.execute(
+                    "SELECT position FROM listings WHERE shop_id = ? AND listing_id = ?",
+                    (shop_id, listing["listing_id"])
+                ).fetchone()
+                if existing:
+                    position = existing[0]
+                else:
+                    position, next_position = next_position, next_position + 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?)",
+                    (shop_id, listing["listing_id"], position, listing.get("last_modified_timestamp"),
+                     json.dumps(listing))
+                )
+                count += 1
+        return count
+
+    def retain_listings(self, shop_id: str, listing_ids: Iterable[int]) -> int:
+        """Drop listings missing from a full sync, e.g. deactivated ones"""
+        keep = set(listing_ids)
+        with self._lock, self._conn:
+            stored = [row[0] for row in self._conn.execute(
+                "SELECT listing_id FROM listings WHERE shop_id = ?", (shop_id,)
+            )]
+            removed = [(shop_id, listing_id) for listing_id in stored if listing_id not in keep]
+            self._conn.executemany("DELETE FROM listings WHERE shop_id = ? AND listing_id = ?", removed)
+        return len(removed)
+
+    def merge_receipts(self, shop_id: str, receipts: Iterable[Dict[str, Any]]) -> int:
+        """Upsert receipts and adjust per-listing sales by what changed"""
+        count = 0
+        with self._lock, self._conn:
+            for receipt in receipts:
+                row = self._conn.execute(
+                    "SELECT lines FROM receipts WHERE shop_id = ? AND receipt_id = ?",
+                    (shop_id, receipt["receipt_id"])
+                ).fetchone()
+                old = {int(k): tuple(v) for k, v in json.loads(row[0]).items()} if row else {}
+                new = receipt_lines(receipt)
+
+                for listing_id in set(old) | set(new):
+                    old_orders, old_revenue = old.get(listing_id, (0, 0.0))
+                    new_orders, new_revenue = new.get(listing_id, (0, 0.0))
+                    if (old_orders, old_revenue) == (new_orders, new_revenue):
+                        continue
+                    self._conn.execute(
+                        "INSERT INTO sales VALUES (?, ?, ?, ?) ON CONFLICT (shop_id, listing_id) "
+                        "DO UPDATE SET orders = orders + excluded.orders, revenue = revenue + excluded.revenue",
+                        (shop_id, listing_id, new_orders - old_orders, new_revenue - old_revenue)
+                    )
+
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO receipts VALUES (?, ?, ?, ?)",
+                    (shop_id, receipt["receipt_id"], receipt.get("last_modified"), json.dumps(new))
+                )
+                count += 1
+        return count
+
+    def mark_synced(self, shop_id: str, kind: str, high_water: Optional[int], full: bool = False):
+        """Advance a high-water mark, recording the time when it was a full sync"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT high_water, full_synced_at FROM sync_state WHERE shop_id = ? AND kind = ?", (shop_id, kind)
+            ).fetchone()
+            current, synced_at = row if row else (0, 0.0)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (shop_id, kind, max(current, high_water or 0), time.time() if full else synced_at)
+            )
+
+    def count_listings(self, shop_id: str) -> int:
+        """Number of stored listings for a shop"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM listings WHERE shop_id = ?", (shop_id,)).fetchone()[0]
+
+    def listings(self, shop_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Stored listings in catalog order, with sales from synced receipts when available"""
+        with self._lock:
+            use_sales = self._conn.execute(
+                "SELECT 1 FROM sales WHERE shop_id = ? LIMIT 1", (shop_id,)
+            ).fetchone() is not None
+            rows = self._conn.execute(
+                "SELECT l.data, s.orders, s.revenue FROM listings l "
+                "LEFT JOIN sales s ON s.shop_id = l.shop_id AND s.listing_id = l.listing_id "
+                "WHERE l.shop_id = ? ORDER BY l.position LIMIT ? OFFSET ?",
+                (shop_id, limit, offset)
+            ).fetchall()
+
+        result = []
+        for data, orders, revenue in rows:
+            listing = json.loads(data)
+            if use_sales:
+                listing["orders"] = orders or 0
+                listing["revenue"] = round(revenue or 0.0, 2)
+            result.append(listing)
+        return result
+
+    def with_sales(self, shop_id: str, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of listings with orders and revenue from synced receipts, unchanged when none are synced"""
+        if not listings:
+            return listings
+        listing_ids = [listing["listing_id"] for listing in listings]
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM sales WHERE shop_id = ? LIMIT 1", (shop_id,)).fetchone() is None:
+                return listings
+            sales = {row[0]: row[1:] for row in self._conn.execute(
+                "SELECT listing_id, orders, revenue FROM sales WHERE shop_id = ? "
+                f"AND listing_id IN ({','.join('?' * len(listing_ids))})",
+                (shop_id, *listing_ids)
+            )}
+
+        result = []
+        for listing in listings:
+            orders, revenue = sales.get(listing["listing_id"], (0, 0.0))
+            result.append({**listing, "orders": orders, "revenue": round(revenue, 2)})
+        return result
+
+    def sales(self, shop_id: str, listing_id: int) -> Tuple[int, float]:
+        """Orders and revenue accumulated from receipts for a listing"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT orders, revenue FROM sales WHERE shop_id = ? AND listing_id = ?", (shop_id, listing_id)
+            ).fetchone()
+        return (row[0], round(row[1], 2)) if row else (0, 0.0)
+
+    def purge(self, shop_id: str):
+        """Forget everything synced for a shop, e.g. on disconnect"""
+        with self._lock, self._conn:
+            for table in ("listings", "receipts", "sales", "sync_state"):
+                self._conn.execute(f"DELETE FROM {table} WHERE shop_id = ?", (shop_id,))
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _sync_row(self, shop_id: str, kind: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT high_water, full_synced_at FROM sync_state WHERE shop_id = ? AND kind = ?", (shop_id, kind)
+            ).fetchone()
+
+_shop_state_store: Optional[ShopStateStore] = None
+
+def get_shop_state_store() -> ShopStateStore:
+    """Get the process-wide shop state store"""
+    global _shop_state_store
+    if _shop_state_store is None:
+        _shop_state_store = ShopStateStore()
+    return _shop_state_store
+
+def close_shop_state_store():
+    """Close the process-wide shop state store"""
+    global _shop_state_store
+    if _shop_state_store is not None:
+        _shop_state_store.close()
+        _shop_state_store = None
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight upstream task"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._originated = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the call already in flight for the same key"""
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self._coalesced += 1
+        else:
+            self._originated += 1
+            task = loop.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shield so one caller going away does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently in flight"""
+        return sum(1 for task in self._calls.values() if not task.done())
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        total = self._originated + self._coalesced
+        return {
+            "originated": self._originated,
+            "coalesced": self._coalesced,
+            "in_flight": self.in_flight(),
+            "coalesce_ratio": round(self._coalesced / total, 4) if total else 0.0
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """Drop a finished call and mark its exception as retrieved"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+_singleflight: Optional[SingleFlight] = None
+
+def get_singleflight() -> SingleFlight:
+    """Get the process-wide single-flight group for Etsy fetches"""
+    global _singleflight
+    if _singleflight is None:
+        _singleflight = SingleFlight()
+    return _singleflight
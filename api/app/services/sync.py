@@ -0,0 +1,303 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.auth.tokens import TokenStore, get_token_store
+from app.services.cache import CacheService, get_cache_service
+from app.services.etsy_client import EtsyClient
+from app.services.rate_limiter import Priority, get_request_scheduler
+from app.services.reports import ReportService, get_report_service
+from app.services.shop_state import ShopStateStore, get_shop_state_store
+from app.services.timeseries import SERIES
+
+logger = logging.getLogger(__name__)
+
+# Sync job -> cache entry type whose fresh TTL sets its staleness budget
+SYNC_JOBS = {
+    "shop": "shop_stats",
+    "listings": "listings_page",
+    "trends": "trends_data",
+    "funnel": "funnel_stats"
+}
+
+# Lease that keeps the sync loop to one worker when workers share Redis
+SYNC_LEASE = "sync"
+
+def _newest(items: List[Dict[str, Any]], field: str) -> int:
+    """Largest timestamp in a page, treating missing values as 0"""
+    return max((item.get(field) or 0 for item in items), default=0)
+
+class SyncScheduler:
+    """Background pre-warming of metrics for connected shops
+
+    Each (shop, job) pair is refetched shortly before its cache entry would go
+    stale, with jitter so shops do not sync in lockstep. Listings and receipts
+    are synced incrementally into the shop state store. Requests go through the
+    BACKGROUND priority lane, and jobs are deferred while interactive requests
+    are queued or the daily Etsy quota runs low. Each successful shop stats
+    sync refreshes the shop's report from the stats it fetched.
+
+    Only the worker holding the sync lease runs jobs; it follows the token
+    store, so shops connected through any worker, or before a restart, are
+    synced once. Without Redis every process holds the lease, so SYNC_ENABLED
+    should be set on one worker only.
+    """
+
+    def __init__(self, client: Optional[EtsyClient] = None, interval: Optional[float] = None,
+                 jitter: Optional[float] = None, concurrency: Optional[int] = None,
+                 state: Optional[ShopStateStore] = None, reports: Optional[ReportService] = None,
+                 tokens: Optional[TokenStore] = None, cache: Optional[CacheService] = None):
+        self.client = client or EtsyClient(priority=Priority.BACKGROUND, refresh=True)
+        self.tokens = tokens or get_token_store()
+        self.cache = cache or get_cache_service()
+        self.state = state or get_shop_state_store()
+        self.reports = reports or get_report_service()
+        self.interval = interval if interval is not None else float(os.getenv("SYNC_INTERVAL", "15"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("SYNC_JITTER", "0.2"))
+        self.concurrency = concurrency or int(os.getenv("SYNC_CONCURRENCY", "2"))
+        self.staleness_fraction = float(os.getenv("SYNC_STALENESS_FRACTION", "0.8"))
+        self.max_interactive_queue = int(os.getenv("SYNC_MAX_INTERACTIVE_QUEUE", "0"))
+        self.min_remaining_today = int(os.getenv("SYNC_MIN_REMAINING_TODAY", "1000"))
+        self.enabled = os.getenv("SYNC_ENABLED", "true") == "true"
+        self.full_resync_interval = float(os.getenv("SYNC_FULL_RESYNC_INTERVAL", "86400"))
+        self.receipts_lookback_days = int(os.getenv("SYNC_RECEIPTS_LOOKBACK_DAYS", "365"))
+        self.lease_ttl = int(os.getenv("SYNC_LEASE_TTL", "120"))
+
+        self._shops: Set[str] = set()
+        self._stored: Set[str] = set()
+        self._leader = False
+        self._due: Dict[Tuple[str, str], float] = {}
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self._runs = 0
+        self._errors = 0
+        self._deferred = 0
+        self._changes = 0
+        self._full_syncs = 0
+        self._last_run: Dict[str, float] = {}
+
+        for shop_id in filter(None, (s.strip() for s in os.getenv("SYNC_SHOP_IDS", "").split(","))):
+            self.register(shop_id)
+
+    def register(self, shop_id: str):
+        """Start syncing a shop, with its first run spread over one interval"""
+        if shop_id in self._shops:
+            return
+        self._shops.add(shop_id)
+        now = time.monotonic()
+        for job in SYNC_JOBS:
+            self._due[(shop_id, job)] = now + random.uniform(0, self.interval)
+
+    def unregister(self, shop_id: str):
+        """Stop syncing a shop"""
+        self._shops.discard(shop_id)
+        self._last_run.pop(shop_id, None)
+        for job in SYNC_JOBS:
+            self._due.pop((shop_id, job), None)
+            self._failures.pop((shop_id, job), None)
+
+    def shops(self) -> List[str]:
+        """Connected shops being synced"""
+        return sorted(self._shops)
+
+    def budget(self, job: str) -> float:
+        """Seconds between syncs of a job, kept inside the fresh cache TTL"""
+        fresh_ttl, _ = EtsyClient.CACHE_TTLS[SYNC_JOBS[job]]
+        return fresh_ttl * self.staleness_fraction
+
+    def should_defer(self) -> bool:
+        """Whether background work should wait for interactive traffic or quota"""
+        stats = get_request_scheduler().stats()
+        if stats["lanes"]["interactive"]["queue_depth"] > self.max_interactive_queue:
+            return True
+        remaining = stats["remaining_today"]
+        return remaining is not None and remaining < self.min_remaining_today
+
+    async def run_once(self) -> int:
+        """Run every due job, returning how many ran"""
+        now = time.monotonic()
+        due = sorted((at, key) for key, at in self._due.items() if at <= now)
+        if not due:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(key: Tuple[str, str]) -> bool:
+            async with semaphore:
+                if self.should_defer():
+                    self._deferred += 1
+                    return False
+                await self._run_job(*key)
+                return True
+
+        results = await asyncio.gather(*(run(key) for _, key in due))
+        return sum(results)
+
+    async def sync_shop(self, shop_id: str):
+        """Sync every job for a shop now"""
+        for job in SYNC_JOBS:
+            await self._run_job(shop_id, job)
+
+    async def start(self):
+        """Start the background sync loop"""
+        if not self.enabled:
+            return
+        self._follow_token_store()
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background sync loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._leader:
+            await self.cache.release_lease(SYNC_LEASE)
+            self._leader = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Get sync progress and backpressure statistics"""
+        now = time.monotonic()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "shops": len(self._shops),
+            "runs": self._runs,
+            "errors": self._errors,
+            "deferred": self._deferred,
+            "full_listing_syncs": self._full_syncs,
+            "changes_merged": self._changes,
+            "leader": self._leader,
+            "due": sum(1 for at in self._due.values() if at <= now),
+            "oldest_sync_age": round(now - min(self._last_run.values()), 1) if self._last_run else None
+        }
+
+    async def _run_job(self, shop_id: str, job: str):
+        """Refetch one job's data and schedule its next run"""
+        key = (shop_id, job)
+        try:
+            result = await self._jobs()[job](shop_id)
+        except Exception as e:
+            self._errors += 1
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            logger.warning(f"Sync {job} failed for shop {shop_id}: {e!r}")
+            delay = min(self.budget(job), self.interval * 2 ** failures)
+        else:
+            self._runs += 1
+            self._failures.pop(key, None)
+            self._last_run[shop_id] = time.monotonic()
+            delay = self.budget(job) * (1 - random.uniform(0, self.jitter))
+            if job == "shop":
+                await self._refresh_report(shop_id, result)
+
+        if shop_id in self._shops:
+            self._due[key] = time.monotonic() + delay
+
+    async def _refresh_report(self, shop_id: str, raw_stats: Dict[str, Any]):
+        """Regenerate a shop's report if its new stats changed it; failures do not fail the sync"""
+        try:
+            await self.reports.refresh(shop_id, raw_stats, client=self.client)
+        except Exception as e:
+            logger.warning(f"Report refresh failed for shop {shop_id}: {e!r}")
+
+    def _jobs(self) -> Dict[str, Callable[[str], Awaitable[Any]]]:
+        """Sync job implementations, warming the keys default dashboard requests read"""
+        return {
+            "shop": self.client.get_shop_stats,
+            "listings": self._sync_listings,
+            "trends": lambda shop_id: self.client.get_trends_data(shop_id, series=list(SERIES)),
+            "funnel": self.client.get_funnel_stats
+        }
+
+    async def _sync_listings(self, shop_id: str):
+        """Merge listings and receipts changed since the last sync into the shop state
+
+        A full pull runs on first sync and every full_resync_interval to drop
+        listings that left the active catalog; in between only changes are fetched.
+        """
+        synced_at = self.state.full_synced_at(shop_id, "listings")
+        if synced_at is None or time.time() - synced_at > self.full_resync_interval:
+            await self._full_listings_sync(shop_id)
+        else:
+            since = self.state.high_water(shop_id, "listings")
+            high_water = since
+            async with aclosing(self.client.iter_changed_listings(shop_id, since)) as pages:
+                async for page in pages:
+                    self._changes += self.state.merge_listings(shop_id, page)
+                    high_water = max(high_water, _newest(page, "last_modified_timestamp"))
+            self.state.mark_synced(shop_id, "listings", high_water)
+
+        await self._sync_receipts(shop_id)
+
+    async def _full_listings_sync(self, shop_id: str):
+        """Pull the whole active catalog and replace the stored listings"""
+        listing_ids = set()
+        high_water = 0
+        async with aclosing(self.client.iter_listing_pages(shop_id)) as pages:
+            async for page in pages:
+                self.state.merge_listings(shop_id, page)
+                listing_ids.update(listing["listing_id"] for listing in page)
+                high_water = max(high_water, _newest(page, "last_modified_timestamp"))
+        self.state.retain_listings(shop_id, listing_ids)
+        self.state.mark_synced(shop_id, "listings", high_water, full=True)
+        self._full_syncs += 1
+
+    async def _sync_receipts(self, shop_id: str):
+        """Merge receipts changed since the receipts high-water mark"""
+        since = self.state.high_water(shop_id, "receipts")
+        if since is None:
+            since = int(time.time() - self.receipts_lookback_days * 86400)
+        high_water = since
+        async with aclosing(self.client.iter_receipts(shop_id, since)) as pages:
+            async for page in pages:
+                self._changes += self.state.merge_receipts(shop_id, page)
+                high_water = max(high_water, _newest(page, "last_modified"))
+        self.state.mark_synced(shop_id, "receipts", high_water)
+
+    async def _hold_lease(self) -> bool:
+        """Take or renew the sync lease, reporting whether this worker should run jobs"""
+        leader = await self.cache.acquire_lease(SYNC_LEASE, self.lease_ttl)
+        if leader != self._leader:
+            logger.info(f"Sync lease {'acquired' if leader else 'lost'}")
+        self._leader = leader
+        return leader
+
+    def _follow_token_store(self):
+        """Sync every shop with a stored token, including ones connected or disconnected elsewhere"""
+        stored = set(self.tokens.shops())
+        for shop_id in self._stored - stored:
+            self.unregister(shop_id)
+        for shop_id in stored:
+            self.register(shop_id)
+        self._stored = stored
+
+    async def _run(self):
+        """Run due jobs every interval while holding the sync lease, until cancelled"""
+        while True:
+            try:
+                if await self._hold_lease():
+                    self._follow_token_store()
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Sync loop iteration failed: {e!r}")
+            await asyncio.sleep(self.interval)
+
+_sync_scheduler: Optional[SyncScheduler] = None
+
+def get_sync_scheduler() -> SyncScheduler:
+    """Get the process-wide sync scheduler"""
+    global _sync_scheduler
+    if _sync_scheduler is None:
+        _sync_scheduler = SyncScheduler()
+    return _sync_scheduler
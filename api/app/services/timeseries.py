@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SERIES = ("revenue", "orders", "visits", "views")
+GRANULARITIES = ("day", "week", "month")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    shop_id TEXT NOT NULL,
+    series TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (shop_id, series, granularity, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    shop_id TEXT NOT NULL,
+    series TEXT NOT NULL,
+    first_day TEXT NOT NULL,
+    last_day TEXT NOT NULL,
+    PRIMARY KEY (shop_id, series, first_day)
+) WITHOUT ROWID;
+"""
+
+def bucket_start(day: date, granularity: str) -> date:
+    """First day of the bucket a day falls in; weeks start on Monday"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def _merge_intervals(intervals: Iterable[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    """Merge overlapping or adjacent day intervals"""
+    merged: List[Tuple[date, date]] = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+class TimeSeriesStore:
+    """Embedded SQLite store of daily shop series with weekly and monthly rollups
+
+    Daily points are upserted as they arrive and only the week and month buckets
+    they touch are re-summed, so range queries at any granularity read
+    pre-aggregated rows from the primary key index. Coverage intervals record
+    which days have been synced, letting callers skip upstream fetches.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("TIMESERIES_DB_PATH", ":memory:")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+        self._versions: Dict[str, int] = {}
+
+    def ingest(self, shop_id: str, raw_trends: Dict[str, Any]) -> int:
+        """Store daily points from a trends payload and refresh the rollups they touch"""
+        stored = 0
+        with self._lock, self._conn:
+            for series in SERIES:
+                points = raw_trends.get(series) or []
+                if not points:
+                    continue
+                days = [date.fromisoformat(point["date"]) for point in points]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO points VALUES (?, ?, 'day', ?, ?)",
+                    [(shop_id, series, day.isoformat(), float(point["value"])) for day, point in zip(days, points)]
+                )
+                for granularity in ("week", "month"):
+                    for start in {bucket_start(day, granularity) for day in days}:
+                        self._rebuild_bucket(shop_id, series, granularity, start)
+                self._add_coverage(shop_id, series, min(days), max(days))
+                stored += len(points)
+        if stored:
+            self._versions[shop_id] = time.time_ns()
+        return stored
+
+    def version(self, shop_id: str) -> Optional[int]:
+        """Time of this process's last write for a shop, or None if it has not written any"""
+        return self._versions.get(shop_id)
+
+    def covers(self, shop_id: str, series: Iterable[str], from_date: Optional[str],
+               to_date: Optional[str]) -> bool:
+        """Whether every day of [from_date, to_date] has been synced for every series"""
+        if not from_date or not to_date:
+            return False
+        first, last = date.fromisoformat(from_date), date.fromisoformat(to_date)
+        with self._lock:
+            for name in series:
+                intervals = self._coverage(shop_id, name)
+                if not any(start <= first and last <= end for start, end in intervals):
+                    return False
+        return True
+
+    def span(self, shop_id: str, series: str) -> Optional[Tuple[str, str]]:
+        """First and last synced day for a series"""
+        with self._lock:
+            intervals = self._coverage(shop_id, series)
+        if not intervals:
+            return None
+        return intervals[0][0].isoformat(), intervals[-1][1].isoformat()
+
+    def query(self, shop_id: str, series: Iterable[str], granularity: str = "day",
+              from_date: Optional[str] = None, to_date: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Points per series at a granularity, keyed by bucket start date
+
+        Buckets are included when their start falls between the bucket of
+        from_date and to_date.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        low = bucket_start(date.fromisoformat(from_date), granularity).isoformat() if from_date else ""
+        high = to_date or "9999-12-31"
+        result = {}
+        with self._lock:
+            for name in series:
+                rows = self._conn.execute(
+                    "SELECT bucket, value FROM points WHERE shop_id = ? AND series = ? AND granularity = ? "
+                    "AND bucket >= ? AND bucket <= ? ORDER BY bucket",
+                    (shop_id, name, granularity, low, high)
+                ).fetchall()
+                result[name] = [{"date": bucket, "value": value} for bucket, value in rows]
+        return result
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _rebuild_bucket(self, shop_id: str, series: str, granularity: str, start: date):
+        """Re-sum one week or month bucket from its daily points"""
+        end = start + timedelta(days=6) if granularity == "week" else (
+            (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO points "
+            "SELECT ?, ?, ?, ?, SUM(value) FROM points "
+            "WHERE shop_id = ? AND series = ? AND granularity = 'day' AND bucket >= ? AND bucket <= ?",
+            (shop_id, series, granularity, start.isoformat(), shop_id, series, start.isoformat(), end.isoformat())
+        )
+
+    def _coverage(self, shop_id: str, series: str) -> List[Tuple[date, date]]:
+        """Synced day intervals for a series, in order"""
+        rows = self._conn.execute(
+            "SELECT first_day, last_day FROM coverage WHERE shop_id = ? AND series = ? ORDER BY first_day",
+            (shop_id, series)
+        ).fetchall()
+        return [(date.fromisoformat(first), date.fromisoformat(last)) for first, last in rows]
+
+    def _add_coverage(self, shop_id: str, series: str, first: date, last: date):
+        """Record a synced interval, merging it with its neighbours"""
+        merged = _merge_intervals(self._coverage(shop_id, series) + [(first, last)])
+        self._conn.execute("DELETE FROM coverage WHERE shop_id = ? AND series = ?", (shop_id, series))
+        self._conn.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?, ?)",
+            [(shop_id, series, start.isoformat(), end.isoformat()) for start, end in merged]
+        )
+
+_timeseries_store: Optional[TimeSeriesStore] = None
+
+def get_timeseries_store() -> TimeSeriesStore:
+    """Get the process-wide time-series store"""
+    global _timeseries_store
+    if _timeseries_store is None:
+        _timeseries_store = TimeSeriesStore()
+    return _timeseries_store
+
+def close_timeseries_store():
+    """Close the process-wide time-series store"""
+    global _timeseries_store
+    if _timeseries_store is not None:
+        _timeseries_store.close()
+        _timeseries_store = None
@@ -0,0 +1,23 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Sequence
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _csv_line(values: Sequence[Any]) -> str:
+    """Format one CSV row"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+async def stream_rows(rows: AsyncIterable[Dict[str, Any]], fmt: str,
+                      columns: Sequence[str]) -> AsyncIterator[str]:
+    """Encode rows one at a time as NDJSON lines or CSV with a header row"""
+    if fmt == "csv":
+        yield _csv_line(columns)
+        async for row in rows:
+            yield _csv_line([row.get(column, "") for column in columns])
+    else:
+        async for row in rows:
+            yield json.dumps({column: row.get(column) for column in columns}) + "\n"
@@ -0,0 +1,151 @@
+import os
+import gzip
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+
+def encode_json(content: Any) -> bytes:
+    """Encode a response model, or a plain dict already shaped like one, to JSON bytes
+
+    Plain dicts skip pydantic entirely; they must match the declared
+    response_model since nothing re-validates them.
+    """
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode()
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":")).encode()
+
+class BodyCache:
+    """Bounded LRU of encoded response bodies keyed by version ETag
+
+    A version ETag only changes when the data behind it does, so a body encoded
+    once can be served to every client polling the same query until then.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("HTTP_BODY_CACHE_SIZE", "256")
+        )
+        self._bodies: "OrderedDict[str, bytes]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, etag: str) -> Optional[bytes]:
+        """Encoded body for an ETag, if still cached"""
+        body = self._bodies.get(etag)
+        if body is None:
+            self._misses += 1
+            return None
+        self._bodies.move_to_end(etag)
+        self._hits += 1
+        return body
+
+    def put(self, etag: str, body: bytes):
+        """Remember an encoded body, evicting the least recently used one when full"""
+        if self.max_entries <= 0:
+            return
+        self._bodies[etag] = body
+        self._bodies.move_to_end(etag)
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit statistics"""
+        return {
+            "entries": len(self._bodies),
+            "bytes": sum(len(body) for body in self._bodies.values()),
+            "hits": self._hits,
+            "misses": self._misses
+        }
+
+_body_cache: Optional[BodyCache] = None
+
+def get_body_cache() -> BodyCache:
+    """Get the process-wide encoded body cache"""
+    global _body_cache
+    if _body_cache is None:
+        _body_cache = BodyCache()
+    return _body_cache
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag over a content hash or data versions; weak so it holds across encodings"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists the ETag, using weak comparison"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def not_modified(etag: str) -> Response:
+    """304 response carrying the current validator"""
+    return Response(status_code=304, headers=_cache_headers(etag))
+
+def _accepted_encodings(request: Request) -> Dict[str, float]:
+    """Parse Accept-Encoding into coding -> q-value"""
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+def negotiate_encoding(request: Request, size: int) -> Optional[str]:
+    """Pick brotli or gzip for bodies large enough to be worth compressing"""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = _accepted_encodings(request)
+    candidates = [coding for coding in ("br", "gzip") if accepted.get(coding, 0) > 0]
+    if brotli is None and "br" in candidates:
+        candidates.remove("br")
+    if not candidates:
+        return None
+    return max(candidates, key=lambda coding: accepted[coding])
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a body with a negotiated encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+def json_response(request: Request, body: bytes, etag: str) -> Response:
+    """JSON response with validators and negotiated compression"""
+    encoding = negotiate_encoding(request, len(body))
+    headers = _cache_headers(etag)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=compress(body, encoding), media_type="application/json", headers=headers)
+
+def _cache_headers(etag: str) -> Dict[str, str]:
+    """Validators telling clients to revalidate every poll"""
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
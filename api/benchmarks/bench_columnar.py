@@ -0,0 +1,65 @@
+"""Compare per-listing analytics with the columnar NumPy engine at 10k-1M listings
+
+Run from the api directory:
+
+    python -m benchmarks.bench_columnar
+"""
+import random
+import time
+from typing import Any, Dict, List
+
+from app.agent.heuristics import analyze_listing_performance
+from app.services.columnar import ListingColumns
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+def make_listings(count: int) -> List[Dict[str, Any]]:
+    """Synthetic catalog with a realistic spread of views and orders"""
+    rng = random.Random(42)
+    listings = []
+    for i in range(count):
+        views = int(rng.paretovariate(1.2) * 20)
+        orders = rng.randint(0, max(1, views // 25))
+        listings.append({
+            "listing_id": i,
+            "title": f"Listing {i}",
+            "views": views,
+            "orders": orders,
+            "revenue": orders * rng.uniform(8, 60),
+            "etsy_url": f"https://www.etsy.com/listing/{i}"
+        })
+    return listings
+
+def per_item(listings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Current approach: one dict at a time, then sort for rankings"""
+    scores = [analyze_listing_performance(listing)["performance_score"] for listing in listings]
+    conversions = sorted(
+        (listing["orders"] / listing["views"] * 100) if listing["views"] > 0 else 0 for listing in listings
+    )
+    ranked = sorted(range(len(listings)), key=lambda i: scores[i], reverse=True)[:5]
+    median = conversions[len(conversions) // 2]
+    return {"top": ranked, "median_conversion": median}
+
+def columnar(listings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar approach, including the cost of building the arrays"""
+    columns = ListingColumns.from_listings(listings)
+    return columns.summary()
+
+def columnar_prebuilt(columns: ListingColumns) -> Dict[str, Any]:
+    """Columnar approach on arrays that are already built"""
+    return columns.summary()
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    print(f"{'listings':>10}{'per-item s':>14}{'columnar s':>14}{'prebuilt s':>14}{'rows/s prebuilt':>18}")
+    for size in SIZES:
+        listings = make_listings(size)
+        columns = ListingColumns.from_listings(listings)
+        t_item = timed(per_item, listings)
+        t_col = timed(columnar, listings)
+        t_pre = timed(columnar_prebuilt, columns)
+        print(f"{size:>10}{t_item:>14.3f}{t_col:>14.3f}{t_pre:>14.4f}{size / t_pre:>18,.0f}")
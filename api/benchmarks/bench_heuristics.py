@@ -0,0 +1,46 @@
+"""Compare per-listing heuristics with the batch engine at 10k-1M listings
+
+Run from the api directory:
+
+    python -m benchmarks.bench_heuristics
+"""
+import time
+from typing import Any, Dict, List
+
+from app.agent.heuristics import analyze_listing_performance, analyze_listings, generate_heuristic_summary
+from app.services.columnar import ListingColumns
+from benchmarks.bench_columnar import make_listings
+
+SIZES = [10_000, 100_000, 1_000_000]
+BUDGET_MS = 50
+
+def per_item(listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Old approach: analyze one listing dict at a time"""
+    return [analyze_listing_performance(listing) for listing in listings]
+
+def batch(columns: ListingColumns) -> Dict[str, Any]:
+    """Batch engine on prebuilt columns, plus the summary it feeds"""
+    analysis = analyze_listings(columns)
+    generate_heuristic_summary(listings=analysis)
+    return analysis
+
+def best_ms(fn, *args, repeat: int = 5) -> float:
+    """Fastest of several runs, in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+if __name__ == "__main__":
+    print(f"{'listings':>10}{'per-item ms':>14}{'build ms':>12}{'batch ms':>12}{'speedup':>10}")
+    for size in SIZES:
+        listings = make_listings(size)
+        columns = ListingColumns.from_listings(listings)
+        t_item = best_ms(per_item, listings, repeat=1)
+        t_build = best_ms(ListingColumns.from_listings, listings, repeat=1)
+        t_batch = best_ms(batch, columns)
+        print(f"{size:>10}{t_item:>14.1f}{t_build:>12.1f}{t_batch:>12.2f}{t_item / t_batch:>9.0f}x")
+        if size == SIZES[0]:
+            assert t_batch < BUDGET_MS, f"batch heuristics took {t_batch:.1f} ms for {size} listings"
@@ -0,0 +1,111 @@
+"""Compare trends and listings response serialization paths in requests per second
+
+Each path serves the same synthetic shop through a TestClient:
+
+    response_model  handler returns the model, FastAPI re-validates and serializes it
+    model_dump      pydantic models built per point, encoded with model_dump_json
+    dict+orjson     plain dict payload encoded with orjson (the /metrics fast path)
+    cached          encoded bytes reused for an unchanged version ETag
+
+Run from the api directory:
+
+    python -m benchmarks.bench_responses
+"""
+import time
+from datetime import date, timedelta
+from typing import Any, Dict
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.models.kpis import ListingsResponse, TrendsResponse
+from app.services.aggregator import ListingsAccumulator, MetricsAggregator
+from app.utils.http_cache import BodyCache, encode_json
+from benchmarks.bench_columnar import make_listings
+
+DAYS = 3 * 365
+LISTINGS = 1_000
+REQUESTS = 200
+SERIES = ["revenue", "orders", "visits", "views"]
+
+def make_trends(days: int) -> Dict[str, Any]:
+    """Daily points for every series"""
+    start = date(2022, 1, 1)
+    return {
+        name: [{"date": (start + timedelta(days=i)).isoformat(), "value": float((i * 7 + offset) % 113)}
+               for i in range(days)]
+        for offset, name in enumerate(SERIES)
+    }
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    aggregator = MetricsAggregator()
+    trends = make_trends(DAYS)
+    listings = {"listings": make_listings(LISTINGS)}
+    bodies = BodyCache()
+
+    @app.get("/trends/response_model", response_model=TrendsResponse)
+    def trends_model():
+        return aggregator.aggregate_trends(trends, SERIES)
+
+    @app.get("/trends/model_dump")
+    def trends_dump():
+        return Response(aggregator.aggregate_trends(trends, SERIES).model_dump_json(), media_type="application/json")
+
+    @app.get("/trends/dict+orjson")
+    def trends_fast():
+        return Response(encode_json(aggregator.trends_payload(trends, SERIES)), media_type="application/json")
+
+    @app.get("/trends/cached")
+    def trends_cached():
+        body = bodies.get("trends")
+        if body is None:
+            body = encode_json(aggregator.trends_payload(trends, SERIES))
+            bodies.put("trends", body)
+        return Response(body, media_type="application/json")
+
+    @app.get("/listings/response_model", response_model=ListingsResponse)
+    def listings_model():
+        return aggregator.aggregate_listings_metrics(listings)
+
+    @app.get("/listings/model_dump")
+    def listings_dump():
+        return Response(aggregator.aggregate_listings_metrics(listings).model_dump_json(),
+                        media_type="application/json")
+
+    @app.get("/listings/dict+orjson")
+    def listings_fast():
+        return Response(encode_json(_listings_dict(listings)), media_type="application/json")
+
+    @app.get("/listings/cached")
+    def listings_cached():
+        body = bodies.get("listings")
+        if body is None:
+            body = encode_json(_listings_dict(listings))
+            bodies.put("listings", body)
+        return Response(body, media_type="application/json")
+
+    return app
+
+def _listings_dict(listings: Dict[str, Any]) -> Dict[str, Any]:
+    accumulator = ListingsAccumulator()
+    accumulator.add_page(listings["listings"])
+    return accumulator.payload()
+
+def requests_per_second(client: TestClient, path: str) -> float:
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(path)
+    return REQUESTS / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    client = TestClient(build_app())
+    print(f"{DAYS} days x {len(SERIES)} series, {LISTINGS} listings, {REQUESTS} requests per path")
+    print(f"{'endpoint':<12}{'path':<16}{'req/s':>10}{'speedup':>10}")
+    for endpoint in ("trends", "listings"):
+        baseline = None
+        for path in ("response_model", "model_dump", "dict+orjson", "cached"):
+            rate = requests_per_second(client, f"/{endpoint}/{path}")
+            baseline = baseline or rate
+            print(f"{endpoint:<12}{path:<16}{rate:>10,.0f}{rate / baseline:>9.1f}x")
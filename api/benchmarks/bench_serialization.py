@@ -0,0 +1,69 @@
+"""Compare cache serializer encode/decode time and payload size on the API fixtures
+
+Run from the api directory:
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from app.services.serialization import Serializer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "..", "fixtures")
+CONFIGS = [
+    ("json", "none"),
+    ("orjson", "none"),
+    ("msgpack", "none"),
+    ("json", "zlib"),
+    ("orjson", "zstd"),
+    ("orjson", "lz4"),
+    ("msgpack", "zstd")
+]
+
+def load_fixtures() -> Dict[str, Any]:
+    """Load every fixture, plus a scaled-up listings payload for a large shop"""
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(FIXTURES_DIR, name)) as f:
+                fixtures[name[:-5]] = json.load(f)
+
+    listings = fixtures["listings_stats"]["listings"]
+    fixtures["listings_stats_x100"] = {
+        "listings": [dict(listing, listing_id=listing["listing_id"] * 1000 + i)
+                     for i in range(100) for listing in listings]
+    }
+    return fixtures
+
+def time_call(fn, iterations: int) -> float:
+    """Average microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def run(iterations: int = 500) -> List[Dict[str, Any]]:
+    """Benchmark each available serializer configuration on each fixture"""
+    results = []
+    for fixture_name, payload in load_fixtures().items():
+        for codec, compression in CONFIGS:
+            serializer = Serializer(codec=codec, compression=compression, compress_threshold=1024)
+            if serializer.codec != codec or serializer.compression != compression:
+                continue  # library not installed
+            encoded = serializer.dumps(payload)
+            results.append({
+                "fixture": fixture_name,
+                "format": f"{codec}+{compression}",
+                "bytes": len(encoded),
+                "encode_us": time_call(lambda: serializer.dumps(payload), iterations),
+                "decode_us": time_call(lambda: serializer.loads(encoded), iterations)
+            })
+    return results
+
+if __name__ == "__main__":
+    print(f"{'fixture':<22}{'format':<16}{'bytes':>10}{'encode µs':>12}{'decode µs':>12}")
+    for row in run():
+        print(f"{row['fixture']:<22}{row['format']:<16}{row['bytes']:>10}"
+              f"{row['encode_us']:>12.1f}{row['decode_us']:>12.1f}")
@@ -1,6 +1,8 @@
 import pytest
+import json
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.shop_state import ShopStateStore
 
 client = TestClient(app)
 
@@ -45,6 +47,19 @@ def test_reports_summary():
     data = response.json()
     assert "summary" in data
     assert "generated_with" in data
+    # Served from the precomputed report on later requests
+    assert client.get("/reports/summary").json()["generated_at"] == data["generated_at"]
+
+def test_reports_listing_issues():
+    """Test ranked catalog issues endpoint"""
+    response = client.get("/reports/listings?shop_id=demo_shop&examples=1")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["listings"] > 0
+    assert data["top_performers"]
+    for issue in data["issues"]:
+        assert issue["suggestions"]
+        assert len(issue["examples"]) <= 1
 
 def test_legacy_dashboard_stats():
     """Test legacy dashboard stats endpoint"""
@@ -52,4 +67,142 @@ def test_legacy_dashboard_stats():
     assert response.status_code == 200
     data = response.json()
     assert "total_orders" in data
-    assert "total_revenue" in data
\ No newline at end of file
+    assert "total_revenue" in data
+
+def test_disconnect_invalidates_shop_cache(monkeypatch):
+    """Test disconnect endpoint with shop cache invalidation and synced state purge"""
+    store = ShopStateStore(":memory:")
+    store.merge_listings("demo_shop", [{"listing_id": 1, "title": "L1"}])
+    monkeypatch.setattr("app.routers.auth.get_shop_state_store", lambda: store)
+
+    response = client.post("/auth/etsy/disconnect?shop_id=demo_shop")
+    assert response.status_code == 200
+    assert response.json()["disconnected"] is True
+    assert not store.has_listings("demo_shop")
+
+def test_metrics_dashboard():
+    """Test aggregated dashboard endpoint"""
+    response = client.get("/metrics/dashboard?shop_id=demo_shop")
+    assert response.status_code == 200
+    data = response.json()
+    for field in ["shop", "listings", "trends", "funnel"]:
+        assert data[field] is not None
+    assert "orders" in data["shop"]
+    assert data["shop"]["deltas"]["orders"] is not None
+
+def test_metrics_dashboard_field_selector():
+    """Test dashboard field selection and validation"""
+    response = client.get("/metrics/dashboard?shop_id=demo_shop&fields=shop,funnel")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["shop"] is not None
+    assert data["listings"] is None
+
+    response = client.get("/metrics/dashboard?shop_id=demo_shop&fields=bogus")
+    assert response.status_code == 400
+
+def test_metrics_listings():
+    """Test listings metrics endpoint"""
+    response = client.get("/metrics/listings?shop_id=demo_shop&limit=3")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) <= 3
+    assert "by_views" in data["top"]
+
+def test_metrics_listings_rankings():
+    """Test listings endpoint ranking selection"""
+    response = client.get("/metrics/listings?shop_id=demo_shop&top_n=2&rankings=conversion")
+    assert response.status_code == 200
+    assert len(response.json()["top"]["by_conversion"]) == 2
+
+    response = client.get("/metrics/listings?shop_id=demo_shop&rankings=bogus")
+    assert response.status_code == 400
+
+def test_metrics_trends_granularity():
+    """Test weekly trends and granularity validation"""
+    response = client.get("/metrics/trends?shop_id=demo_shop&granularity=week")
+    assert response.status_code == 200
+    weeks = response.json()["orders"]
+    assert weeks[0]["date"] == "2024-01-01"
+    assert len(weeks) == 2
+
+    response = client.get("/metrics/trends?shop_id=demo_shop&granularity=hour")
+    assert response.status_code == 400
+
+    response = client.get("/metrics/trends?shop_id=demo_shop&from_date=2024/01/01&to_date=2024-01-10")
+    assert response.status_code == 400
+    assert client.get("/metrics/trends/export?shop_id=demo_shop&from_date=x&to_date=y").status_code == 400
+
+def test_listings_export_formats():
+    """Test NDJSON and CSV listing exports"""
+    response = client.get("/metrics/listings/export?shop_id=demo_shop")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows and "conversion_rate" in rows[0]
+
+    response = client.get("/metrics/listings/export?shop_id=demo_shop&format=csv")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="listings-demo_shop.csv"' in response.headers["content-disposition"]
+    lines = response.text.splitlines()
+    assert lines[0] == "listing_id,title,views,orders,revenue,conversion_rate,etsy_url"
+    assert len(lines) == len(rows) + 1
+
+    assert client.get("/metrics/listings/export?shop_id=demo_shop&format=xml").status_code == 400
+
+def test_trends_export_is_wide():
+    """Test trends export with one row per date"""
+    response = client.get("/metrics/trends/export?shop_id=demo_shop&format=csv&series=revenue,orders")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "date,revenue,orders"
+    assert lines[1].startswith("2024-01-01,")
+
+def test_metrics_etag_and_304():
+    """Test conditional requests on metrics endpoints"""
+    for path in ["/metrics/shop?shop_id=etag_shop", "/metrics/funnel?shop_id=etag_shop",
+                 "/metrics/trends?shop_id=etag_shop", "/metrics/listings?shop_id=etag_shop"]:
+        first = client.get(path)
+        assert first.status_code == 200
+        # Second response carries the version-based ETag once caches are warm
+        etag = client.get(path).headers["etag"]
+        response = client.get(path, headers={"If-None-Match": etag})
+        assert response.status_code == 304, path
+        assert response.content == b""
+        assert client.get(path, headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+def test_metrics_reuse_encoded_body():
+    """Test that warm version ETags serve the body encoded by an earlier request"""
+    path = "/metrics/trends?shop_id=body_shop&series=revenue,orders"
+    client.get(path)
+    warm = client.get(path)
+    hits = client.get("/health/stats").json()["responses"]["hits"]
+
+    response = client.get(path)
+    assert response.content == warm.content
+    assert response.headers["etag"] == warm.headers["etag"]
+    assert client.get("/health/stats").json()["responses"]["hits"] == hits + 1
+    assert response.json()["visits"] == []
+
+def test_listings_polls_skip_rendering(monkeypatch):
+    """Test that warm listings polls are answered from page versions without re-aggregating"""
+    path = "/metrics/listings?shop_id=listings_poll_shop"
+    client.get(path)
+    warm = client.get(path)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("listings were rendered again")
+
+    monkeypatch.setattr("app.services.aggregator.MetricsAggregator.listings_payload_stream", fail)
+    assert client.get(path, headers={"If-None-Match": warm.headers["etag"]}).status_code == 304
+    assert client.get(path).content == warm.content
+
+def test_metrics_gzip_negotiation():
+    """Test compressed listings responses"""
+    response = client.get("/metrics/listings?shop_id=demo_shop", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "items" in response.json()
+
+    response = client.get("/metrics/listings?shop_id=demo_shop", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
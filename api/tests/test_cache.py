@@ -0,0 +1,360 @@
+import asyncio
+import time
+import pytest
+from app.services.cache import CacheService
+from app.services.memory_cache import MemoryLRUCache
+from app.services.redis_backend import CircuitBreaker, RedisBackend, RedisUnavailable
+
+def test_read_through_hit_and_miss():
+    """Test that the loader only runs on a miss"""
+    async def run():
+        cache = CacheService()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            return {"orders": calls}
+
+        assert await cache.get_or_set("etsy:shop_stats:demo", loader, ttl=60) == {"orders": 1}
+        assert await cache.get_or_set("etsy:shop_stats:demo", loader, ttl=60) == {"orders": 1}
+        assert calls == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+        # Forced refresh reloads a fresh entry
+        assert await cache.get_or_set("etsy:shop_stats:demo", loader, ttl=60, refresh=True) == {"orders": 2}
+        assert await cache.get_or_set("etsy:shop_stats:demo", loader, ttl=60) == {"orders": 2}
+        assert cache.stats()["forced_refreshes"] == 1
+
+    asyncio.run(run())
+
+def test_stale_while_revalidate():
+    """Test that stale entries are served immediately and refreshed in the background"""
+    async def run():
+        cache = CacheService()
+        await cache.set("etsy:trends_data:demo", {"value": "old", "stored_at": time.time() - 120}, 600)
+
+        async def loader():
+            return "new"
+
+        assert await cache.get_or_set("etsy:trends_data:demo", loader, ttl=60, stale_ttl=600) == "old"
+        assert cache.stats()["stale_hits"] == 1
+
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert await cache.get_or_set("etsy:trends_data:demo", loader, ttl=60, stale_ttl=600) == "new"
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(run())
+
+def test_expired_stale_entry_is_a_miss():
+    """Test that entries past the stale window are reloaded synchronously"""
+    async def run():
+        cache = CacheService()
+        await cache.set("etsy:funnel_stats:demo", {"value": "old", "stored_at": time.time() - 7200}, 600)
+
+        async def loader():
+            return "new"
+
+        assert await cache.get_or_set("etsy:funnel_stats:demo", loader, ttl=60, stale_ttl=600) == "new"
+        assert cache.stats()["misses"] == 1
+
+    asyncio.run(run())
+
+def test_memory_tier_lru_eviction():
+    """Test that the memory tier evicts least recently used entries past its limits"""
+    memory = MemoryLRUCache(max_entries=2, max_bytes=1024 * 1024)
+    memory.set("a", 1, ttl=60)
+    memory.set("b", 2, ttl=60)
+    assert memory.get("a") == 1  # a is now most recently used
+    memory.set("c", 3, ttl=60)
+
+    assert memory.get("b") is None
+    assert memory.get("a") == 1
+    assert memory.get("c") == 3
+    assert memory.stats()["evictions"] == 1
+
+def test_memory_tier_byte_limit():
+    """Test that the memory tier stays under its byte budget"""
+    memory = MemoryLRUCache(max_entries=100, max_bytes=4096)
+    for i in range(50):
+        memory.set(f"key{i}", "x" * 500, ttl=60)
+
+    stats = memory.stats()
+    assert stats["approx_bytes"] <= 4096
+    assert stats["entries"] < 50
+    assert memory.get("key49") is not None
+
+def test_memory_tier_purges_expired():
+    """Test proactive expiry of due entries only"""
+    memory = MemoryLRUCache(max_entries=100, max_bytes=1024 * 1024)
+    memory.set("short", 1, ttl=0)
+    memory.set("long", 2, ttl=60)
+    memory.set("short", 3, ttl=0)  # overwritten entries leave a superseded heap item
+
+    assert memory.purge_expired() == 1
+    assert len(memory) == 1
+    assert memory.get("long") == 2
+    assert memory.stats()["expirations"] == 1
+
+def test_circuit_breaker_opens_and_probes():
+    """Test that the breaker trips after repeated failures and lets one probe through"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    assert breaker.allow()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_cancelled_probe_reopens_breaker():
+    """Test that a probe cancelled mid-call does not leave the breaker stuck half-open"""
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        backend = RedisBackend(url="redis://localhost:1", timeout=5, breaker=breaker)
+        breaker.record_failure()
+        await asyncio.sleep(0.02)
+
+        probe = asyncio.create_task(backend._call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        await asyncio.sleep(0.02)
+        assert breaker.allow()
+        await backend.close()
+
+    asyncio.run(run())
+
+def test_falls_back_to_memory_when_redis_unavailable():
+    """Test that Redis outages fall back to the memory tier"""
+    class DownBackend:
+        async def get(self, key):
+            raise RedisUnavailable("circuit open")
+
+        async def mset(self, items, ttl, tags=()):
+            raise RedisUnavailable("circuit open")
+
+        async def mget(self, keys):
+            raise RedisUnavailable("circuit open")
+
+        def stats(self):
+            return {}
+
+    async def run():
+        cache = CacheService()
+        cache._redis = DownBackend()
+
+        assert await cache.set("etsy:shop_stats:demo", {"orders": 1}, 60)
+        assert await cache.get("etsy:shop_stats:demo") == {"orders": 1}
+        assert await cache.get_many(["etsy:shop_stats:demo", "missing"]) == {"etsy:shop_stats:demo": {"orders": 1}}
+        assert cache.stats()["redis_fallbacks"] == 2
+
+    asyncio.run(run())
+
+class SharedBackend:
+    """In-process stand-in for Redis shared by several cache instances"""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def mset(self, items, ttl, tags=None):
+        self.data.update(items)
+
+    async def delete(self, *keys, tags=()):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.published.append(message)
+
+    def stats(self):
+        return {}
+
+def test_two_tier_invalidation_across_workers():
+    """Test that a write on one worker invalidates another worker's L1 copy"""
+    async def run():
+        backend = SharedBackend()
+        worker_a, worker_b = CacheService(), CacheService()
+        worker_a._redis = worker_b._redis = backend
+
+        await worker_a.set("etsy:shop_stats:demo", {"orders": 1}, 300)
+        assert await worker_b.get("etsy:shop_stats:demo") == {"orders": 1}  # L2 hit, fills L1
+        assert await worker_b.get("etsy:shop_stats:demo") == {"orders": 1}  # L1 hit
+
+        await worker_a.set("etsy:shop_stats:demo", {"orders": 2}, 300)
+        for message in backend.published:
+            worker_b._apply_invalidation(message)
+
+        assert await worker_b.get("etsy:shop_stats:demo") == {"orders": 2}
+
+        tiers = worker_b.stats()["tiers"]
+        assert tiers["l1"]["hits"] == 1
+        assert tiers["l2"]["hits"] == 2
+        assert worker_b.stats()["invalidations"]["received"] == 2
+
+    asyncio.run(run())
+
+def test_tag_and_prefix_invalidation():
+    """Test bulk invalidation by tag and by key prefix"""
+    async def run():
+        cache = CacheService()
+        await cache.set("etsy:shop_stats:shop_a::", {"orders": 1}, 300, tags=["shop:shop_a"])
+        await cache.set("etsy:trends_data:shop_a::", {"revenue": []}, 300, tags=["shop:shop_a"])
+        await cache.set("etsy:shop_stats:shop_b::", {"orders": 2}, 300, tags=["shop:shop_b"])
+
+        assert await cache.invalidate_tags(["shop:shop_a"]) == 2
+        assert await cache.get("etsy:shop_stats:shop_a::") is None
+        assert await cache.get("etsy:trends_data:shop_a::") is None
+        assert await cache.get("etsy:shop_stats:shop_b::") == {"orders": 2}
+
+        assert await cache.invalidate_prefix("etsy:shop_stats") == 1
+        assert await cache.get("etsy:shop_stats:shop_b::") is None
+        assert cache.stats()["memory"]["tags"] == 0
+
+    asyncio.run(run())
+
+def test_tag_invalidation_reaches_other_workers():
+    """Test that tag invalidation deletes Redis keys and is broadcast"""
+    class TaggingBackend(SharedBackend):
+        def __init__(self):
+            super().__init__()
+            self.tags = {}
+
+        async def mset(self, items, ttl, tags=None):
+            await super().mset(items, ttl)
+            for key, key_tags in (tags or {}).items():
+                for tag in key_tags:
+                    self.tags.setdefault(tag, set()).add(key)
+
+        async def invalidate_tags(self, tags):
+            keys = sorted({key for tag in tags for key in self.tags.pop(tag, set())})
+            await self.delete(*keys)
+            return keys
+
+    async def run():
+        backend = TaggingBackend()
+        worker_a, worker_b = CacheService(), CacheService()
+        worker_a._redis = worker_b._redis = backend
+
+        await worker_a.set("etsy:funnel_stats:shop_a::", {"conversion_rate": 4.2}, 300, tags=["shop:shop_a"])
+        assert await worker_b.get("etsy:funnel_stats:shop_a::") is not None
+
+        assert await worker_a.invalidate_tags(["shop:shop_a"]) == 1
+        worker_b._apply_invalidation(backend.published[-1])
+        assert await worker_b.get("etsy:funnel_stats:shop_a::") is None
+
+    asyncio.run(run())
+
+class FakeRedis:
+    """Minimal in-process Redis client covering the commands tag bookkeeping uses"""
+
+    def __init__(self):
+        self.values = {}
+        self.zsets = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def zrange(self, key, start, end):
+        return [member.encode() for member in self.zsets.get(key, {})]
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def delete(self, *keys):
+        found = sum(1 for key in keys if key in self.values or key in self.zsets)
+        for key in keys:
+            self.values.pop(key, None)
+            self.zsets.pop(key, None)
+        return found
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+def test_redis_tag_sets_drop_expired_and_deleted_keys(monkeypatch):
+    """Test that tag sets only hold keys that may still exist"""
+    async def run():
+        backend = RedisBackend(url="redis://localhost:1")
+        await backend.close()
+        backend._client = fake = FakeRedis()
+
+        clock = [1000.0]
+        monkeypatch.setattr("app.services.redis_backend.time.time", lambda: clock[0])
+        await backend.mset({"etsy:shop_stats:a": b"1"}, ttl=60, tags={"etsy:shop_stats:a": ["prefix:etsy:shop_stats"]})
+        clock[0] += 120
+        await backend.mset({"etsy:shop_stats:b": b"2"}, ttl=60, tags={"etsy:shop_stats:b": ["prefix:etsy:shop_stats"]})
+        assert list(fake.zsets["etsynova:tags:prefix:etsy:shop_stats"]) == ["etsy:shop_stats:b"]
+
+        await backend.delete("etsy:shop_stats:b", tags=["prefix:etsy:shop_stats"])
+        assert fake.zsets["etsynova:tags:prefix:etsy:shop_stats"] == {}
+
+    asyncio.run(run())
+
+def test_batched_writes_link_each_key_to_its_own_prefix_tags():
+    """Test that a mixed batch does not tag funnel keys with the shop stats prefix"""
+    async def run():
+        cache = CacheService()
+        cache._redis = backend = RedisBackend(url="redis://localhost:1")
+        await backend.close()
+        backend._client = fake = FakeRedis()
+        cache._broadcast_invalidation = lambda *args, **kwargs: asyncio.sleep(0)
+
+        await cache.set_many({"etsy:shop_stats:a": 1, "etsy:funnel_stats:a": 2}, 60, tags=["shop:a"])
+        assert list(fake.zsets["etsynova:tags:prefix:etsy:shop_stats"]) == ["etsy:shop_stats:a"]
+        assert list(fake.zsets["etsynova:tags:prefix:etsy:funnel_stats"]) == ["etsy:funnel_stats:a"]
+        assert sorted(fake.zsets["etsynova:tags:shop:a"]) == ["etsy:funnel_stats:a", "etsy:shop_stats:a"]
+
+    asyncio.run(run())
+
+def test_no_single_segment_prefix_tag():
+    """Test that keys are not all linked to one catch-all prefix tag"""
+    assert CacheService._prefix_tags("etsy:shop_stats:shop_a::") == ("prefix:etsy:shop_stats", "prefix:etsy:shop_stats:shop_a")
+    with pytest.raises(ValueError):
+        asyncio.run(CacheService().invalidate_prefix("etsy"))
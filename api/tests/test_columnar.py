@@ -0,0 +1,31 @@
+import numpy as np
+from app.agent.heuristics import analyze_listing_performance
+from app.services.columnar import ListingColumns
+
+LISTINGS = [
+    {"listing_id": 1, "title": "Mug", "views": 1000, "orders": 40, "revenue": 600.0},
+    {"listing_id": 2, "title": "Poster", "views": 0, "orders": 0, "revenue": 0.0},
+    {"listing_id": 3, "title": "Soap", "views": 30, "orders": 3, "revenue": 45.0},
+    {"listing_id": 4, "title": "Scarf", "views": 1000, "orders": 40, "revenue": 800.0}
+]
+
+def test_vectorized_scores_match_per_item_heuristics():
+    """Test that columnar scores equal the per-listing heuristic"""
+    columns = ListingColumns.from_listings(LISTINGS)
+    expected = [analyze_listing_performance(listing)["performance_score"] for listing in LISTINGS]
+    assert np.allclose(columns.performance_scores(), expected)
+    assert columns.conversion_rates()[1] == 0.0
+
+def test_top_k_keeps_catalog_order_on_ties():
+    """Test that ties rank in catalog order like a stable sort"""
+    columns = ListingColumns.from_listings(LISTINGS)
+    assert list(columns.top_k(columns.views, 2)) == [0, 3]
+    assert list(columns.top_k(columns.revenue, 10)) == [3, 0, 2, 1]
+
+def test_summary():
+    """Test shop-wide summary numbers"""
+    columns = ListingColumns.from_listings(LISTINGS)
+    summary = columns.summary(k=2)
+    assert summary["listings"] == 4
+    assert summary["orders"] == 83
+    assert [row["listing_id"] for row in summary["top_by_performance"]] == [1, 3]  # capped scores tie at 100
@@ -0,0 +1,56 @@
+from app.agent.heuristics import (LISTING_RULES, analyze_listing_performance, analyze_listings,
+                                  generate_heuristic_summary)
+from app.services.columnar import ListingColumns
+
+LISTINGS = [
+    {"listing_id": 1, "title": "Mug", "views": 1000, "orders": 5, "revenue": 75.0},
+    {"listing_id": 2, "title": "Poster", "views": 20, "orders": 1, "revenue": 12.0},
+    {"listing_id": 3, "title": "Soap", "views": 400, "orders": 6, "revenue": 48.0},
+    {"listing_id": 4, "title": "Scarf", "views": 900, "orders": 40, "revenue": 800.0},
+    {"listing_id": 5, "title": "Card", "views": 0, "orders": 0, "revenue": 0.0}
+]
+
+METRICS = {"orders": 52, "gmv": 935.0, "visits": 2320, "views": 2320, "conversion_rate": 2.24,
+           "favorites": 10, "cart_adds": 70, "refunds": 0, "deltas": {"gmv": -8.5, "orders": 3.0}}
+
+def test_batch_rules_match_per_listing_heuristics():
+    """Test that the vectorized rules flag the same listings as the per-listing analysis"""
+    analysis = analyze_listings(ListingColumns.from_listings(LISTINGS), examples=10)
+    for issue in analysis["issues"]:
+        flagged = {row["listing_id"] for row in issue["examples"]}
+        expected = {listing["listing_id"] for listing in LISTINGS
+                    if LISTING_RULES[issue["rule"]][0] in analyze_listing_performance(listing)["issues"]}
+        assert flagged == expected, issue["rule"]
+    assert analysis["healthy"] == 1
+
+def test_issues_ranked_by_missed_orders():
+    """Test issue ranking and per-issue examples"""
+    analysis = analyze_listings(ListingColumns.from_listings(LISTINGS), examples=1)
+    assert [issue["rule"] for issue in analysis["issues"]] == [
+        "low_conversion", "below_average_conversion", "low_visibility"
+    ]
+    low = analysis["issues"][0]
+    assert low["listings"] == 2
+    assert low["estimated_orders"] == 15.0  # Mug misses 15 orders at 2% of 1000 views
+    assert [row["listing_id"] for row in low["examples"]] == [1]
+    assert analysis["top_performers"][0]["title"] == "Scarf"
+
+def test_summary_is_deterministic_and_uses_numbers():
+    """Test that the heuristic summary is built from the shop's own data"""
+    analysis = analyze_listings(ListingColumns.from_listings(LISTINGS))
+    first = generate_heuristic_summary(METRICS, analysis)
+
+    assert first == generate_heuristic_summary(METRICS, analysis)
+    assert "$935.00" in first["summary"] and "down 8.5%" in first["summary"]
+    assert any("2.24%" in insight for insight in first["key_insights"])
+    assert any("Scarf" in insight for insight in first["key_insights"])
+    assert first["recommendations"][0]["title"] == "Enhance Listing Photography"
+    assert "15 orders" in first["recommendations"][0]["description"]
+    assert first["confidence"] == "high"
+
+def test_summary_without_data_is_stable():
+    """Test the fallback summary when a shop has no data yet"""
+    summary = generate_heuristic_summary()
+    assert summary == generate_heuristic_summary()
+    assert summary["confidence"] == "low"
+    assert len(summary["recommendations"]) == 4
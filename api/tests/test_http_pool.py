@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+from app.services.http_pool import HTTPClientPool
+
+def test_pool_reuses_single_client():
+    """Test that the pool hands out one shared client"""
+    pool = HTTPClientPool(max_connections=4, http2=False)
+    assert pool.client is pool.client
+    asyncio.run(pool.aclose())
+
+def test_pool_stats_and_close():
+    """Test pool statistics and clean shutdown"""
+    async def run():
+        pool = HTTPClientPool(max_connections=2, max_keepalive_connections=1, http2=False)
+        pool._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True})))
+
+        response = await pool.request("GET", "https://openapi.etsy.com/v3/application/ping")
+        assert response.json() == {"ok": True}
+
+        stats = pool.stats()
+        assert stats["requests_total"] == 1
+        assert stats["requests_in_flight"] == 0
+        assert stats["max_connections"] == 2
+        for key in ["connections_open", "connections_idle", "requests_waiting", "connection_waits",
+                    "connection_wait_seconds"]:
+            assert key in stats
+
+        await pool.aclose()
+        assert pool._client is None
+
+    asyncio.run(run())
+
+def test_connection_waits_are_measured_not_guessed():
+    """Test that only requests slow to reach a connection count as waits"""
+    class TracingTransport(httpx.AsyncBaseTransport):
+        """Transport that reports reaching a connection after a queueing delay given per request"""
+
+        async def handle_async_request(self, request):
+            await asyncio.sleep(float(request.url.params["queued"]))
+            await request.extensions["trace"]("connection.connect_tcp.started", {})
+            return httpx.Response(200)
+
+    async def run():
+        pool = HTTPClientPool(max_connections=1, http2=False)
+        pool._client = httpx.AsyncClient(transport=TracingTransport())
+        await pool.request("GET", "https://openapi.etsy.com/ping", params={"queued": "0"})
+        await pool.request("GET", "https://openapi.etsy.com/ping", params={"queued": "0.05"})
+
+        stats = pool.stats()
+        assert stats["connection_waits"] == 1
+        assert stats["connection_wait_seconds"] >= 0.05
+        assert stats["requests_waiting"] == 0
+        await pool.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+from app.services.aggregator import MetricsAggregator, TopKTracker, RANKING_KEYS
+from app.services.cache import CacheService
+from app.services.etsy_client import EtsyClient
+from app.services.shop_state import ShopStateStore
+
+def make_listings(count):
+    return [
+        {"listing_id": i, "title": f"Listing {i}", "views": (i * 37) % 1000,
+         "orders": (i * 11) % 50, "revenue": ((i * 13) % 97) * 1.5, "etsy_url": f"https://etsy.com/listing/{i}"}
+        for i in range(count)
+    ]
+
+class PagedClient(EtsyClient):
+    """Etsy client serving a synthetic catalog page by page"""
+
+    def __init__(self, catalog):
+        super().__init__(cache=CacheService())
+        self.catalog = catalog
+        self.page_size = 25
+        self.page_concurrency = 3
+        self.active = 0
+        self.max_active = 0
+
+    async def _fetch_listings_page(self, shop_id, from_date, to_date, offset, page_size):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.001 * ((offset // page_size) % 3))
+        self.active -= 1
+        return {"count": len(self.catalog), "listings": self.catalog[offset:offset + page_size]}
+
+def test_iter_listing_pages_in_order_with_bounded_concurrency():
+    """Test that every page is yielded in order without exceeding the concurrency limit"""
+    async def run():
+        catalog = make_listings(260)
+        client = PagedClient(catalog)
+        seen = []
+        async for page in client.iter_listing_pages("paged_shop"):
+            seen.extend(page)
+
+        assert seen == catalog
+        assert client.max_active <= client.page_concurrency
+
+    asyncio.run(run())
+
+def test_streaming_aggregation_matches_full_aggregation():
+    """Test that page-by-page aggregation ranks the same top listings as one big batch"""
+    async def run():
+        catalog = make_listings(260)
+        client = PagedClient(catalog)
+        aggregator = MetricsAggregator()
+
+        streamed = await aggregator.aggregate_listings_stream(client.iter_listing_pages("stream_shop"), limit=10)
+        full = aggregator.aggregate_listings_metrics({"listings": catalog})
+
+        assert len(streamed.items) == 10
+        assert len(full.items) == 260
+        assert streamed.top == full.top
+
+    asyncio.run(run())
+
+def test_listings_stats_respects_limit():
+    """Test that get_listings_stats stops harvesting once it has enough listings"""
+    async def run():
+        client = PagedClient(make_listings(260))
+        data = await client.get_listings_stats("limit_shop", limit=30)
+        assert [listing["listing_id"] for listing in data["listings"]] == list(range(30))
+
+    asyncio.run(run())
+
+def test_top_k_tracker_matches_stable_sort():
+    """Test heap top-K against a full stable sort, including ties and derived rankings"""
+    catalog = make_listings(500)
+    tracker = TopKTracker(k=7, rankings=RANKING_KEYS)
+    tracker.push_many(listing for listing in catalog)
+
+    for name, score in RANKING_KEYS.items():
+        expected = sorted(catalog, key=score, reverse=True)[:7]
+        assert [listing for _, listing in tracker.top(name)] == expected
+
+def test_top_k_rejects_unknown_ranking():
+    """Test that unknown ranking keys are rejected"""
+    with pytest.raises(ValueError):
+        TopKTracker(rankings=["views", "bogus"])
+
+def test_derived_rankings_in_response():
+    """Test configurable K and derived rankings in the listings response"""
+    response = MetricsAggregator().aggregate_listings_metrics(
+        {"listings": make_listings(50)}, top_n=3, rankings=["conversion", "revenue_per_view"]
+    )
+    assert len(response.top.by_conversion) == 3
+    assert len(response.top.by_revenue_per_view) == 3
+    assert response.top.by_views == []
+
+def test_listings_export_streams_every_page(monkeypatch):
+    """Test that the export endpoint walks all pages of a large catalog"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    catalog = make_listings(2600)
+    monkeypatch.setattr("app.routers.metrics.get_etsy_client", lambda: PagedClient(catalog))
+    response = TestClient(app).get("/metrics/listings/export?shop_id=paged_shop&format=csv")
+
+    lines = response.text.splitlines()
+    assert len(lines) == len(catalog) + 1
+    assert lines[-1].startswith(f"{catalog[-1]['listing_id']},")
+
+def test_listing_pages_keep_fresh_stats_with_synced_sales(monkeypatch):
+    """Test that synced shops get page-cache views with receipt sales, not stored listing stats"""
+    state = ShopStateStore(":memory:")
+    state.merge_listings("synced_shop", [{"listing_id": 1, "views": 10, "orders": 0}])
+    state.mark_synced("synced_shop", "listings", 0, full=True)
+    state.merge_receipts("synced_shop", [
+        {"receipt_id": 1, "last_modified": 100, "transactions": [{"listing_id": 1, "revenue": 12.5}]}
+    ])
+    monkeypatch.setattr("app.services.etsy_client.get_shop_state_store", lambda: state)
+
+    async def run():
+        client = PagedClient([{"listing_id": 1, "views": 900, "orders": 7, "revenue": 80.0},
+                              {"listing_id": 2, "views": 50, "orders": 3, "revenue": 30.0}])
+        return [listing async for page in client.iter_listing_pages("synced_shop") for listing in page]
+
+    first, second = asyncio.run(run())
+    assert (first["views"], first["orders"], first["revenue"]) == (900, 1, 12.5)
+    assert (second["views"], second["orders"], second["revenue"]) == (50, 0, 0.0)
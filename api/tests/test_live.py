@@ -0,0 +1,77 @@
+import asyncio
+from app.services.etsy_client import EtsyClient
+from app.services.cache import CacheService
+from app.services.live import LiveUpdates
+
+RAW_STATS = {"orders": 10, "gmv": 100.0, "visits": 200, "views": 400, "conversion_rate": 5.0,
+             "favorites": 3, "cart_adds": 4, "refunds": 0}
+
+def test_only_changed_fields_are_pushed():
+    """Test that subscribers receive field-level diffs"""
+    async def run():
+        hub = LiveUpdates(buffer_size=8)
+        subscription = hub.subscribe("shop")
+        hub.shop_stats_fetched("shop", RAW_STATS)
+        hub.shop_stats_fetched("shop", RAW_STATS)
+        hub.shop_stats_fetched("shop", {**RAW_STATS, "orders": 12})
+
+        first = await subscription.next(timeout=0.1)
+        assert first["type"] == "shop" and first["changed"]["gmv"] == 100.0
+        second = await subscription.next(timeout=0.1)
+        assert second["changed"] == {"orders": 12}
+        assert await subscription.next(timeout=0.01) is None
+
+        # Late joiners start from a snapshot
+        late = hub.subscribe("shop")
+        assert (await late.next(timeout=0.1))["metrics"]["orders"] == 12
+
+    asyncio.run(run())
+
+def test_trend_points_are_incremental():
+    """Test that only new or revised trend points are pushed"""
+    async def run():
+        hub = LiveUpdates()
+        subscription = hub.subscribe("shop")
+        hub.trends_fetched("shop", {"orders": [{"date": "2024-01-01", "value": 1}]})
+        hub.trends_fetched("shop", {"orders": [{"date": "2024-01-01", "value": 1},
+                                               {"date": "2024-01-02", "value": 2}]})
+        await subscription.next(timeout=0.1)
+        event = await subscription.next(timeout=0.1)
+        assert event["points"] == {"orders": [{"date": "2024-01-02", "value": 2}]}
+
+    asyncio.run(run())
+
+def test_slow_subscriber_drops_oldest():
+    """Test bounded buffering with drop-oldest backpressure"""
+    async def run():
+        hub = LiveUpdates(buffer_size=2)
+        subscription = hub.subscribe("shop")
+        for i in range(5):
+            hub.publish("shop", {"type": "shop", "n": i})
+
+        event = await subscription.next(timeout=0.1)
+        assert event["n"] == 3 and event["dropped"] == 3
+        assert "dropped" not in await subscription.next(timeout=0.1)
+        assert hub.stats()["dropped"] == 3
+
+        hub.unsubscribe(subscription)
+        assert not hub.has_subscribers("shop")
+
+    asyncio.run(run())
+
+def test_upstream_fetch_publishes_only_with_subscribers(monkeypatch):
+    """Test that fetches feed the hub and cost nothing without listeners"""
+    monkeypatch.setenv("MOCK_MODE", "true")
+    hub = LiveUpdates()
+    monkeypatch.setattr("app.services.etsy_client.get_live_updates", lambda: hub)
+    client = EtsyClient(cache=CacheService())
+
+    asyncio.run(client._fetch_shop_stats("idle_shop"))
+    assert hub.stats()["published"] == 0
+
+    async def run():
+        subscription = hub.subscribe("live_shop")
+        await client._fetch_shop_stats("live_shop")
+        return await subscription.next(timeout=0.1)
+
+    assert "orders" in asyncio.run(run())["changed"]
@@ -0,0 +1,59 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.kpis import KPIDeltas, ShopMetrics
+from app.services.aggregator import MetricsAggregator
+
+client = TestClient(app)
+
+def shop_metrics(orders, gmv, visits):
+    return ShopMetrics(orders=orders, gmv=gmv, visits=visits, views=visits * 2, conversion_rate=0.0,
+                       favorites=1, cart_adds=1, refunds=0, deltas=KPIDeltas())
+
+class SlowShopClient:
+    """Etsy client stand-in with one slow and one failing shop"""
+
+    async def get_shop_stats(self, shop_id, from_date=None, to_date=None):
+        if shop_id == "slow":
+            await asyncio.sleep(5)
+        if shop_id == "broken":
+            raise RuntimeError("upstream error")
+        return {"orders": int(shop_id[-1]), "gmv": 10.0 * int(shop_id[-1]), "visits": 100}
+
+def test_portfolio_totals_and_rankings():
+    """Test portfolio sums and per-metric shop rankings"""
+    summary = MetricsAggregator().aggregate_portfolio(
+        {"a": shop_metrics(10, 100.0, 200), "b": shop_metrics(30, 50.0, 300)}, failed=["c"]
+    )
+    assert summary.totals.shops == 2
+    assert summary.totals.orders == 40
+    assert summary.totals.conversion_rate == 8.0
+    assert summary.rankings["gmv"] == ["a", "b"]
+    assert summary.rankings["orders"] == ["b", "a"]
+    assert summary.failed == ["c"]
+
+def test_portfolio_streams_shops_as_they_finish(monkeypatch):
+    """Test that slow and failing shops do not block the others"""
+    monkeypatch.setattr("app.routers.metrics.get_etsy_client", lambda: SlowShopClient())
+    monkeypatch.setenv("PORTFOLIO_SHOP_TIMEOUT", "0.2")
+
+    response = client.get("/metrics/portfolio?shop_ids=slow,shop1,broken,shop2,shop1")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 5
+    assert {line["shop_id"] for line in lines[:3]} == {"shop1", "shop2", "broken"}
+    assert lines[-2] == {"type": "error", "shop_id": "slow", "detail": "timeout"}
+    summary = lines[-1]
+    assert summary["type"] == "summary"
+    assert summary["totals"]["shops"] == 2
+    assert summary["rankings"]["gmv"] == ["shop2", "shop1"]
+    assert summary["failed"] == ["broken", "slow"]
+
+def test_portfolio_validation():
+    """Test portfolio request validation"""
+    assert client.get("/metrics/portfolio?shop_ids=,").status_code == 400
+    too_many = ",".join(f"s{i}" for i in range(101))
+    assert client.get(f"/metrics/portfolio?shop_ids={too_many}").status_code == 400
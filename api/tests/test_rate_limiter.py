@@ -0,0 +1,61 @@
+import asyncio
+from app.services.rate_limiter import RequestScheduler, Priority
+
+def test_interactive_lane_served_first():
+    """Test that interactive requests overtake queued background requests"""
+    async def run():
+        scheduler = RequestScheduler(rate=50, burst=1)
+        await scheduler.acquire("shop_a")  # drain the burst
+        order = []
+
+        async def request(name, shop_id, priority):
+            await scheduler.acquire(shop_id, priority)
+            order.append(name)
+
+        tasks = [asyncio.create_task(request(f"bg{i}", "shop_a", Priority.BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("ui", "shop_b", Priority.INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+        assert order[0] == "ui"
+        stats = scheduler.stats()
+        assert stats["lanes"]["background"]["granted"] == 3
+        assert stats["lanes"]["interactive"]["queue_depth"] == 0
+
+    asyncio.run(run())
+
+def test_fair_queuing_across_shops():
+    """Test round-robin between shops within a lane"""
+    async def run():
+        scheduler = RequestScheduler(rate=100, burst=1)
+        await scheduler.acquire("warmup")
+        order = []
+
+        async def request(shop_id):
+            await scheduler.acquire(shop_id)
+            order.append(shop_id)
+
+        tasks = [asyncio.create_task(request("busy")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("quiet")))
+        await asyncio.gather(*tasks)
+
+        assert order.index("quiet") == 1
+
+    asyncio.run(run())
+
+def test_rate_limit_headers():
+    """Test Retry-After parsing and header-driven throttling"""
+    scheduler = RequestScheduler(rate=10, burst=10)
+    assert scheduler.parse_retry_after("3") == 3.0
+    assert scheduler.parse_retry_after("not a date") is None
+    assert scheduler.parse_retry_after(None) is None
+
+    scheduler.update_from_headers({"x-limit-per-second": "5", "x-remaining-today": "1200"})
+    stats = scheduler.stats()
+    assert stats["rate_per_second"] == 5
+    assert stats["remaining_today"] == 1200
+
+    scheduler.update_from_headers({"retry-after": "2"})
+    assert scheduler._bucket.try_take() > 1
+    assert 2 <= scheduler.backoff(0, retry_after=2) <= 3
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from app.services.cache import CacheService
+from app.services.etsy_client import EtsyClient
+from app.services.reports import ReportService, analyze_shop_listings, generate_report
+from app.services.shop_state import ShopStateStore
+from app.services.sync import SyncScheduler
+
+STATS = {"orders": 100, "gmv": 2500.0, "visits": 4000, "views": 9000, "conversion_rate": 2.5,
+         "favorites": 300, "cart_adds": 150, "refunds": 2}
+
+class CountingGenerator:
+    """Report generator stand-in that counts calls"""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    async def __call__(self, shop_id, inputs):
+        self.calls.append((shop_id, inputs))
+        await asyncio.sleep(self.delay)
+        return {"summary": {"orders": inputs["orders"]}, "generated_with": "heuristics", "provider": "none"}
+
+class StubAnalyzer:
+    """Listing analyzer stand-in returning a settable analysis"""
+
+    def __init__(self, analysis=None):
+        self.analysis = analysis
+        self.calls = []
+
+    async def __call__(self, shop_id, client=None):
+        self.calls.append((shop_id, client))
+        return self.analysis
+
+def analysis(low_conversion):
+    return {"listings": 200, "issues": [
+        {"rule": "low_conversion", "listings": low_conversion, "estimated_orders": low_conversion * 1.5}
+    ]}
+
+def make_service(generator, analyzer=None, **kwargs):
+    return ReportService(cache=CacheService(), generator=generator, analyzer=analyzer or StubAnalyzer(), **kwargs)
+
+def test_fingerprint_ignores_noise_but_not_real_changes():
+    """Test that only meaningful KPI changes alter the fingerprint"""
+    service = make_service(CountingGenerator(), change_threshold=0.05, delta_step=5)
+    base = service.fingerprint({**STATS, "deltas": {"orders": 10.0}})
+
+    assert service.fingerprint({**STATS, "gmv": 2501.0, "deltas": {"orders": 10.4}}) == base
+    assert service.fingerprint({**STATS, "gmv": 3000.0, "deltas": {"orders": 10.0}}) != base
+    assert service.fingerprint({**STATS, "deltas": {"orders": 30.0}}) != base
+    assert service.fingerprint({**STATS, "deltas": {}}) != base
+
+def test_refresh_regenerates_only_on_meaningful_change():
+    """Test that refreshes with near-identical stats reuse the stored report"""
+    async def run():
+        generator = CountingGenerator()
+        service = make_service(generator)
+
+        first = await service.refresh("report_shop", STATS)
+        again = await service.refresh("report_shop", {**STATS, "views": 9010})
+        assert again["generated_at"] == first["generated_at"]
+        assert len(generator.calls) == 1
+
+        changed = await service.refresh("report_shop", {**STATS, "orders": 140})
+        assert changed["summary"] == {"orders": 140}
+        assert len(generator.calls) == 2
+        assert service.stats()["unchanged"] == 1
+
+    asyncio.run(run())
+
+def test_listing_changes_regenerate_report():
+    """Test that the fingerprint covers the catalog analysis as well as the KPIs"""
+    async def run():
+        generator = CountingGenerator()
+        analyzer = StubAnalyzer(analysis(100))
+        service = make_service(generator, analyzer)
+
+        await service.refresh("catalog_shop", STATS)
+        analyzer.analysis = analysis(101)
+        await service.refresh("catalog_shop", STATS)
+        assert len(generator.calls) == 1
+
+        analyzer.analysis = analysis(200)
+        await service.refresh("catalog_shop", STATS)
+        assert len(generator.calls) == 2
+        assert generator.calls[-1][1]["listings"]["issues"][0]["listings"] == 200
+
+    asyncio.run(run())
+
+def test_report_falls_back_to_metrics_without_listings(monkeypatch):
+    """Test that a listings fetch failure still yields a metrics-only report"""
+    async def unavailable(shop_id, client=None):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr("app.services.reports.shop_listing_columns", unavailable)
+    monkeypatch.setenv("LLM_PROVIDER", "none")
+
+    async def run():
+        listings = await analyze_shop_listings("down_shop")
+        return listings, await generate_report("down_shop", {**STATS, "deltas": {}, "listings": listings})
+
+    listings, report = asyncio.run(run())
+    assert listings is None
+    assert "$2,500.00" in report["summary"]["summary"]
+    assert report["summary"]["confidence"] == "medium"
+
+def test_shop_invalidation_drops_report():
+    """Test that invalidating a shop's cache tag removes its report"""
+    async def run():
+        service = make_service(CountingGenerator())
+        await service.refresh("tagged_shop", STATS)
+        await service.cache.invalidate_tags([EtsyClient.shop_tag("tagged_shop")])
+        assert await service.cache.get("report:tagged_shop") is None
+
+    asyncio.run(run())
+
+def test_concurrent_refreshes_generate_once():
+    """Test that simultaneous refreshes for a shop share one generation"""
+    async def run():
+        generator = CountingGenerator(delay=0.01)
+        service = make_service(generator)
+        entries = await asyncio.gather(*(service.refresh("busy_shop", STATS) for _ in range(5)))
+
+        assert len(generator.calls) == 1
+        assert len({entry["generated_at"] for entry in entries}) == 1
+
+    asyncio.run(run())
+
+def test_get_serves_cached_and_refreshes_expired_in_background():
+    """Test that reads never wait on generation once a report exists"""
+    async def run():
+        generator = CountingGenerator()
+        service = make_service(generator, ttl=60)
+        await service.refresh("served_shop", STATS)
+
+        entry = await service.get("served_shop")
+        assert len(generator.calls) == 1
+
+        await service.cache.set("report:served_shop", {**entry, "generated_at": time.time() - 120}, ttl=120)
+        stale = await service.get("served_shop")
+        assert stale["generated_at"] < entry["generated_at"]
+        await asyncio.sleep(0.05)
+
+        assert service.stats()["background_refreshes"] == 1
+        assert (await service.get("served_shop"))["generated_at"] > stale["generated_at"]
+        await service.stop()
+
+    asyncio.run(run())
+
+def test_sync_refreshes_report_from_fetched_stats():
+    """Test that a shop stats sync regenerates the report without another fetch"""
+    class StatsClient:
+        def __init__(self):
+            self.calls = 0
+
+        async def get_shop_stats(self, shop_id):
+            self.calls += 1
+            return STATS
+
+        async def get_trends_data(self, shop_id, series=None):
+            return {}
+
+        async def get_funnel_stats(self, shop_id):
+            return {}
+
+    async def run():
+        generator = CountingGenerator()
+        analyzer = StubAnalyzer()
+        client = StatsClient()
+        scheduler = SyncScheduler(client=client, interval=0, state=ShopStateStore(":memory:"),
+                                  reports=make_service(generator, analyzer))
+        await scheduler._run_job("synced_shop", "shop")
+
+        assert client.calls == 1
+        assert generator.calls[0][0] == "synced_shop"
+        assert generator.calls[0][1]["gmv"] == 2500.0
+        # Listings not yet synced are read on the scheduler's background lane
+        assert analyzer.calls == [("synced_shop", client)]
+
+    asyncio.run(run())
+
+def test_analysis_reads_synced_listings_without_the_client(monkeypatch):
+    """Test that a shop with synced listings is analyzed from the shop state store"""
+    class UnusedClient:
+        def iter_listing_pages(self, shop_id):
+            raise AssertionError("synced listings were fetched upstream")
+
+    state = ShopStateStore(":memory:")
+    state.merge_listings("state_shop", [
+        {"listing_id": i, "title": f"L{i}", "views": 500, "orders": 0, "revenue": 0.0} for i in range(5)
+    ])
+    state.mark_synced("state_shop", "listings", 0, full=True)
+    monkeypatch.setattr("app.services.reports.get_shop_state_store", lambda: state)
+
+    listings = asyncio.run(analyze_shop_listings("state_shop", UnusedClient()))
+    assert listings["listings"] == 5
+
+def test_analysis_is_reused_until_synced_state_moves():
+    """Test that refreshes only re-analyze the catalog after listings or receipts sync changes"""
+    async def run():
+        state = ShopStateStore(":memory:")
+        state.mark_synced("reuse_shop", "listings", 100, full=True)
+        analyzer = StubAnalyzer(analysis(100))
+        service = make_service(CountingGenerator(), analyzer, state=state)
+
+        await service.refresh("reuse_shop", STATS)
+        await service.refresh("reuse_shop", STATS)
+        assert len(analyzer.calls) == 1
+        assert service.stats()["analyses_reused"] == 1
+
+        state.mark_synced("reuse_shop", "receipts", 200)
+        await service.refresh("reuse_shop", STATS)
+        state.mark_synced("reuse_shop", "listings", 150)
+        await service.refresh("reuse_shop", STATS)
+        assert len(analyzer.calls) == 3
+
+    asyncio.run(run())
+
+def test_concurrent_first_analyses_walk_the_catalog_once():
+    """Test that simultaneous refreshes of an unanalyzed shop share one analysis"""
+    class SlowAnalyzer(StubAnalyzer):
+        async def __call__(self, shop_id, client=None):
+            await asyncio.sleep(0.01)
+            return await super().__call__(shop_id, client)
+
+    async def run():
+        analyzer = SlowAnalyzer(analysis(100))
+        service = make_service(CountingGenerator(), analyzer)
+        await asyncio.gather(*(service.refresh("cold_shop", STATS) for _ in range(5)))
+        assert len(analyzer.calls) == 1
+
+    asyncio.run(run())
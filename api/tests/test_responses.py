@@ -0,0 +1,62 @@
+import asyncio
+import json
+from app.models.kpis import ListingsResponse, TrendsResponse
+from app.services.aggregator import MetricsAggregator
+from app.utils.http_cache import BodyCache, encode_json
+
+async def pages_of(listings, size):
+    for start in range(0, len(listings), size):
+        yield listings[start:start + size]
+
+def make_listings(count):
+    return [
+        {"listing_id": i, "title": f"Listing {i}", "views": (i * 37) % 1000,
+         "orders": (i * 11) % 50, "revenue": (i * 13) % 97, "etsy_url": f"https://etsy.com/listing/{i}"}
+        for i in range(count)
+    ]
+
+def test_trends_payload_encodes_like_model():
+    """Test that the dict fast path produces the same JSON as the pydantic model"""
+    aggregator = MetricsAggregator()
+    raw = {
+        "revenue": [{"date": "2024-01-01", "value": 10}, {"date": "2024-01-02", "value": 12.5}],
+        "orders": [{"date": "2024-01-01", "value": 3}],
+        "unknown": [{"date": "2024-01-01", "value": 1}]
+    }
+    series = ["revenue", "orders", "unknown"]
+
+    fast = encode_json(aggregator.trends_payload(raw, series))
+    assert json.loads(fast) == json.loads(encode_json(aggregator.aggregate_trends(raw, series)))
+    TrendsResponse.model_validate_json(fast)
+
+def test_listings_payload_encodes_like_model():
+    """Test that the listings dict payload matches the validated response model"""
+    async def run():
+        aggregator = MetricsAggregator()
+        catalog = make_listings(120)
+        payload = await aggregator.listings_payload_stream(pages_of(catalog, 25), limit=10,
+                                                           rankings=["views", "conversion"])
+        model = await aggregator.aggregate_listings_stream(pages_of(catalog, 25), limit=10,
+                                                           rankings=["views", "conversion"])
+
+        assert json.loads(encode_json(payload)) == json.loads(encode_json(model))
+        assert ListingsResponse.model_validate_json(encode_json(payload)) == model
+        assert isinstance(payload["items"][0]["revenue"], float)
+
+    asyncio.run(run())
+
+def test_body_cache_evicts_least_recently_used():
+    """Test the encoded body LRU"""
+    cache = BodyCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+    assert cache.stats() == {"entries": 2, "bytes": 2, "hits": 2, "misses": 1}
+
+    disabled = BodyCache(max_entries=0)
+    disabled.put("a", b"1")
+    assert disabled.get("a") is None
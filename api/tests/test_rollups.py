@@ -0,0 +1,88 @@
+import asyncio
+from app.services.aggregator import MetricsAggregator
+from app.services.etsy_client import EtsyClient
+from app.services.cache import CacheService
+from app.services.rollups import DailyRollupStore, ShopRollup
+
+def _points(values, start_day=1):
+    return [{"date": f"2024-01-{start_day + i:02d}", "value": value} for i, value in enumerate(values)]
+
+def test_window_sum_uses_prefix_sums():
+    """Test window sums, out-of-order writes and coverage checks"""
+    rollup = ShopRollup()
+    rollup.upsert("orders", 10, 5.0)
+    rollup.upsert("orders", 8, 3.0)
+    rollup.upsert("orders", 9, 4.0)
+    assert rollup.window_sum("orders", 8, 10) == 12.0
+    assert rollup.window_sum("orders", 9, 9) == 4.0
+
+    rollup.upsert("orders", 9, 6.0)
+    assert rollup.window_sum("orders", 8, 10) == 14.0
+    assert rollup.window_sum("orders", 7, 10) is None
+    assert rollup.window_sum("gmv", 8, 10) is None
+
+def test_gaps_are_not_covered():
+    """Test that days between synced ranges do not count as covered"""
+    rollup = ShopRollup()
+    for day in list(range(1, 11)) + list(range(60, 70)):
+        rollup.upsert("orders", day, 1.0)
+    assert rollup.intervals("orders") == [(1, 10), (60, 69)]
+    assert rollup.window_sum("orders", 30, 39) is None
+    assert rollup.window_sum("orders", 5, 64) is None
+    assert rollup.window_sum("orders", 60, 69) == 10.0
+
+    for day in range(11, 60):
+        rollup.upsert("orders", day, 2.0)
+    assert rollup.intervals("orders") == [(1, 69)]
+    assert rollup.window_sum("orders", 5, 64) == 6 + 49 * 2.0 + 5
+
+    store = DailyRollupStore()
+    store.ingest_trends("gappy", {
+        "orders": _points([1] * 10) + [{"date": f"2024-03-{d:02d}", "value": 1} for d in range(1, 11)]
+    })
+    assert store.compare_windows("gappy", "2024-02-01", "2024-02-10") is None
+    assert store.compare_windows("gappy", "2024-03-01", "2024-03-05") is None
+
+def test_compare_windows_for_explicit_dates():
+    """Test current and previous window totals for a requested range"""
+    store = DailyRollupStore()
+    store.ingest_trends("shop", {
+        "orders": _points([10] * 7 + [20] * 7),
+        "visits": _points([100] * 14),
+        "revenue": _points([50.0] * 14)
+    })
+
+    current, previous = store.compare_windows("shop", "2024-01-08", "2024-01-14")
+    assert current["orders"] == 140 and previous["orders"] == 70
+    assert current["conversion_rate"] == 20.0
+    assert current["gmv"] == previous["gmv"] == 350.0
+
+    # Previous window starts before the stored history
+    assert store.compare_windows("shop", "2024-01-03", "2024-01-14") is None
+    assert store.compare_windows("other", None, None) is None
+    assert store.compare_windows("shop", "not-a-date", None) is None
+
+def test_default_window_and_deltas():
+    """Test that the default window compares the latest half of short histories"""
+    store = DailyRollupStore()
+    store.ingest_trends("shop", {"orders": _points([10] * 7 + [15] * 7)})
+
+    deltas = MetricsAggregator().calculate_deltas(*store.compare_windows("shop"))
+    assert deltas.orders == 50.0
+    assert deltas.gmv is None
+
+def test_trends_fetch_feeds_rollups(monkeypatch):
+    """Test that shop deltas come from earlier trends fetches without another call"""
+    monkeypatch.setenv("MOCK_MODE", "true")
+    store = DailyRollupStore()
+    monkeypatch.setattr("app.services.etsy_client.get_rollup_store", lambda: store)
+    client = EtsyClient(cache=CacheService())
+
+    async def run():
+        await client.get_trends_data("123")
+        raw = await client.get_shop_stats("123")
+        return MetricsAggregator().aggregate_shop_metrics(raw, store.compare_windows("123"))
+
+    metrics = asyncio.run(run())
+    assert metrics.deltas.orders is not None
+    assert metrics.deltas.gmv is not None
@@ -0,0 +1,33 @@
+import json
+import pytest
+from app.services.serialization import Serializer, MAGIC
+
+PAYLOAD = {
+    "listings": [
+        {"listing_id": i, "title": f"Handmade Item {i}", "views": i * 10, "orders": i, "revenue": i * 12.5}
+        for i in range(200)
+    ]
+}
+
+@pytest.mark.parametrize("codec", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd", "lz4"])
+def test_round_trip(codec, compression):
+    """Test that every codec and compression pair round-trips"""
+    serializer = Serializer(codec=codec, compression=compression, compress_threshold=256)
+    data = serializer.dumps(PAYLOAD)
+    assert data.startswith(MAGIC)
+    assert serializer.loads(data) == PAYLOAD
+
+def test_small_payloads_skip_compression():
+    """Test that payloads under the threshold are stored uncompressed"""
+    serializer = Serializer(codec="json", compression="zlib", compress_threshold=1024)
+    data = serializer.dumps({"orders": 142})
+    assert data[4] == 0
+    assert serializer.loads(data) == {"orders": 142}
+
+def test_reads_other_formats_and_legacy_json():
+    """Test that a reader decodes entries written with another configuration"""
+    writer = Serializer(codec="msgpack", compression="lz4", compress_threshold=0)
+    reader = Serializer(codec="json", compression="none")
+    assert reader.loads(writer.dumps(PAYLOAD)) == PAYLOAD
+    assert reader.loads(json.dumps({"orders": 142}).encode()) == {"orders": 142}
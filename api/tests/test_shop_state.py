@@ -0,0 +1,82 @@
+from app.services.shop_state import ShopStateStore
+
+def receipt(receipt_id, modified, lines, status="Paid"):
+    return {
+        "receipt_id": receipt_id,
+        "last_modified": modified,
+        "status": status,
+        "transactions": [{"listing_id": listing_id, "revenue": revenue} for listing_id, revenue in lines]
+    }
+
+def test_receipt_updates_adjust_sales_without_double_counting():
+    """Test that a receipt seen again replaces its earlier contribution"""
+    store = ShopStateStore(":memory:")
+    store.merge_receipts("shop", [
+        receipt(1, 100, [(10, 15.0), (10, 15.0), (11, 5.0)]),
+        receipt(2, 110, [(10, 20.0)])
+    ])
+    assert store.sales("shop", 10) == (2, 50.0)
+
+    # Same receipt synced twice, then a line removed
+    store.merge_receipts("shop", [receipt(2, 110, [(10, 20.0)])])
+    store.merge_receipts("shop", [receipt(1, 120, [(11, 5.0)])])
+    assert store.sales("shop", 10) == (1, 20.0)
+    assert store.sales("shop", 11) == (1, 5.0)
+
+    # Refunded receipts stop counting
+    store.merge_receipts("shop", [receipt(2, 130, [(10, 20.0)], status="Fully Refunded")])
+    assert store.sales("shop", 10) == (0, 0.0)
+
+def test_listings_keep_positions_and_use_receipt_sales():
+    """Test listing upserts, retention after a full sync and sales overlay"""
+    store = ShopStateStore(":memory:")
+    store.merge_listings("shop", [{"listing_id": i, "title": f"L{i}", "orders": 99} for i in (3, 1, 2)])
+    store.mark_synced("shop", "listings", 0, full=True)
+    store.merge_listings("shop", [{"listing_id": 1, "title": "Updated"}])
+    assert store.retain_listings("shop", [3, 1]) == 1
+
+    listings = store.listings("shop")
+    assert [listing["listing_id"] for listing in listings] == [3, 1]
+    assert listings[0]["orders"] == 99
+
+    store.merge_receipts("shop", [receipt(1, 100, [(1, 12.5)])])
+    listings = store.listings("shop")
+    assert listings[1]["title"] == "Updated"
+    assert (listings[0]["orders"], listings[1]["orders"], listings[1]["revenue"]) == (0, 1, 12.5)
+
+def test_high_water_marks_only_advance():
+    """Test high-water tracking"""
+    store = ShopStateStore(":memory:")
+    assert store.high_water("shop", "receipts") is None
+    store.mark_synced("shop", "receipts", 200)
+    store.mark_synced("shop", "receipts", 150)
+    assert store.high_water("shop", "receipts") == 200
+    assert not store.has_listings("shop")
+
+def test_purge_forgets_only_that_shop():
+    """Test that purging a shop drops its listings, sales and sync state"""
+    store = ShopStateStore(":memory:")
+    for shop_id in ("shop", "other"):
+        store.merge_listings(shop_id, [{"listing_id": 1, "title": "L1"}])
+        store.merge_receipts(shop_id, [receipt(1, 100, [(1, 12.5)])])
+        store.mark_synced(shop_id, "receipts", 100, full=True)
+
+    store.purge("shop")
+    assert not store.has_listings("shop")
+    assert store.sales("shop", 1) == (0, 0.0)
+    assert store.high_water("shop", "receipts") is None
+    assert store.count_listings("other") == 1
+    assert store.sales("other", 1) == (1, 12.5)
+
+def test_sync_version_moves_with_sync_marks():
+    """Test that the sync version is absent before a full sync and changes with each mark"""
+    store = ShopStateStore(":memory:")
+    store.mark_synced("shop", "receipts", 100)
+    assert store.sync_version("shop") is None
+
+    store.mark_synced("shop", "listings", 100, full=True)
+    version = store.sync_version("shop")
+    store.mark_synced("shop", "listings", 100)
+    assert store.sync_version("shop") == version
+    store.mark_synced("shop", "receipts", 120)
+    assert store.sync_version("shop") != version
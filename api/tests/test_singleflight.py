@@ -0,0 +1,70 @@
+import asyncio
+from app.services.cache import CacheService
+from app.services.etsy_client import EtsyClient
+from app.services.rate_limiter import Priority
+from app.services.singleflight import SingleFlight
+
+def test_concurrent_identical_calls_share_one_fetch():
+    """Test that concurrent calls with the same key run the fetch once"""
+    async def run():
+        group = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"orders": 142}
+
+        key = ("shop_stats", "demo_shop", None, None)
+        results = await asyncio.gather(*[group.do(key, fetch) for _ in range(10)])
+
+        assert calls == 1
+        assert all(result == {"orders": 142} for result in results)
+        assert group.stats()["originated"] == 1
+        assert group.stats()["coalesced"] == 9
+        assert group.in_flight() == 0
+
+    asyncio.run(run())
+
+def test_errors_propagate_and_are_not_cached():
+    """Test that a failed call reaches every waiter and the next call retries"""
+    async def run():
+        group = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def succeeding():
+            return "ok"
+
+        results = await asyncio.gather(group.do("key", failing), group.do("key", failing), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await group.do("key", succeeding) == "ok"
+
+    asyncio.run(run())
+
+def test_forced_refresh_does_not_join_cached_read(monkeypatch):
+    """Test that a refreshing client fetches even while a plain read of the same key is in flight"""
+    group = SingleFlight()
+    monkeypatch.setattr("app.services.etsy_client.get_singleflight", lambda: group)
+    cache = CacheService()
+    calls = 0
+
+    async def fetch(shop_id, from_date=None, to_date=None):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"orders": calls}
+
+    async def run():
+        reader = EtsyClient(cache=cache)
+        syncer = EtsyClient(priority=Priority.BACKGROUND, cache=cache, refresh=True)
+        for client in (reader, syncer):
+            monkeypatch.setattr(client, "_fetch_shop_stats", fetch)
+        return await asyncio.gather(reader.get_shop_stats("demo"), syncer.get_shop_stats("demo"))
+
+    asyncio.run(run())
+    assert calls == 2
+    assert group.stats()["coalesced"] == 0
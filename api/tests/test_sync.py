@@ -0,0 +1,180 @@
+import asyncio
+import time
+from app.auth.tokens import TokenStore
+from app.services.cache import CacheService
+from app.services.shop_state import ShopStateStore
+from app.services.sync import SyncScheduler, SYNC_JOBS
+
+class RecordingClient:
+    """Etsy client stand-in that records sync calls"""
+
+    def __init__(self, fail=(), catalog=(), changed=(), receipts=()):
+        self.calls = []
+        self.fail = set(fail)
+        self.catalog = list(catalog)
+        self.changed = list(changed)
+        self.receipts = list(receipts)
+
+    async def _record(self, name, shop_id):
+        self.calls.append((name, shop_id))
+        if name in self.fail:
+            raise RuntimeError("upstream down")
+        return {}
+
+    async def get_shop_stats(self, shop_id):
+        return await self._record("shop", shop_id)
+
+    async def iter_listing_pages(self, shop_id):
+        await self._record("listings", shop_id)
+        yield self.catalog
+
+    async def iter_changed_listings(self, shop_id, since):
+        self.calls.append(("changed_listings", since))
+        changed = [listing for listing in self.changed if listing["last_modified_timestamp"] >= since]
+        if changed:
+            yield changed
+
+    async def iter_receipts(self, shop_id, since):
+        self.calls.append(("receipts", since))
+        receipts = [receipt for receipt in self.receipts if receipt["last_modified"] >= since]
+        if receipts:
+            yield receipts
+
+    async def get_trends_data(self, shop_id, series=None):
+        return await self._record("trends", shop_id)
+
+    async def get_funnel_stats(self, shop_id):
+        return await self._record("funnel", shop_id)
+
+def make_scheduler(client):
+    scheduler = SyncScheduler(client=client, interval=0, jitter=0.2, concurrency=2, state=ShopStateStore(":memory:"))
+    scheduler.should_defer = lambda: False
+    return scheduler
+
+def test_due_jobs_run_once_per_budget():
+    """Test that registered shops are synced and then wait out their staleness budget"""
+    client = RecordingClient()
+    scheduler = make_scheduler(client)
+    scheduler.register("shop_a")
+
+    assert asyncio.run(scheduler.run_once()) == len(SYNC_JOBS)
+    assert {name for name, _ in client.calls} >= set(SYNC_JOBS)
+    assert asyncio.run(scheduler.run_once()) == 0
+    assert scheduler.stats()["runs"] == len(SYNC_JOBS)
+
+    # Jittered next run stays inside the budget
+    due_in = scheduler._due[("shop_a", "shop")] - scheduler._last_run["shop_a"]
+    assert 0.8 * scheduler.budget("shop") <= due_in <= scheduler.budget("shop")
+
+def test_backpressure_defers_jobs():
+    """Test that jobs wait while interactive traffic is queued"""
+    client = RecordingClient()
+    scheduler = make_scheduler(client)
+    scheduler.should_defer = lambda: True
+    scheduler.register("shop_a")
+
+    assert asyncio.run(scheduler.run_once()) == 0
+    assert client.calls == []
+    assert scheduler.stats()["deferred"] == len(SYNC_JOBS)
+    assert scheduler.stats()["due"] == len(SYNC_JOBS)
+
+def test_failures_retry_sooner_and_unregister_stops_sync():
+    """Test failed jobs back off below the budget and disconnected shops are dropped"""
+    client = RecordingClient(fail={"funnel"})
+    scheduler = make_scheduler(client)
+    scheduler.interval = 1
+    scheduler.register("shop_a")
+    scheduler._due = {key: 0 for key in scheduler._due}
+
+    asyncio.run(scheduler.run_once())
+    assert scheduler.stats()["errors"] == 1
+    assert scheduler._due[("shop_a", "funnel")] < scheduler._due[("shop_a", "shop")]
+
+    scheduler.unregister("shop_a")
+    assert scheduler.shops() == []
+    assert asyncio.run(scheduler.run_once()) == 0
+
+def test_start_registers_shops_with_stored_tokens():
+    """Test that shops connected before a restart are synced again"""
+    tokens = TokenStore(":memory:")
+    tokens.save("shop_b", {"access_token": "a", "refresh_token": "r"})
+    tokens.save("shop_a", {"access_token": "a", "refresh_token": "r"})
+    scheduler = SyncScheduler(client=RecordingClient(), interval=60, state=ShopStateStore(":memory:"), tokens=tokens)
+    scheduler.enabled = True
+
+    async def run():
+        await scheduler.start()
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert scheduler.shops() == ["shop_a", "shop_b"]
+
+def test_listings_sync_is_incremental_after_first_full_pull():
+    """Test that later syncs only fetch changes since the high-water mark"""
+    catalog = [{"listing_id": i, "title": f"L{i}", "last_modified_timestamp": 100 + i} for i in range(3)]
+    paid_at = int(time.time())
+    client = RecordingClient(catalog=catalog, receipts=[
+        {"receipt_id": 1, "last_modified": paid_at, "transactions": [{"listing_id": 0, "revenue": 20.0}]}
+    ])
+    scheduler = make_scheduler(client)
+    scheduler.register("shop_a")
+
+    asyncio.run(scheduler._sync_listings("shop_a"))
+    assert scheduler.state.high_water("shop_a", "listings") == 102
+    assert scheduler.state.count_listings("shop_a") == 3
+
+    client.calls.clear()
+    client.changed = [{"listing_id": 1, "title": "Renamed", "last_modified_timestamp": 150}]
+    asyncio.run(scheduler._sync_listings("shop_a"))
+
+    assert ("listings", "shop_a") not in client.calls
+    assert ("changed_listings", 102) in client.calls
+    assert ("receipts", paid_at) in client.calls
+    assert scheduler.state.high_water("shop_a", "listings") == 150
+    titles = [listing["title"] for listing in scheduler.state.listings("shop_a")]
+    assert titles == ["L0", "Renamed", "L2"]
+    assert scheduler.state.sales("shop_a", 0) == (1, 20.0)
+    assert scheduler.stats()["full_listing_syncs"] == 1
+
+class LeaseBackend:
+    """Redis stand-in holding leases shared by several workers"""
+
+    def __init__(self):
+        self.leases = {}
+
+    async def acquire_lease(self, name, owner, ttl):
+        self.leases.setdefault(name, owner)
+        return self.leases[name] == owner
+
+    async def release_lease(self, name, owner):
+        if self.leases.get(name) == owner:
+            del self.leases[name]
+
+def test_only_the_lease_holder_syncs():
+    """Test that workers sharing Redis elect one sync runner and hand over on stop"""
+    backend = LeaseBackend()
+    tokens = TokenStore(":memory:")
+    tokens.save("shop_a", {"access_token": "a", "refresh_token": "r"})
+    workers = []
+    for _ in range(2):
+        cache = CacheService()
+        cache._redis = backend
+        workers.append(SyncScheduler(client=RecordingClient(), interval=60, state=ShopStateStore(":memory:"),
+                                     tokens=tokens, cache=cache))
+
+    async def run():
+        leaders = [await worker._hold_lease() for worker in workers]
+        assert leaders == [True, False]
+        workers[0]._follow_token_store()
+        assert workers[0].shops() == ["shop_a"]
+
+        tokens.delete("shop_a")
+        tokens.save("shop_b", {"access_token": "a", "refresh_token": "r"})
+        workers[0]._follow_token_store()
+        assert workers[0].shops() == ["shop_b"]
+
+        await workers[0].stop()
+        assert await workers[1]._hold_lease()
+        assert workers[1].stats()["leader"] is True
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+from app.services.timeseries import TimeSeriesStore
+
+def _daily(start, days, value=1.0):
+    first = date.fromisoformat(start)
+    return [{"date": (first + timedelta(days=i)).isoformat(), "value": value} for i in range(days)]
+
+def test_weekly_and_monthly_rollups():
+    """Test that coarser buckets are pre-summed from daily points"""
+    store = TimeSeriesStore(":memory:")
+    store.ingest("shop", {"orders": _daily("2024-01-01", 60)})
+
+    weeks = store.query("shop", ["orders"], "week", "2024-01-01", "2024-01-31")["orders"]
+    assert weeks[0] == {"date": "2024-01-01", "value": 7.0}
+    assert len(weeks) == 5
+
+    months = store.query("shop", ["orders"], "month")["orders"]
+    assert months == [{"date": "2024-01-01", "value": 31.0}, {"date": "2024-02-01", "value": 29.0}]
+
+def test_reingest_replaces_points():
+    """Test that re-syncing a day replaces it rather than double counting"""
+    store = TimeSeriesStore(":memory:")
+    store.ingest("shop", {"revenue": _daily("2024-03-01", 3, 10.0)})
+    store.ingest("shop", {"revenue": [{"date": "2024-03-02", "value": 25.0}]})
+    months = store.query("shop", ["revenue"], "month")["revenue"]
+    assert months == [{"date": "2024-03-01", "value": 45.0}]
+
+def test_coverage_merges_adjacent_syncs():
+    """Test coverage tracking across separate syncs"""
+    store = TimeSeriesStore(":memory:")
+    store.ingest("shop", {"views": _daily("2022-01-01", 365)})
+    assert not store.covers("shop", ["views"], "2022-06-01", "2023-02-01")
+
+    store.ingest("shop", {"views": _daily("2023-01-01", 365)})
+    assert store.covers("shop", ["views"], "2022-06-01", "2023-02-01")
+    assert not store.covers("shop", ["views", "orders"], "2022-06-01", "2023-02-01")
+    assert store.span("shop", "views") == ("2022-01-01", "2023-12-31")
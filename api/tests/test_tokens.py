@@ -0,0 +1,115 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.auth.tokens import TokenStore, TokenUnavailable
+from app.services.cache import CacheService
+from app.services.etsy_client import EtsyClient
+
+def token_endpoint(calls):
+    """Stub OAuth token endpoint issuing numbered tokens"""
+    async def handler(request):
+        calls.append(request.content.decode())
+        await asyncio.sleep(0.01)
+        n = len(calls)
+        return httpx.Response(200, json={"access_token": f"access-{n}", "refresh_token": f"refresh-{n}",
+                                         "expires_in": 3600})
+    return handler
+
+def make_store(calls, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(token_endpoint(calls)))
+    return TokenStore(":memory:", token_url="https://auth.test/token", client_id="app", http_client=client, **kwargs)
+
+def test_concurrent_refreshes_share_one_call():
+    """Test that a burst of refreshes for one stale token hits the endpoint once"""
+    calls = []
+    store = make_store(calls)
+    store.save("shop", {"access_token": "access-0", "refresh_token": "refresh-0", "expires_in": 3600})
+
+    async def run():
+        return await asyncio.gather(*[store.refresh("shop", "access-0") for _ in range(10)])
+
+    records = asyncio.run(run())
+    assert len(calls) == 1
+    assert "refresh_token=refresh-0" in calls[0]
+    assert {record.access_token for record in records} == {"access-1"}
+    assert store.stats()["coalesced_refreshes"] == 9
+
+def test_proactive_refresh_before_expiry():
+    """Test that tokens inside the refresh margin are renewed on access"""
+    calls = []
+    store = make_store(calls, refresh_margin=300)
+    store.save("shop", {"access_token": "old", "refresh_token": "refresh-0", "expires_in": 60})
+
+    assert asyncio.run(store.access_token("shop")) == "access-1"
+    assert asyncio.run(store.access_token("shop")) == "access-1"
+    assert len(calls) == 1
+    assert store.get("shop").expires_at > time.time() + 3000
+
+def test_tokens_persist_and_missing_tokens_raise():
+    """Test reading tokens back from the database and missing shops"""
+    store = make_store([])
+    store.save("shop", {"access_token": "a", "refresh_token": "r", "expires_in": 3600})
+    store._cache.clear()
+    assert store.get("shop").refresh_token == "r"
+
+    store.delete("shop")
+    with pytest.raises(TokenUnavailable):
+        asyncio.run(store.access_token("shop"))
+
+def test_401_refreshes_exactly_once(monkeypatch):
+    """Test that concurrent 401s trigger one refresh and requests retry with the new token"""
+    calls = []
+    store = make_store(calls)
+    store.save("shop", {"access_token": "access-0", "refresh_token": "refresh-0", "expires_in": 3600})
+
+    async def api(request):
+        if request.headers["authorization"] == "Bearer access-0":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"ok": True})
+
+    api_client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    monkeypatch.setattr("app.services.etsy_client.get_token_store", lambda: store)
+    monkeypatch.setattr("app.services.etsy_client.get_http_pool", lambda: api_client)
+    client = EtsyClient()
+
+    async def run():
+        return await asyncio.gather(*[client._make_request("GET", "/ping", shop_id="shop") for _ in range(5)])
+
+    assert asyncio.run(run()) == [{"ok": True}] * 5
+    assert len(calls) == 1
+
+def test_unconnected_shops_get_empty_data(monkeypatch):
+    """Test that shops without a stored token degrade to empty data instead of erroring"""
+    store = make_store([])
+    monkeypatch.setenv("MOCK_MODE", "false")
+    monkeypatch.setenv("ETSY_CLIENT_ID", "app")
+    monkeypatch.setattr("app.services.etsy_client.get_token_store", lambda: store)
+    client = EtsyClient(cache=CacheService())
+
+    async def run():
+        page = await client._fetch_listings_page("new_shop", None, None, 0, 100)
+        receipts = await client._fetch_receipts_page("new_shop", 0, 0, 100)
+        return page, receipts
+
+    assert asyncio.run(run()) == ({"count": 0, "listings": []}, [])
+
+def test_failed_refresh_maps_to_401(monkeypatch):
+    """Test that a revoked token surfaces as 401 rather than a server error"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    class RevokedClient:
+        async def listings_version(self, shop_id, from_date=None, to_date=None):
+            return None
+
+        async def iter_listing_pages(self, shop_id, from_date=None, to_date=None):
+            raise TokenUnavailable("Token refresh failed for shop revoked_shop")
+            yield []
+
+    monkeypatch.setattr("app.routers.metrics.get_etsy_client", lambda: RevokedClient())
+    client = TestClient(app)
+    for path in ["/metrics/listings?shop_id=revoked_shop", "/metrics/listings/export?shop_id=revoked_shop"]:
+        response = client.get(path)
+        assert response.status_code == 401, path
+        assert "reconnect" in response.json()["detail"]